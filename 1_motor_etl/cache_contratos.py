@@ -0,0 +1,179 @@
+"""
+Caché local (SQLite) de la metadata de contratos SEACE (/api/bus/contrato/idContrato/{id}).
+
+La comparten spider_garantias.py y los ETL de consorcios:
+- `cuerpos`: contenido direccionado por su SHA-256 (respuestas iguales se guardan una vez)
+- `contratos`: id_contrato -> sha256, status, ETag, Last-Modified y fecha de verificación
+
+Política:
+- Dentro del TTL (CACHE_CONTRATOS_TTL_DIAS, 30 por defecto) se responde sin red
+- Vencido, se revalida con If-None-Match / If-Modified-Since; un 304 solo renueva la fecha
+- Los 404 se recuerdan menos tiempo (CACHE_CONTRATOS_TTL_404_HORAS, 24 por defecto)
+
+En el mismo archivo, `extracciones` guarda el resultado de extraer consorciados de un
+PDF por su SHA-256 y extractor: un mismo acuerdo de consorcio se analiza una sola vez.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import Counter, namedtuple
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+
+RUTA_CACHE = os.getenv("CACHE_CONTRATOS_DB", os.path.join(parent_dir, "1_database", "cache_contratos.sqlite"))
+TTL = float(os.getenv("CACHE_CONTRATOS_TTL_DIAS", "30")) * 86400
+TTL_404 = float(os.getenv("CACHE_CONTRATOS_TTL_404_HORAS", "24")) * 3600
+STATUS_CACHEABLES = {200, 404}
+
+Entrada = namedtuple("Entrada", "status data etag last_modified fresca")
+
+class CacheContratos:
+    def __init__(self, ruta=RUTA_CACHE, ttl=TTL, ttl_404=TTL_404):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.ttl_404 = ttl_404
+        self.stats = Counter()
+        self._lock = threading.Lock()  # una conexión compartida por los hilos de descarga
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        # Varios procesos (spiders, ETL) pueden usar el mismo archivo: WAL + espera por bloqueo
+        self.conn = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cuerpos (
+                sha256 TEXT PRIMARY KEY,
+                contenido BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS contratos (
+                id_contrato TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                sha256 TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                obtenido REAL NOT NULL,
+                verificado REAL NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def buscar(self, id_contrato):
+        """Entrada guardada (fresca o no) o None"""
+        with self._lock:
+            fila = self.conn.execute("""
+                SELECT c.status, b.contenido, c.etag, c.last_modified, c.verificado
+                FROM contratos c LEFT JOIN cuerpos b ON b.sha256 = c.sha256
+                WHERE c.id_contrato = ?
+            """, (str(id_contrato),)).fetchone()
+        if not fila:
+            self.stats["misses"] += 1
+            return None
+        status, contenido, etag, last_modified, verificado = fila
+        ttl = self.ttl if status == 200 else self.ttl_404
+        fresca = time.time() - verificado < ttl
+        self.stats["hits" if fresca else "vencidas"] += 1
+        data = json.loads(contenido) if contenido else None
+        return Entrada(status, data, etag, last_modified, fresca)
+
+    @staticmethod
+    def cabeceras_revalidacion(entrada):
+        if not entrada: return {}
+        cabeceras = {}
+        if entrada.etag: cabeceras["If-None-Match"] = entrada.etag
+        if entrada.last_modified: cabeceras["If-Modified-Since"] = entrada.last_modified
+        return cabeceras
+
+    def guardar(self, id_contrato, status, data=None, etag=None, last_modified=None):
+        if status not in STATUS_CACHEABLES: return
+        ahora = time.time()
+        sha = None
+        with self._lock, self.conn:
+            if data is not None:
+                contenido = json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")
+                sha = hashlib.sha256(contenido).hexdigest()
+                self.conn.execute("INSERT OR IGNORE INTO cuerpos (sha256, contenido) VALUES (?, ?)", (sha, contenido))
+            self.conn.execute("""
+                INSERT INTO contratos (id_contrato, status, sha256, etag, last_modified, obtenido, verificado)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id_contrato) DO UPDATE SET status = excluded.status, sha256 = excluded.sha256,
+                    etag = excluded.etag, last_modified = excluded.last_modified,
+                    obtenido = excluded.obtenido, verificado = excluded.verificado
+            """, (str(id_contrato), status, sha, etag, last_modified, ahora, ahora))
+        self.stats["guardadas"] += 1
+
+    def renovar(self, id_contrato):
+        """304 Not Modified: la copia sigue valiendo otro TTL"""
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE contratos SET verificado = ? WHERE id_contrato = ?", (time.time(), str(id_contrato)))
+        self.stats["revalidadas"] += 1
+
+    def obtener(self, session, url, id_contrato, **kwargs):
+        """
+        Versión síncrona (requests) para los ETL de consorcios.
+        Devuelve (status, data); status None si hubo error de red.
+        """
+        entrada = self.buscar(id_contrato)
+        if entrada and entrada.fresca:
+            return entrada.status, entrada.data
+
+        headers = dict(kwargs.pop("headers", None) or {}, **self.cabeceras_revalidacion(entrada))
+        try:
+            r = session.get(url, headers=headers, **kwargs)
+        except Exception as e:
+            logging.debug(f"Error consultando {url}: {e}")
+            # Sin red, mejor una copia vencida que nada
+            return (entrada.status, entrada.data) if entrada else (None, None)
+
+        if r.status_code == 304 and entrada:
+            self.renovar(id_contrato)
+            return entrada.status, entrada.data
+        data = None
+        if r.status_code == 200:
+            try: data = r.json()
+            except ValueError: return None, None
+        self.guardar(id_contrato, r.status_code, data, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        return r.status_code, data
+
+    def resumen(self):
+        return ", ".join(f"{k}={v}" for k, v in sorted(self.stats.items())) or "sin consultas"
+
+    def cerrar(self):
+        self.conn.close()
+
+class CacheExtracciones:
+    """Resultados de extractores_consorcio por (sha256 del PDF, extractor); sin vencimiento"""
+
+    def __init__(self, ruta=RUTA_CACHE):
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(ruta, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS extracciones (
+                sha256 TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                resultado TEXT NOT NULL,
+                creado REAL NOT NULL,
+                PRIMARY KEY (sha256, extractor)
+            )
+        """)
+        self.conn.commit()
+
+    def buscar(self, sha256, extractor):
+        fila = self.conn.execute(
+            "SELECT resultado FROM extracciones WHERE sha256 = ? AND extractor = ?", (sha256, extractor)
+        ).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def guardar(self, sha256, extractor, resultado):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO extracciones (sha256, extractor, resultado, creado) VALUES (?, ?, ?, ?)",
+                (sha256, extractor, json.dumps(resultado, ensure_ascii=False), time.time())
+            )
+
+    def cerrar(self):
+        self.conn.close()
@@ -0,0 +1,453 @@
+"""
+Carga masiva del cargador: TSV local -> LOAD DATA LOCAL INFILE -> staging -> upsert único.
+
+- Las filas parseadas se escriben a un TSV temporal (una línea = una fila, numerada)
+- Se cargan con LOAD DATA LOCAL INFILE en tablas temporales de la conexión,
+  con los mismos tipos que las tablas reales (CREATE ... SELECT ... LIMIT 0)
+- Las filas con advertencias de MySQL (truncado, conversión) o duplicadas dentro
+  del archivo van a `cargas_cuarentena` con el motivo
+- Cada fila trae un hash de contenido (hash_contenido); solo se escriben las
+  nuevas o las que cambiaron y cada carga deja su changeset en `cargas_cambios`
+- El resto se fusiona con un INSERT ... SELECT ... ON DUPLICATE KEY UPDATE por tabla
+- Convocatorias y adjudicaciones nuevas y cambios de estado_proceso se publican en
+  `eventos_outbox` en la misma transacción (los consume el despachador de notificaciones)
+
+Si el servidor o el cliente no permiten LOCAL INFILE se lanza CargaMasivaNoDisponible
+y el cargador vuelve al camino de executemany por lotes.
+"""
+import os
+import re
+import json
+import uuid
+import hashlib
+import logging
+import tempfile
+from datetime import datetime
+from mysql.connector import Error
+
+# Columnas y reglas de actualización compartidas con el camino por lotes
+COLS_CABECERA = (
+    "id_convocatoria", "ocid", "nomenclatura", "descripcion", "comprador", "categoria", "tipo_procedimiento",
+    "monto_estimado", "moneda", "fecha_publicacion", "estado_proceso",
+    "ubicacion_completa", "departamento", "provincia", "distrito", "archivo_origen", "hash_contenido",
+)
+UPDATE_CABECERA = """
+        categoria=VALUES(categoria), tipo_procedimiento=VALUES(tipo_procedimiento),
+        departamento=VALUES(departamento), provincia=VALUES(provincia), distrito=VALUES(distrito),
+        fecha_publicacion=VALUES(fecha_publicacion), estado_proceso=VALUES(estado_proceso),
+        hash_contenido=VALUES(hash_contenido),
+        last_update=NOW()
+"""
+COLS_ADJUDICACION = (
+    "id_adjudicacion", "id_contrato", "id_convocatoria", "ganador_nombre", "ganador_ruc",
+    "monto_adjudicado", "fecha_adjudicacion", "estado_item", "hash_contenido",
+)
+UPDATE_ADJUDICACION = """
+        id_contrato=VALUES(id_contrato),
+        fecha_adjudicacion=VALUES(fecha_adjudicacion),
+        ganador_nombre=VALUES(ganador_nombre), hash_contenido=VALUES(hash_contenido)
+"""
+
+# El hash cubre las columnas que el upsert actualiza: si no cambian, no hay nada que escribir
+CAMPOS_HASH = {
+    "cabecera": ("categoria", "tipo_procedimiento", "departamento", "provincia", "distrito", "fecha_publicacion",
+                 "estado_proceso"),
+    "adjudicacion": ("id_contrato", "fecha_adjudicacion", "ganador_nombre"),
+}
+
+# (tabla real, staging, clave, columnas, update)
+TABLAS = {
+    "cabecera": ("Licitaciones_Cabecera", "stg_cabecera", "id_convocatoria", COLS_CABECERA, UPDATE_CABECERA),
+    "adjudicacion": ("Licitaciones_Adjudicaciones", "stg_adjudicacion", "id_adjudicacion", COLS_ADJUDICACION, UPDATE_ADJUDICACION),
+}
+
+# Errores de "LOCAL INFILE deshabilitado" (servidor o cliente)
+ERRORES_SIN_LOCAL_INFILE = {1148, 2068, 3948, 3950}
+MAX_ADVERTENCIAS = 1000
+PATRON_FILA = re.compile(r"at row (\d+)")
+
+TIPOS_CAMBIO = {"I": "INSERTADO", "U": "ACTUALIZADO"}
+
+# Tipos de evento del outbox (mismos nombres que app/services/event_outbox.py)
+EVENTO_NUEVA_CONVOCATORIA = "nueva_convocatoria"
+EVENTO_NUEVA_ADJUDICACION = "nueva_adjudicacion"
+EVENTO_CAMBIO_ESTADO = "cambio_estado"
+
+class CargaMasivaNoDisponible(Exception):
+    pass
+
+def con_hash(tabla, fila):
+    """Agrega hash_contenido (MD5 estable de CAMPOS_HASH) al final de la tupla"""
+    cols = TABLAS[tabla][3]
+    partes = ("\x00" if fila[cols.index(c)] is None else str(fila[cols.index(c)]) for c in CAMPOS_HASH[tabla])
+    return tuple(fila) + (hashlib.md5("\x1f".join(partes).encode("utf-8")).hexdigest(),)
+
+def nuevo_id_ejecucion():
+    return datetime.now().strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:8]
+
+def sql_upsert(tabla):
+    """INSERT ... VALUES (%s...) ON DUPLICATE KEY UPDATE para executemany"""
+    real, _, _, cols, update = TABLAS[tabla]
+    return f"""
+    INSERT INTO {real} ({", ".join(cols)})
+    VALUES ({", ".join(["%s"] * len(cols))})
+    ON DUPLICATE KEY UPDATE {update};
+    """
+
+def crear_tabla_cuarentena(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cargas_cuarentena (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            archivo VARCHAR(255) NOT NULL,
+            tabla VARCHAR(64) NOT NULL,
+            fila INT NULL,
+            id_registro VARCHAR(100) NULL,
+            motivo VARCHAR(1000) NOT NULL,
+            datos TEXT NULL,
+            fecha DATETIME NOT NULL,
+            INDEX idx_cuarentena_archivo (archivo, fecha)
+        )
+    """)
+
+def preparar_cambios(cursor):
+    """Columnas hash_contenido y tabla del changeset por ejecución"""
+    for real, _, _, _, _ in TABLAS.values():
+        try:
+            cursor.execute(f"ALTER TABLE {real} ADD COLUMN hash_contenido CHAR(32) NULL")
+            logging.info(f"🛠️ Columna hash_contenido agregada a {real}")
+        except Error:
+            pass  # Ya existe
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cargas_cambios (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            id_ejecucion VARCHAR(40) NOT NULL,
+            archivo VARCHAR(255) NOT NULL,
+            tabla VARCHAR(64) NOT NULL,
+            id_registro VARCHAR(100) NOT NULL,
+            tipo VARCHAR(20) NOT NULL,
+            fecha DATETIME NOT NULL,
+            INDEX idx_cambios_ejecucion (id_ejecucion),
+            INDEX idx_cambios_registro (tabla, id_registro)
+        )
+    """)
+    crear_outbox(cursor)
+
+def crear_outbox(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS eventos_outbox (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            tipo VARCHAR(40) NOT NULL,
+            entidad_id VARCHAR(100) NOT NULL,
+            origen VARCHAR(20) NOT NULL,
+            payload TEXT NULL,
+            creado DATETIME NOT NULL,
+            INDEX idx_outbox_tipo (tipo, id)
+        )
+    """)
+
+def clasificar_lote(cursor, tabla, filas):
+    """
+    Camino por lotes: compara hash_contenido con la BD.
+    Devuelve (filas a escribir, {'I': [ids], 'U': [ids], '=': n})
+    """
+    real, _, clave, _, _ = TABLAS[tabla]
+    cambios = {"I": [], "U": [], "=": 0}
+    if not filas: return [], cambios
+    ids = list({f[0] for f in filas})
+    cursor.execute(
+        f"SELECT {clave}, hash_contenido FROM {real} WHERE {clave} IN ({', '.join(['%s'] * len(ids))})", ids
+    )
+    actuales = dict(cursor.fetchall())
+    escribir = []
+    for fila in filas:
+        if fila[0] not in actuales:
+            cambios["I"].append(fila[0])
+        elif actuales[fila[0]] != fila[-1]:
+            cambios["U"].append(fila[0])
+        else:
+            cambios["="] += 1
+            continue
+        escribir.append(fila)
+    return escribir, cambios
+
+def guardar_cambios(cursor, id_ejecucion, archivo, tabla, cambios, excluir=()):
+    filas = [
+        (id_ejecucion, archivo, TABLAS[tabla][0], id_reg, TIPOS_CAMBIO[tipo])
+        for tipo in ("I", "U") for id_reg in cambios[tipo] if id_reg not in excluir
+    ]
+    if not filas: return
+    cursor.executemany("""
+        INSERT INTO cargas_cambios (id_ejecucion, archivo, tabla, id_registro, tipo, fecha)
+        VALUES (%s, %s, %s, %s, %s, NOW())
+    """, filas)
+
+def estados_previos(cursor, ids):
+    """{id_convocatoria: estado_proceso} actual en la BD (antes del upsert)"""
+    if not ids: return {}
+    cursor.execute(
+        f"SELECT id_convocatoria, estado_proceso FROM Licitaciones_Cabecera WHERE id_convocatoria IN ({', '.join(['%s'] * len(ids))})",
+        list(ids)
+    )
+    return dict(cursor.fetchall())
+
+def publicar_eventos_lote(cursor, cabeceras, cambios_cab, cambios_adj, previos, excluir_cab=(), excluir_adj=()):
+    """Camino por lotes: eventos del outbox para lo que se acaba de escribir"""
+    i_estado = COLS_CABECERA.index("estado_proceso")
+    eventos = [(EVENTO_NUEVA_CONVOCATORIA, id_reg, None) for id_reg in cambios_cab["I"] if id_reg not in excluir_cab]
+    eventos += [
+        (EVENTO_CAMBIO_ESTADO, c[0], json.dumps({"anterior": previos[c[0]], "nuevo": c[i_estado]}, ensure_ascii=False))
+        for c in cabeceras
+        if c[0] in previos and c[0] not in excluir_cab and previos[c[0]] != c[i_estado]
+    ]
+    eventos += [(EVENTO_NUEVA_ADJUDICACION, id_reg, None) for id_reg in cambios_adj["I"] if id_reg not in excluir_adj]
+    if not eventos: return
+    cursor.executemany("""
+        INSERT INTO eventos_outbox (tipo, entidad_id, origen, payload, creado)
+        VALUES (%s, %s, 'etl', %s, NOW())
+    """, eventos)
+
+def guardar_cuarentena(cursor, archivo, tabla, rechazos):
+    """rechazos: [(fila, id_registro, motivo, datos)]"""
+    if not rechazos: return
+    cursor.executemany("""
+        INSERT INTO cargas_cuarentena (archivo, tabla, fila, id_registro, motivo, datos, fecha)
+        VALUES (%s, %s, %s, %s, %s, %s, NOW())
+    """, [(archivo, TABLAS[tabla][0], fila, id_reg, motivo[:1000], datos) for fila, id_reg, motivo, datos in rechazos])
+
+def fila_json(fila):
+    return json.dumps(fila, ensure_ascii=False, default=str)
+
+# --- TSV ---
+def _campo_tsv(valor):
+    if valor is None: return "\\N"
+    s = str(valor)
+    return (s.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+             .replace("\r", "\\r").replace("\0", "\\0"))
+
+class EscritorTSV:
+    """Archivo temporal en el formato por defecto de LOAD DATA; se borra al salir del with"""
+
+    def __init__(self):
+        self.filas = 0
+        self._f = tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='\n', suffix='.tsv', delete=False)
+        self.ruta = self._f.name
+
+    def escribir(self, fila):
+        self.filas += 1
+        self._f.write(str(self.filas) + "\t" + "\t".join(_campo_tsv(v) for v in fila) + "\n")
+
+    def cerrar(self):
+        if not self._f.closed: self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+        try: os.remove(self.ruta)
+        except OSError: pass
+
+# --- STAGING ---
+def _preparar_staging(cursor, tabla):
+    real, stg, clave, cols, _ = TABLAS[tabla]
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {stg}")
+    cursor.execute(f"CREATE TEMPORARY TABLE {stg} AS SELECT {', '.join(cols)} FROM {real} LIMIT 0")
+    cursor.execute(f"""
+        ALTER TABLE {stg}
+            ADD COLUMN fila INT NOT NULL FIRST,
+            ADD COLUMN valido TINYINT NOT NULL DEFAULT 1,
+            ADD COLUMN cambio CHAR(1) NULL,
+            ADD COLUMN estado_anterior VARCHAR(100) NULL,
+            ADD PRIMARY KEY (fila),
+            ADD INDEX idx_{stg}_clave ({clave})
+    """)
+
+def _cargar_tsv(cursor, tabla, tsv):
+    """LOAD DATA del TSV; devuelve [(fila, motivo)] de las advertencias de MySQL"""
+    _, stg, _, cols, _ = TABLAS[tabla]
+    try:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {stg} CHARACTER SET utf8mb4 (fila, {', '.join(cols)})",
+            (tsv.ruta.replace("\\", "/"),)
+        )
+    except Error as e:
+        if e.errno in ERRORES_SIN_LOCAL_INFILE:
+            raise CargaMasivaNoDisponible(str(e))
+        raise
+
+    cursor.execute("SELECT @@warning_count")
+    total = cursor.fetchone()[0]
+    if not total: return []
+
+    cursor.execute(f"SHOW WARNINGS LIMIT {MAX_ADVERTENCIAS}")
+    advertencias = []
+    for _, _, mensaje in cursor.fetchall():
+        m = PATRON_FILA.search(mensaje)
+        advertencias.append((int(m.group(1)) if m else None, mensaje))
+    if total > MAX_ADVERTENCIAS:
+        logging.warning(f"⚠️ {stg}: {total} advertencias, solo se registran {MAX_ADVERTENCIAS}")
+    return advertencias
+
+def _validar(cursor, archivo, tabla, advertencias):
+    """Marca como inválidas y pone en cuarentena las filas rechazadas; devuelve cuántas"""
+    _, stg, clave, cols, _ = TABLAS[tabla]
+
+    # 1. Advertencias de LOAD DATA (valor truncado, fecha o número inválido...)
+    por_fila = {}
+    for fila, motivo in advertencias:
+        if fila: por_fila.setdefault(fila, []).append(motivo)
+    rechazos = []
+    for fila, motivos in por_fila.items():
+        cursor.execute(f"SELECT {', '.join(cols)} FROM {stg} WHERE fila = %s", (fila,))
+        datos = cursor.fetchone()
+        cursor.execute(f"UPDATE {stg} SET valido = 0 WHERE fila = %s", (fila,))
+        rechazos.append((fila, datos[0] if datos else None, "; ".join(motivos), fila_json(datos) if datos else None))
+    guardar_cuarentena(cursor, archivo, tabla, rechazos)
+
+    # 2. Sin clave
+    cursor.execute(f"""
+        INSERT INTO cargas_cuarentena (archivo, tabla, fila, id_registro, motivo, fecha)
+        SELECT %s, %s, fila, NULL, 'Sin {clave}', NOW()
+        FROM {stg} WHERE valido = 1 AND ({clave} IS NULL OR {clave} = '')
+    """, (archivo, TABLAS[tabla][0]))
+    sin_clave = max(cursor.rowcount, 0)
+    cursor.execute(f"UPDATE {stg} SET valido = 0 WHERE {clave} IS NULL OR {clave} = ''")
+
+    # 3. Clave repetida dentro del archivo: se conserva la última aparición
+    #    (una tabla temporal no se puede abrir dos veces en la misma consulta)
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {stg}_ultima")
+    cursor.execute(f"""
+        CREATE TEMPORARY TABLE {stg}_ultima (PRIMARY KEY ({clave}))
+        AS SELECT {clave}, MAX(fila) AS fila FROM {stg} WHERE valido = 1 GROUP BY {clave}
+    """)
+    cursor.execute(f"""
+        INSERT INTO cargas_cuarentena (archivo, tabla, fila, id_registro, motivo, fecha)
+        SELECT %s, %s, s.fila, s.{clave},
+               CONCAT('Duplicado en el archivo (se conserva la fila ', u.fila, ')'), NOW()
+        FROM {stg} s JOIN {stg}_ultima u ON u.{clave} = s.{clave}
+        WHERE s.valido = 1 AND s.fila < u.fila
+    """, (archivo, TABLAS[tabla][0]))
+    duplicados = max(cursor.rowcount, 0)
+    cursor.execute(f"""
+        UPDATE {stg} s JOIN {stg}_ultima u ON u.{clave} = s.{clave}
+        SET s.valido = 0 WHERE s.fila < u.fila
+    """)
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {stg}_ultima")
+    return len(rechazos) + sin_clave + duplicados
+
+def _clasificar(cursor, archivo, tabla, id_ejecucion):
+    """Marca cada fila válida como nueva (I), cambiada (U) o igual (=) y guarda el changeset"""
+    real, stg, clave, _, _ = TABLAS[tabla]
+    cursor.execute(f"""
+        UPDATE {stg} s LEFT JOIN {real} r ON r.{clave} = s.{clave}
+        SET s.cambio = CASE
+            WHEN r.{clave} IS NULL THEN 'I'
+            WHEN r.hash_contenido <=> s.hash_contenido THEN '='
+            ELSE 'U' END
+        WHERE s.valido = 1
+    """)
+    if tabla == "cabecera":
+        cursor.execute(f"""
+            UPDATE {stg} s JOIN {real} r ON r.{clave} = s.{clave}
+            SET s.estado_anterior = r.estado_proceso
+            WHERE s.valido = 1 AND s.cambio = 'U'
+        """)
+    cursor.execute(f"""
+        INSERT INTO cargas_cambios (id_ejecucion, archivo, tabla, id_registro, tipo, fecha)
+        SELECT %s, %s, %s, {clave}, IF(cambio = 'I', 'INSERTADO', 'ACTUALIZADO'), NOW()
+        FROM {stg} WHERE valido = 1 AND cambio IN ('I', 'U')
+    """, (id_ejecucion, archivo, real))
+    cursor.execute(f"SELECT cambio, COUNT(*) FROM {stg} WHERE valido = 1 GROUP BY cambio")
+    conteo = {"I": 0, "U": 0, "=": 0}
+    conteo.update({c: int(n) for c, n in cursor.fetchall()})
+    return conteo
+
+def _periodos_staging(cursor):
+    """Meses afectados por filas nuevas o cambiadas: fecha previa en la BD y fecha nueva"""
+    periodos = set()
+    cursor.execute("""
+        SELECT DISTINCT COALESCE(YEAR(c.fecha_publicacion), 0), COALESCE(MONTH(c.fecha_publicacion), 0)
+        FROM Licitaciones_Cabecera c JOIN stg_cabecera s ON s.id_convocatoria = c.id_convocatoria
+        WHERE s.valido = 1 AND s.cambio = 'U'
+    """)
+    periodos.update((int(a), int(m)) for a, m in cursor.fetchall())
+    cursor.execute("""
+        SELECT DISTINCT COALESCE(YEAR(fecha_publicacion), 0), COALESCE(MONTH(fecha_publicacion), 0)
+        FROM stg_cabecera WHERE valido = 1 AND cambio IN ('I', 'U')
+    """)
+    periodos.update((int(a), int(m)) for a, m in cursor.fetchall())
+    return periodos
+
+def _fusionar(cursor, tabla):
+    real, stg, _, cols, update = TABLAS[tabla]
+    columnas = ", ".join(cols)
+    cursor.execute(f"""
+        INSERT INTO {real} ({columnas})
+        SELECT {columnas} FROM {stg} WHERE valido = 1 AND cambio IN ('I', 'U')
+        ON DUPLICATE KEY UPDATE {update}
+    """)
+    return cursor.rowcount
+
+def _publicar_eventos(cursor):
+    """
+    Outbox de lo fusionado. Va justo antes del commit para que los id se asignen cerca
+    de la confirmación (el despachador avanza por id). Una sentencia por consulta:
+    una tabla temporal no puede abrirse dos veces en la misma.
+    """
+    cursor.execute(f"""
+        INSERT INTO eventos_outbox (tipo, entidad_id, origen, creado)
+        SELECT '{EVENTO_NUEVA_CONVOCATORIA}', id_convocatoria, 'etl', NOW()
+        FROM stg_cabecera WHERE valido = 1 AND cambio = 'I' ORDER BY fila
+    """)
+    cursor.execute(f"""
+        INSERT INTO eventos_outbox (tipo, entidad_id, origen, payload, creado)
+        SELECT '{EVENTO_CAMBIO_ESTADO}', id_convocatoria, 'etl',
+               JSON_OBJECT('anterior', estado_anterior, 'nuevo', estado_proceso), NOW()
+        FROM stg_cabecera
+        WHERE valido = 1 AND cambio = 'U' AND NOT (estado_anterior <=> estado_proceso)
+        ORDER BY fila
+    """)
+    cursor.execute(f"""
+        INSERT INTO eventos_outbox (tipo, entidad_id, origen, creado)
+        SELECT '{EVENTO_NUEVA_ADJUDICACION}', id_adjudicacion, 'etl', NOW()
+        FROM stg_adjudicacion WHERE valido = 1 AND cambio = 'I' ORDER BY fila
+    """)
+
+def cargar_staging(conn, archivo, tsv_cabecera, tsv_adjudicacion, periodos, id_ejecucion):
+    """
+    Carga ambos TSV y los fusiona en una sola transacción.
+    Devuelve {'cabecera': {'I', 'U', '='}, 'adjudicacion': {...}, 'cuarentena': n}.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET FOREIGN_KEY_CHECKS=0")
+        # Primero los DDL (ALTER hace commit implícito), luego las cargas
+        for tabla in TABLAS:
+            _preparar_staging(cursor, tabla)
+
+        en_cuarentena = 0
+        for tabla, tsv in (("cabecera", tsv_cabecera), ("adjudicacion", tsv_adjudicacion)):
+            if not tsv.filas: continue
+            rechazadas = _validar(cursor, archivo, tabla, _cargar_tsv(cursor, tabla, tsv))
+            if rechazadas:
+                logging.warning(f"🧪 {archivo}: {rechazadas} fila(s) de {TABLAS[tabla][0]} en cuarentena")
+            en_cuarentena += rechazadas
+
+        resultado = {tabla: _clasificar(cursor, archivo, tabla, id_ejecucion) for tabla in TABLAS}
+        resultado["cuarentena"] = en_cuarentena
+        periodos.update(_periodos_staging(cursor))
+        for tabla in TABLAS:
+            _fusionar(cursor, tabla)
+        _publicar_eventos(cursor)
+        conn.commit()
+        return resultado
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            cursor.execute("SET FOREIGN_KEY_CHECKS=1")
+            for _, stg, _, _, _ in TABLAS.values():
+                cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {stg}")
+            cursor.close()
+        except: pass
@@ -0,0 +1,471 @@
+"""
+Cargador OCDS genérico: procesa todos los JSON descargados por descargador.py
+
+- Descubre 1_database/**/*.json (2024, 2025, 2026...)
+- Omite los archivos cuyo SHA-256 ya figura con estado EXITO en control_cargas
+- Procesa el resto en paralelo: un archivo por proceso, cada uno con su conexión
+- Al final refresca el cubo del dashboard y avisa a la API (control_generaciones)
+"""
+import mysql.connector
+from mysql.connector import Error
+import sys
+import os
+import glob
+import time
+import hashlib
+import logging
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dotenv import load_dotenv
+from generaciones import notificar_nueva_generacion
+from cubo_resumen import periodo_de_fecha, periodos_de_ids, refrescar_cubo
+from lector_ocds import elegir_backend, leer_proyectado, EstadisticasLectura
+from carga_masiva import (
+    CargaMasivaNoDisponible, EscritorTSV, cargar_staging, crear_tabla_cuarentena,
+    guardar_cuarentena, fila_json, sql_upsert, con_hash, preparar_cambios,
+    clasificar_lote, guardar_cambios, nuevo_id_ejecucion, estados_previos, publicar_eventos_lote
+)
+
+# --- CONFIGURACIÓN ---
+script_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(script_dir)
+load_dotenv(os.path.join(parent_dir, ".env"))
+
+DB_CONFIG = {
+    'host': os.getenv("DB_HOST"),
+    'user': os.getenv("DB_USER"),
+    'password': os.getenv("DB_PASS"),
+    'database': os.getenv("DB_NAME"),
+    'charset': 'utf8mb4',
+    'collation': 'utf8mb4_unicode_ci',
+    'use_unicode': True,
+    'autocommit': False,
+    'allow_local_infile': True
+}
+
+DB_FOLDER = os.path.join(parent_dir, "1_database")
+TAMANO_LOTE = 2000
+CARGA_MASIVA = os.getenv("ETL_CARGA_MASIVA", "1") != "0"  # 0 = solo executemany
+TIPO_PROCEDIMIENTO = 'Licitación Pública'
+BACKEND_JSON = elegir_backend()
+
+TRADUCTOR_CATEGORIA = {
+    'goods': 'BIENES', 'works': 'OBRAS', 'services': 'SERVICIOS', 'consultingServices': 'CONSULTORIA'
+}
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s', handlers=[logging.StreamHandler(sys.stdout)])
+if sys.platform.startswith('win'):
+    try: sys.stdout.reconfigure(encoding='utf-8')
+    except: pass
+
+# --- UTILIDADES BLINDADAS ---
+def safe_str(val, max_len=None):
+    if val is None: return ""
+    s = str(val).strip()
+    if max_len and len(s) > max_len: return s[:max_len]
+    return s
+
+def safe_float(val):
+    if val is None: return 0.0
+    try:
+        return float(val)
+    except:
+        return 0.0
+
+def limpiar_fecha(f):
+    if not f: return None
+    try:
+        f_clean = str(f)[:10]
+        datetime.strptime(f_clean, '%Y-%m-%d')
+        return f_clean
+    except ValueError: return None
+
+def determinar_estado(tender_status, item_status):
+    st_item = safe_str(item_status)
+    if st_item: return st_item.upper()
+
+    st = safe_str(tender_status).lower()
+    if not st: return "DESCONOCIDO"
+
+    mapping = {'active': 'CONVOCADO', 'complete': 'CONTRATADO', 'cancelled': 'CANCELADO', 'unsuccessful': 'DESIERTO', 'withdrawn': 'NULO', 'planned': 'PROGRAMADO', 'awarded': 'ADJUDICADO'}
+    return mapping.get(st, st.upper())
+
+def traducir_categoria(cat_ingles):
+    cat_safe = safe_str(cat_ingles)
+    return TRADUCTOR_CATEGORIA.get(cat_safe, cat_safe.upper() if cat_safe else "OTROS")
+
+def sha256_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+# --- DB ---
+def obtener_conexion():
+    intentos = 3
+    while intentos > 0:
+        try: return mysql.connector.connect(**DB_CONFIG)
+        except Error: time.sleep(2); intentos -= 1
+    raise Exception("❌ Sin conexión a DB")
+
+def insertar_lote_seguro(cursor, sql, datos, tipo="Registro", rechazos=None):
+    """executemany; si el lote falla, fila por fila y las que fallan van a `rechazos` con el motivo"""
+    if not datos: return 0
+    try:
+        cursor.executemany(sql, datos)
+        return len(datos)
+    except Error as e:
+        logging.warning(f"⚠️ Fallo en lote {tipo} ({e}). Modo Fila-por-Fila.")
+        c = 0
+        for fila in datos:
+            try: cursor.execute(sql, fila); c += 1
+            except Error as e_fila:
+                if rechazos is not None: rechazos.append((None, fila[0], str(e_fila), fila_json(fila)))
+        return c
+
+def preparar_control(conn):
+    """Columna sha256 en control_cargas (se agrega una sola vez), cuarentena y changeset"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("ALTER TABLE control_cargas ADD COLUMN sha256 CHAR(64) NULL")
+        conn.commit()
+        logging.info("🛠️ Columna sha256 agregada a control_cargas")
+    except Error:
+        pass  # Ya existe
+    try:
+        crear_tabla_cuarentena(cursor)
+        preparar_cambios(cursor)
+        conn.commit()
+    finally:
+        cursor.close()
+
+def cargas_exitosas(conn):
+    """{nombre_archivo: sha256} de las cargas terminadas con EXITO"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT nombre_archivo, sha256 FROM control_cargas WHERE estado = 'EXITO' AND sha256 IS NOT NULL")
+    exitosas = dict(cursor.fetchall())
+    cursor.close()
+    return exitosas
+
+def registrar_control(conn, nombre, estado, regs, sha):
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO control_cargas (nombre_archivo, estado, fecha_fin, registros_procesados, sha256)
+        VALUES (%s, %s, NOW(), %s, %s)
+        ON DUPLICATE KEY UPDATE estado=VALUES(estado), fecha_fin=NOW(),
+            registros_procesados=VALUES(registros_procesados), sha256=VALUES(sha256)
+    """, (nombre, estado, regs, sha))
+    conn.commit()
+    cursor.close()
+
+# --- LECTURA OCDS ---
+def leer_registros(ruta, stats=None):
+    """Genera (cabecera, adjudicaciones) de cada Licitación Pública del archivo"""
+    nombre = os.path.basename(ruta)
+    with open(ruta, 'rb') as f:
+        for r in leer_proyectado(f, TIPO_PROCEDIMIENTO, BACKEND_JSON, stats):
+            fila = mapear_registro(r, nombre)
+            if fila: yield fila
+
+def mapear_registro(r, nombre_archivo):
+    """Registro OCDS -> (tupla cabecera, [tuplas adjudicación]) o None si no aplica"""
+    if not r: return None
+
+    compiled = r.get('compiledRelease', {})
+    tender = compiled.get('tender', {})
+
+    # 1. FILTRO: SOLO LICITACIÓN PÚBLICA
+    tipo_proc = tender.get('procurementMethodDetails')
+    if tipo_proc != TIPO_PROCEDIMIENTO: return None
+
+    id_conv = safe_str(tender.get('id'), 100)
+    if not id_conv: return None
+
+    # 2. MAPEO DE CONTRATOS
+    mapa_contratos = {}
+    for c in compiled.get('contracts', []):
+        aw_id = c.get('awardID')
+        c_id = c.get('id')
+        if aw_id and c_id:
+            mapa_contratos[str(aw_id)] = safe_str(c_id, 100)
+
+    # 3. CABECERA
+    ocid = safe_str(r.get('ocid'), 100)
+    titulo = safe_str(tender.get('title'), 4000)
+    desc = safe_str(tender.get('description'), 4000)
+    buyer = compiled.get('buyer', {})
+    comprador = safe_str(buyer.get('name'), 500)
+    cat = traducir_categoria(tender.get('mainProcurementCategory'))
+    monto = safe_float(tender.get('value', {}).get('amount'))
+    moneda = safe_str(tender.get('value', {}).get('currency', 'PEN'), 10)
+
+    fecha = limpiar_fecha(compiled.get('date'))
+
+    items = tender.get('items', [])
+    estado = determinar_estado(tender.get('status'), items[0].get('statusDetails') if items else None)
+
+    # Ubicación
+    parties = compiled.get('parties', [])
+    ubic_full, dep, prov, dist = "PERU", None, None, None
+    for p in parties:
+        if p.get('id') == buyer.get('id'):
+            addr = p.get('address', {})
+            dep = safe_str(addr.get('department'), 100)
+            prov = safe_str(addr.get('region'), 100)
+            dist = safe_str(addr.get('locality'), 100)
+            partes = [x for x in [dep, prov, dist] if x]
+            if partes: ubic_full = " / ".join(partes)
+            break
+
+    cabecera = (
+        id_conv, ocid, titulo, desc, comprador, cat, tipo_proc,
+        monto, moneda, fecha, estado, ubic_full, dep, prov, dist, nombre_archivo
+    )
+    cabecera = con_hash("cabecera", cabecera)
+
+    # 4. ADJUDICACIONES
+    adjudicaciones = []
+    for aw in compiled.get('awards', []):
+        id_adj_raw = aw.get('id')
+        id_adj = safe_str(id_adj_raw, 100)
+        if not id_adj: continue
+
+        id_contrato = mapa_contratos.get(str(id_adj_raw), None)
+        sups = aw.get('suppliers', [])
+        ganador = safe_str(sups[0].get('name') if sups else "DESCONOCIDO", 500)
+        ruc = safe_str(sups[0].get('id') if sups else None, 50)
+        m_adj = safe_float(aw.get('value', {}).get('amount'))
+        f_adj = limpiar_fecha(aw.get('date'))
+
+        adjudicaciones.append(con_hash("adjudicacion", (
+            id_adj, id_contrato, id_conv, ganador, ruc, m_adj, f_adj, 'ADJUDICADO'
+        )))
+
+    return cabecera, adjudicaciones
+
+# --- MOTOR ETL ---
+def nuevo_resumen_cambios():
+    """{'cabecera': {'I': nuevas, 'U': cambiadas, '=': iguales}, 'adjudicacion': {...}}"""
+    return {"cabecera": {"I": 0, "U": 0, "=": 0}, "adjudicacion": {"I": 0, "U": 0, "=": 0}}
+
+def sumar_cambios(total, parcial):
+    for tabla, conteo in parcial.items():
+        for tipo, n in conteo.items():
+            total[tabla][tipo] += n if isinstance(n, int) else len(n)
+
+def describir_cambios(cambios):
+    c = cambios["cabecera"]
+    return f"{c['I']} nuevas, {c['U']} cambiadas, {c['=']} sin cambios"
+
+def procesar_archivo(conn, ruta, periodos, id_ejecucion=None, cambios=None):
+    """
+    Carga un archivo completo. Acumula en `periodos` los meses tocados por filas nuevas o
+    cambiadas y en `cambios` el conteo por tabla (ver nuevo_resumen_cambios).
+    Devuelve las cabeceras leídas; lanza excepción si falla (periodos y cambios conservan
+    lo que ya se confirmó).
+    """
+    global CARGA_MASIVA
+    id_ejecucion = id_ejecucion or nuevo_id_ejecucion()
+    cambios = cambios if cambios is not None else nuevo_resumen_cambios()
+    if CARGA_MASIVA:
+        try:
+            return procesar_archivo_masivo(conn, ruta, periodos, id_ejecucion, cambios)
+        except CargaMasivaNoDisponible as e:
+            CARGA_MASIVA = False
+            logging.warning(f"⚠️ LOAD DATA LOCAL no disponible ({e}). Se usa executemany por lotes.")
+    return procesar_archivo_lotes(conn, ruta, periodos, id_ejecucion, cambios)
+
+def procesar_archivo_masivo(conn, ruta, periodos, id_ejecucion, cambios):
+    """TSV temporal + LOAD DATA en staging + un upsert por tabla (ver carga_masiva.py)"""
+    nombre = os.path.basename(ruta)
+    stats = EstadisticasLectura(BACKEND_JSON)
+
+    with EscritorTSV() as tsv_cab, EscritorTSV() as tsv_adj:
+        for cabecera, adjs in leer_registros(ruta, stats):
+            tsv_cab.escribir(cabecera)
+            for adj in adjs: tsv_adj.escribir(adj)
+        tsv_cab.cerrar(); tsv_adj.cerrar()
+        logging.info(stats.resumen(nombre))
+
+        inicio = time.time()
+        res = cargar_staging(conn, nombre, tsv_cab, tsv_adj, periodos, id_ejecucion)
+        parcial = {tabla: res[tabla] for tabla in ("cabecera", "adjudicacion")}
+        sumar_cambios(cambios, parcial)
+        logging.info(f"💾 {nombre}: cabeceras {describir_cambios(parcial)} "
+                     f"en {time.time() - inicio:.2f}s ({res['cuarentena']} en cuarentena)")
+        return tsv_cab.filas
+
+def procesar_archivo_lotes(conn, ruta, periodos, id_ejecucion, cambios):
+    """Camino clásico: executemany de TAMANO_LOTE filas con upsert (solo las nuevas o cambiadas)"""
+    cursor = conn.cursor()
+    cursor.execute("SET FOREIGN_KEY_CHECKS=0")
+
+    nombre = os.path.basename(ruta)
+    contador = 0
+    cabeceras = []
+    adjudicaciones = []
+    stats = EstadisticasLectura(BACKEND_JSON)
+    parcial = nuevo_resumen_cambios()
+
+    try:
+        for cabecera, adjs in leer_registros(ruta, stats):
+            cabeceras.append(cabecera)
+            adjudicaciones.extend(adjs)
+
+            if len(cabeceras) >= TAMANO_LOTE:
+                _guardar(cursor, conn, cabeceras, adjudicaciones, periodos, nombre, id_ejecucion, parcial)
+                contador += len(cabeceras)
+                cabeceras, adjudicaciones = [], []
+
+        if cabeceras:
+            _guardar(cursor, conn, cabeceras, adjudicaciones, periodos, nombre, id_ejecucion, parcial)
+            contador += len(cabeceras)
+
+        logging.info(stats.resumen(nombre))
+        logging.info(f"💾 {nombre}: cabeceras {describir_cambios(parcial)}")
+
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        # Cada lote hace commit: los confirmados antes de un error también cuentan
+        sumar_cambios(cambios, parcial)
+        try: cursor.execute("SET FOREIGN_KEY_CHECKS=1"); cursor.close()
+        except: pass
+
+    return contador
+
+def _guardar(cursor, conn, cabeceras, adjudicaciones, periodos, archivo, id_ejecucion, parcial):
+    cabeceras, cambios_cab = clasificar_lote(cursor, "cabecera", cabeceras)
+    adjudicaciones, cambios_adj = clasificar_lote(cursor, "adjudicacion", adjudicaciones)
+
+    # Meses afectados: fecha previa (el upsert puede cambiarla) y fecha nueva
+    periodos.update(periodos_de_ids(cursor, cambios_cab["U"]))
+    periodos.update(periodo_de_fecha(c[9]) for c in cabeceras)
+    previos = estados_previos(cursor, cambios_cab["U"])
+
+    rechazos_cab, rechazos_adj = [], []
+    insertar_lote_seguro(cursor, sql_upsert("cabecera"), cabeceras, "Cabeceras", rechazos_cab)
+    if adjudicaciones:
+        insertar_lote_seguro(cursor, sql_upsert("adjudicacion"), adjudicaciones, "Adjudicaciones", rechazos_adj)
+    guardar_cuarentena(cursor, archivo, "cabecera", rechazos_cab)
+    guardar_cuarentena(cursor, archivo, "adjudicacion", rechazos_adj)
+    guardar_cambios(cursor, id_ejecucion, archivo, "cabecera", cambios_cab, {r[1] for r in rechazos_cab})
+    guardar_cambios(cursor, id_ejecucion, archivo, "adjudicacion", cambios_adj, {r[1] for r in rechazos_adj})
+    publicar_eventos_lote(cursor, cabeceras, cambios_cab, cambios_adj, previos,
+                          {r[1] for r in rechazos_cab}, {r[1] for r in rechazos_adj})
+    conn.commit()
+    # Solo lo confirmado: si el archivo falla después, estos lotes ya están en la BD
+    sumar_cambios(parcial, {"cabecera": cambios_cab, "adjudicacion": cambios_adj})
+
+# --- PARALELISMO ---
+# Subcarpetas de 1_database que no son datos OCDS (manifiestos de versiones anteriores del descargador)
+CARPETAS_EXCLUIDAS = {"manifiestos"}
+
+def descubrir_archivos(carpeta=DB_FOLDER):
+    """Todos los JSON finales del descargador (se ignoran los temporales y CARPETAS_EXCLUIDAS)"""
+    rutas = glob.glob(os.path.join(carpeta, "**", "*.json"), recursive=True)
+    return sorted(
+        r for r in rutas
+        if not os.path.basename(r).startswith("temp_")
+        and not CARPETAS_EXCLUIDAS & set(os.path.relpath(os.path.dirname(r), carpeta).split(os.sep))
+    )
+
+def cargar_archivo_worker(ruta, sha, id_ejecucion):
+    """Se ejecuta en un proceso hijo: conexión propia, un archivo completo"""
+    nombre = os.path.basename(ruta)
+    res = {"archivo": nombre, "registros": 0, "duracion": 0.0, "periodos": [],
+           "cambios": nuevo_resumen_cambios(), "error": None}
+    inicio = time.time()
+    conn = None
+    periodos = set()
+    try:
+        conn = obtener_conexion()
+        logging.info(f"📂 Procesando: {nombre}")
+        res["registros"] = procesar_archivo(conn, ruta, periodos, id_ejecucion, res["cambios"])
+        registrar_control(conn, nombre, 'EXITO', res["registros"], sha)
+    except Exception as e:
+        res["error"] = str(e)
+        logging.error(f"❌ Error en {nombre}: {e}")
+        try:
+            if conn: registrar_control(conn, nombre, 'ERROR', res["registros"], None)
+        except Exception: pass
+    finally:
+        # También si falla a mitad: los lotes ya confirmados deben llegar al cubo y a la generación
+        res["periodos"] = sorted(periodos)
+        if conn and conn.is_connected(): conn.close()
+    res["duracion"] = time.time() - inicio
+    return res
+
+# --- MAIN ---
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--force", action="store_true", help="Recargar aunque el SHA no haya cambiado")
+    parser.add_argument("archivos", nargs="*", help="Rutas específicas (por defecto: todo 1_database)")
+    args = parser.parse_args()
+
+    logging.info("🚀 CARGADOR OCDS MULTI-ARCHIVO")
+    logging.info(f"🧩 Backend JSON: {EstadisticasLectura(BACKEND_JSON).backend}")
+    start = time.time()
+
+    rutas = [os.path.abspath(a) for a in args.archivos] or descubrir_archivos()
+    if not rutas:
+        logging.warning(f"⚠️ No hay archivos JSON en {DB_FOLDER}")
+        return
+
+    conn = obtener_conexion()
+    try:
+        preparar_control(conn)
+        exitosas = {} if args.force else cargas_exitosas(conn)
+
+        pendientes = []
+        for ruta in rutas:
+            nombre = os.path.basename(ruta)
+            sha = sha256_archivo(ruta)
+            if exitosas.get(nombre) == sha:
+                logging.info(f"⏭️ {nombre} (sin cambios)")
+                continue
+            pendientes.append((ruta, sha))
+
+        id_ejecucion = nuevo_id_ejecucion()
+        logging.info(f"📋 {len(pendientes)} de {len(rutas)} archivos por cargar con {args.workers} procesos (ejecución {id_ejecucion})")
+
+        total_regs, periodos, fallidos = 0, set(), []
+        cambios = nuevo_resumen_cambios()
+        if pendientes:
+            with ProcessPoolExecutor(max_workers=args.workers) as exe:
+                futures = [exe.submit(cargar_archivo_worker, ruta, sha, id_ejecucion) for ruta, sha in pendientes]
+                for f in as_completed(futures):
+                    r = f.result()
+                    # Un archivo fallido puede haber confirmado lotes antes del error
+                    periodos.update(tuple(p) for p in r["periodos"])
+                    sumar_cambios(cambios, r["cambios"])
+                    if r["error"]:
+                        fallidos.append(r["archivo"])
+                        continue
+                    total_regs += r["registros"]
+                    logging.info(f"✅ {r['archivo']}: {r['registros']} Licitaciones en {r['duracion']:.2f}s")
+
+        # Sin filas nuevas ni cambiadas no hay periodos que refrescar ni cachés que invalidar
+        if periodos:
+            refrescar_cubo(conn, periodos)
+        if any(c["I"] or c["U"] for c in cambios.values()):
+            notificar_nueva_generacion(conn)
+
+        logging.info(f"🔁 Changeset {id_ejecucion}: cabeceras {describir_cambios(cambios)}; "
+                     f"adjudicaciones {cambios['adjudicacion']['I']} nuevas, {cambios['adjudicacion']['U']} cambiadas")
+        logging.info(f"🏁 {total_regs} registros en {time.time() - start:.2f}s ({len(fallidos)} archivo(s) con error)")
+        if fallidos:
+            logging.error(f"❌ Fallidos: {', '.join(fallidos)}")
+            sys.exit(1)
+
+    except KeyboardInterrupt: logging.warning("🛑 Interrumpido.")
+    finally:
+        if conn.is_connected(): conn.close()
+        logging.info("🔌 Fin.")
+
+if __name__ == "__main__":
+    main()
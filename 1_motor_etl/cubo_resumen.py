@@ -0,0 +1,75 @@
+"""
+Refresco incremental del cubo de resumen del dashboard (resumen_licitaciones_cubo).
+
+Misma agregación que app/services/resumen_cubo.py, pero con mysql.connector para
+los scripts ETL. Solo se recalculan los periodos (año, mes) que tocó la carga.
+"""
+import logging
+from datetime import date
+from mysql.connector import Error
+
+CUBO_TABLE = "resumen_licitaciones_cubo"
+
+SQL_CUBO = f"""
+    INSERT INTO {CUBO_TABLE}
+        (anio, mes, departamento, provincia, categoria, estado_proceso, tipo_procedimiento, total, monto_total)
+    SELECT
+        COALESCE(YEAR(fecha_publicacion), 0),
+        COALESCE(MONTH(fecha_publicacion), 0),
+        COALESCE(departamento, ''), COALESCE(provincia, ''), COALESCE(categoria, ''),
+        COALESCE(estado_proceso, ''), COALESCE(tipo_procedimiento, ''),
+        COUNT(*),
+        COALESCE(SUM(monto_estimado), 0)
+    FROM Licitaciones_Cabecera
+    {{where_sql}}
+    GROUP BY 1, 2, 3, 4, 5, 6, 7
+"""
+
+
+def periodo_de_fecha(fecha):
+    """'2025-12-03' -> (2025, 12); sin fecha -> (0, 0)"""
+    if not fecha:
+        return (0, 0)
+    try:
+        f = date.fromisoformat(str(fecha)[:10])
+        return (f.year, f.month)
+    except ValueError:
+        return (0, 0)
+
+
+def periodos_de_ids(cursor, ids):
+    """Periodos que tienen hoy en la BD las convocatorias (por si el upsert les cambia la fecha)"""
+    ids = [i for i in ids if i]
+    if not ids:
+        return set()
+    marcadores = ", ".join(["%s"] * len(ids))
+    cursor.execute(f"""
+        SELECT DISTINCT COALESCE(YEAR(fecha_publicacion), 0), COALESCE(MONTH(fecha_publicacion), 0)
+        FROM Licitaciones_Cabecera WHERE id_convocatoria IN ({marcadores})
+    """, ids)
+    return {(int(a), int(m)) for a, m in cursor.fetchall()}
+
+
+def refrescar_cubo(conn, periodos):
+    """Recalcular los periodos indicados. Si la tabla aún no existe, la API la crea al arrancar."""
+    if not periodos:
+        return
+    try:
+        cursor = conn.cursor()
+        for anio, mes in sorted(periodos):
+            cursor.execute(f"DELETE FROM {CUBO_TABLE} WHERE anio = %s AND mes = %s", (anio, mes))
+            if anio:
+                desde = date(anio, mes, 1)
+                hasta = date(anio + 1, 1, 1) if mes == 12 else date(anio, mes + 1, 1)
+                cursor.execute(
+                    SQL_CUBO.format(where_sql="WHERE fecha_publicacion >= %s AND fecha_publicacion < %s"),
+                    (desde, hasta)
+                )
+            else:
+                cursor.execute(SQL_CUBO.format(where_sql="WHERE fecha_publicacion IS NULL"))
+        conn.commit()
+        cursor.close()
+        logging.info(f"📊 Cubo de resumen actualizado: {len(periodos)} periodo(s)")
+    except Error as e:
+        conn.rollback()
+        logging.warning(f"⚠️ No se pudo actualizar {CUBO_TABLE}: {e}")
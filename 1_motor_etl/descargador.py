@@ -1,30 +1,31 @@
 import sys
 import os
-import shutil
 import logging
 import re
+import json
+import time
+import hashlib
 import argparse
 import zipfile
 import gzip
 import requests
 from typing import List, Dict, Optional
+from contextlib import contextmanager
+from urllib.parse import urljoin
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # --- SILENCIADOR NUCLEAR (WDM) ---
 os.environ['WDM_LOG'] = '0'
 
-# --- SELENIUM ---
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException
-from webdriver_manager.chrome import ChromeDriverManager
+# Selenium solo se importa si el descubrimiento por HTTP no encuentra enlaces (ver descubrir_selenium)
 
 # --- 1. CONFIGURACIÓN ---
 URL_BASE_DESCARGAS = "https://contratacionesabiertas.oece.gob.pe/descargas?page=1&paginateBy=100&source=seace_v3&year="
+# API JSON opcional que alimenta el listado; {anio} se reemplaza por el año
+URL_API_DESCARGAS = os.getenv("DESCARGAS_API_URL", "")
+MANIFIESTO_TTL = float(os.getenv("MANIFIESTO_TTL_HORAS", "24")) * 3600
+PATRON_ARCHIVO = re.compile(r"/(json|sha)/(\d{4})/(\d{2})")
+PATRON_ENLACE = re.compile(r"""(?:https?://[^\s"'<>]+)?/api/v1/file/(?:json|sha)/\d{4}/\d{2}[^\s"'<>\\]*""")
 
 HEADERS_HUMANOS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -35,6 +36,8 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(script_dir)
 db_folder_path = os.path.join(parent_dir, "1_database")
 os.makedirs(db_folder_path, exist_ok=True)
+# Fuera de 1_database: cargador.py toma todo 1_database/**/*.json como datos OCDS
+manifiestos_path = os.path.join(parent_dir, "1_manifiestos")
 
 # --- LOGGING ---
 logging.basicConfig(
@@ -43,14 +46,57 @@ logging.basicConfig(
     handlers=[logging.StreamHandler(sys.stderr)]
 )
 logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("selenium").setLevel(logging.WARNING)
 
 if sys.platform.startswith("win"):
     try: sys.stdout.reconfigure(encoding="utf-8")
     except: pass
 
-# --- 2. DRIVER FACTORY ---
-def iniciar_driver() -> Optional[webdriver.Chrome]:
+# --- 2. DESCUBRIMIENTO DE ENLACES ---
+def agrupar_links(urls: List[str], anio: int) -> List[Dict[str, str]]:
+    """Empareja json/sha por mes a partir de las URLs api/v1/file/(json|sha)/AAAA/MM"""
+    links_encontrados = {}
+    for url in urls:
+        match = PATRON_ARCHIVO.search(url)
+        if not match: continue
+        tipo, anio_det, mes_det = match.groups()
+        if anio_det != str(anio): continue
+        links_encontrados.setdefault(mes_det, {})[f"{tipo}_url"] = url
+
+    return [
+        {"nombre_base": f"{anio}-{mes}_seace_v3", "json_url": urls["json_url"], "sha_url": urls.get("sha_url", "")}
+        for mes, urls in sorted(links_encontrados.items()) if "json_url" in urls
+    ]
+
+def descubrir_http(sesion: requests.Session, anio: int) -> List[Dict[str, str]]:
+    """Busca los enlaces en el HTML del listado y, si no están (render en cliente), en la API JSON"""
+    fuentes = [f"{URL_BASE_DESCARGAS}{anio}"]
+    if URL_API_DESCARGAS: fuentes.append(URL_API_DESCARGAS.format(anio=anio))
+
+    for url in fuentes:
+        try:
+            r = sesion.get(url, headers=HEADERS_HUMANOS, timeout=30)
+            r.raise_for_status()
+        except Exception as e:
+            logging.warning(f"⚠️ HTTP sin respuesta en {url}: {e}")
+            continue
+        # En HTML o JSON las rutas aparecen como texto; en JSON pueden venir con '\/'
+        texto = r.text.replace("\\/", "/")
+        urls = [urljoin(url, enlace) for enlace in PATRON_ENLACE.findall(texto)]
+        archivos = agrupar_links(urls, anio)
+        if archivos:
+            return archivos
+    return []
+
+def iniciar_driver():
+    try:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+        from webdriver_manager.chrome import ChromeDriverManager
+    except ImportError as e:
+        logging.error(f"❌ Selenium/webdriver-manager no disponibles: {e}")
+        return None
+
     opts = Options()
     opts.add_argument("--headless=new")
     opts.add_argument("--disable-gpu")
@@ -73,19 +119,26 @@ def iniciar_driver() -> Optional[webdriver.Chrome]:
         logging.critical(f"🔥 Error fatal iniciando Chrome: {e}")
         return None
 
-# --- 3. SCRAPING ---
-def encontrar_links_de_descarga(anios: List[int]) -> List[Dict[str, str]]:
-    lista_final = []
-    
+def descubrir_selenium(anios: List[int]) -> Dict[int, List[Dict[str, str]]]:
+    """Respaldo: renderiza el listado en Chrome headless (lento y pesado)"""
+    try:
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException
+        logging.getLogger("selenium").setLevel(logging.WARNING)
+    except ImportError:
+        logging.error("❌ Selenium no está instalado: no hay respaldo para el descubrimiento")
+        return {}
+
+    resultado = {}
     driver = iniciar_driver()
-    if not driver: return []
+    if not driver: return resultado
     
     try:
-        patron_url = re.compile(r"/(json|sha)/(\d{4})/(\d{2})")
-
         for anio_buscado in anios:
             url_pagina = f"{URL_BASE_DESCARGAS}{anio_buscado}"
-            logging.info(f"🔍 Auditando: {url_pagina}")
+            logging.info(f"🔍 Auditando con Chrome: {url_pagina}")
             
             try:
                 driver.get(url_pagina)
@@ -97,32 +150,14 @@ def encontrar_links_de_descarga(anios: List[int]) -> List[Dict[str, str]]:
                     logging.warning(f"⚠️ Sin datos para el año {anio_buscado}.")
                     continue
 
-                elementos = driver.find_elements(By.TAG_NAME, "a")
-                links_encontrados = {} 
-
-                for elem in elementos:
+                urls = []
+                for elem in driver.find_elements(By.TAG_NAME, "a"):
                     try:
                         url = elem.get_attribute("href")
-                        if not url: continue
-                        
-                        match = patron_url.search(url)
-                        if match:
-                            tipo, anio_det, mes_det = match.groups()
-                            if anio_det != str(anio_buscado): continue
-                            
-                            if mes_det not in links_encontrados: links_encontrados[mes_det] = {}
-                            if tipo == "json": links_encontrados[mes_det]["json_url"] = url
-                            elif tipo == "sha": links_encontrados[mes_det]["sha_url"] = url
+                        if url: urls.append(url)
                     except Exception: 
                         continue 
-
-                for mes, urls in links_encontrados.items():
-                    if "json_url" in urls:
-                        lista_final.append({
-                            "nombre_base": f"{anio_buscado}-{mes}_seace_v3",
-                            "json_url": urls["json_url"],
-                            "sha_url": urls.get("sha_url", "")
-                        })
+                resultado[anio_buscado] = agrupar_links(urls, anio_buscado)
 
             except Exception as e:
                 logging.error(f"❌ Error procesando año {anio_buscado}: {e}")
@@ -130,109 +165,263 @@ def encontrar_links_de_descarga(anios: List[int]) -> List[Dict[str, str]]:
     finally:
         if driver: driver.quit()
         
+    return resultado
+
+# --- 3. MANIFIESTO POR AÑO ---
+def leer_manifiesto(anio: int) -> Optional[Dict]:
+    ruta = os.path.join(manifiestos_path, f"{anio}.json")
+    if not os.path.exists(ruta): return None
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logging.warning(f"⚠️ Manifiesto {anio} ilegible: {e}")
+        return None
+
+def guardar_manifiesto(anio: int, archivos: List[Dict[str, str]], fuente: str) -> None:
+    os.makedirs(manifiestos_path, exist_ok=True)
+    datos = {"anio": anio, "fuente": fuente, "obtenido": time.time(), "archivos": archivos}
+    escribir_atomico(os.path.join(manifiestos_path, f"{anio}.json"), json.dumps(datos, ensure_ascii=False, indent=2))
+
+def encontrar_links_de_descarga(anios: List[int], modo: str = "auto", refrescar: bool = False) -> List[Dict[str, str]]:
+    """
+    modo: auto (manifiesto -> HTTP -> Selenium), http o selenium.
+    Un manifiesto de menos de MANIFIESTO_TTL_HORAS evita tocar la red; uno vencido
+    sirve de último recurso si ningún método encuentra enlaces.
+    """
+    lista_final = []
+    pendientes = []
+    vencidos = {}
+
+    for anio in anios:
+        manifiesto = None if refrescar else leer_manifiesto(anio)
+        if manifiesto and time.time() - manifiesto.get("obtenido", 0) < MANIFIESTO_TTL:
+            logging.info(f"📒 Manifiesto {anio} en caché ({len(manifiesto['archivos'])} archivos, vía {manifiesto.get('fuente')})")
+            lista_final.extend(manifiesto["archivos"])
+            continue
+        if manifiesto: vencidos[anio] = manifiesto
+        pendientes.append(anio)
+
+    if pendientes and modo in ("auto", "http"):
+        with requests.Session() as sesion:
+            for anio in list(pendientes):
+                inicio = time.time()
+                archivos = descubrir_http(sesion, anio)
+                if archivos:
+                    logging.info(f"🔍 {anio}: {len(archivos)} archivos vía HTTP en {time.time() - inicio:.1f}s")
+                    guardar_manifiesto(anio, archivos, "http")
+                    lista_final.extend(archivos)
+                    pendientes.remove(anio)
+
+    if pendientes and modo in ("auto", "selenium"):
+        if modo == "auto": logging.info(f"🌐 HTTP no encontró enlaces para {pendientes}; usando Selenium")
+        for anio, archivos in descubrir_selenium(pendientes).items():
+            if archivos:
+                guardar_manifiesto(anio, archivos, "selenium")
+                lista_final.extend(archivos)
+                pendientes.remove(anio)
+
+    for anio in pendientes:
+        if anio in vencidos:
+            logging.warning(f"⚠️ Usando manifiesto vencido de {anio}")
+            lista_final.extend(vencidos[anio]["archivos"])
+        else:
+            logging.warning(f"⚠️ Sin datos para el año {anio}.")
+
     return lista_final
 
-# --- 4. WORKER DE DESCARGA (BLINDADO + SHA) ---
-def tarea_descarga(archivo_info: Dict[str, str]) -> Dict[str, str]:
+# --- 4. WORKER DE DESCARGA (REANUDABLE + SHA VERIFICADO) ---
+MAX_REINTENTOS = int(os.getenv("DESCARGA_REINTENTOS", "5"))
+TAMANO_BLOQUE = 1024 * 1024
+TAMANO_CHUNK_RED = 64 * 1024  # lo que se pierde como máximo si la conexión se corta
+ALGORITMOS_POR_LARGO = {32: "md5", 40: "sha1", 64: "sha256", 128: "sha512"}
+
+def leer_hash(texto: str) -> Optional[str]:
+    """Primer hash hexadecimal del .sha publicado (formatos 'hash' o 'hash  archivo')"""
+    match = re.search(r"\b([0-9a-fA-F]{32}|[0-9a-fA-F]{40}|[0-9a-fA-F]{64}|[0-9a-fA-F]{128})\b", texto or "")
+    return match.group(1).lower() if match else None
+
+def nuevo_hasher(hash_esperado: Optional[str]):
+    return hashlib.new(ALGORITMOS_POR_LARGO[len(hash_esperado)] if hash_esperado else "sha256")
+
+def hash_archivo(ruta: str, hasher) -> None:
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE), b""):
+            hasher.update(bloque)
+
+def escribir_atomico(ruta: str, texto: str) -> None:
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        f.write(texto)
+    os.replace(ruta + ".tmp", ruta)
+
+def obtener_sha_remoto(sesion: requests.Session, sha_url: str) -> Optional[str]:
+    if not sha_url: return None
+    try:
+        r = sesion.get(sha_url, headers=HEADERS_HUMANOS, timeout=30)
+        if r.status_code == 200:
+            return leer_hash(r.text)
+        logging.warning(f"⚠️ SHA no disponible ({r.status_code}): {sha_url}")
+    except Exception as e:
+        logging.warning(f"⚠️ No se pudo bajar SHA {sha_url}: {e}")
+    return None
+
+def descargar_reanudable(sesion: requests.Session, url: str, ruta_part: str, sha_remoto: Optional[str], stats: Dict) -> None:
+    """
+    Descarga a `ruta_part` continuando desde lo que ya haya en disco (Range + If-Range).
+    Un .meta junto al .part guarda validadores y el SHA esperado: si el remoto cambió,
+    el parcial se descarta. Reintenta cortes de red reanudando, no desde cero.
+    """
+    ruta_meta = ruta_part + ".meta"
+    meta = {}
+    if os.path.exists(ruta_part) and os.path.exists(ruta_meta):
+        with open(ruta_meta, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("url") != url or meta.get("sha") != sha_remoto:
+            logging.info(f"   ↻ El archivo remoto cambió, se descarta el parcial {os.path.basename(ruta_part)}")
+            os.remove(ruta_part)
+            meta = {}
+    elif os.path.exists(ruta_part):
+        os.remove(ruta_part)  # parcial sin validadores: no se puede reanudar con garantías
+
+    stats["reanudado_desde"] = os.path.getsize(ruta_part) if os.path.exists(ruta_part) else 0
+    for intento in range(1, MAX_REINTENTOS + 1):
+        offset = os.path.getsize(ruta_part) if os.path.exists(ruta_part) else 0
+        headers = dict(HEADERS_HUMANOS)
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            validador = meta.get("etag") or meta.get("last_modified")
+            if validador: headers["If-Range"] = validador
+        try:
+            with sesion.get(url, headers=headers, stream=True, timeout=(30, 120)) as r:
+                if r.status_code == 416 and offset:
+                    return  # ya teníamos todo
+                r.raise_for_status()
+                if offset and r.status_code != 206:
+                    logging.info(f"   ↻ El servidor no aceptó Range, reiniciando {os.path.basename(ruta_part)}")
+                    offset = 0
+                meta = {"url": url, "sha": sha_remoto,
+                        "etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+                escribir_atomico(ruta_meta, json.dumps(meta))
+                with open(ruta_part, "ab" if offset else "wb") as f:
+                    for chunk in r.iter_content(chunk_size=TAMANO_CHUNK_RED):
+                        f.write(chunk)
+                        stats["bytes"] += len(chunk)
+            return
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if intento == MAX_REINTENTOS: raise
+            espera = min(60, 2 ** intento)
+            logging.warning(f"   ⚠️ Corte en {os.path.basename(ruta_part)} ({e}). Reanudando en {espera}s...")
+            time.sleep(espera)
+
+@contextmanager
+def abrir_contenido(ruta_part: str):
+    """Stream del JSON: miembro .json del ZIP, GZIP descomprimido o el archivo tal cual"""
+    if zipfile.is_zipfile(ruta_part):
+        with zipfile.ZipFile(ruta_part) as z:
+            interno = next((n for n in z.namelist() if n.endswith(".json")), None)
+            if not interno:
+                raise Exception("ZIP sin JSON")
+            with z.open(interno) as zf:
+                yield zf
+        return
+    with open(ruta_part, "rb") as f_check:
+        es_gzip = f_check.read(2) == b"\x1f\x8b"
+    with (gzip.open(ruta_part, "rb") if es_gzip else open(ruta_part, "rb")) as f:
+        yield f
+
+def tarea_descarga(archivo_info: Dict[str, str]) -> Dict:
     nombre_json = f"{archivo_info['nombre_base']}.json"
     ruta_json_final = os.path.join(db_folder_path, nombre_json)
-    ruta_temp = os.path.join(db_folder_path, f"temp_{nombre_json}")
-    
-    res = {"nombre": archivo_info["nombre_base"], "estado": "UNKNOWN", "mensaje": ""}
-    
-    # 1. Idempotencia JSON
-    json_ok = os.path.exists(ruta_json_final) and os.path.getsize(ruta_json_final) > 0
-    if json_ok:
-        res["estado"] = "OMITIDO"
-        res["mensaje"] = "Ya existe"
-    
-    # Si no existe, lo descargamos
-    if not json_ok:
+    ruta_sha = os.path.join(db_folder_path, f"{archivo_info['nombre_base']}.sha")
+    ruta_part = os.path.join(db_folder_path, f"temp_{archivo_info['nombre_base']}.part")
+    ruta_tmp = os.path.join(db_folder_path, f"temp_{nombre_json}")
+
+    res = {"nombre": archivo_info["nombre_base"], "estado": "UNKNOWN", "mensaje": "",
+           "bytes": 0, "segundos": 0.0, "reanudado_desde": 0}
+
+    with requests.Session() as sesion:
+        # 1. Idempotencia: el JSON local vale mientras el SHA publicado no cambie
+        sha_remoto = obtener_sha_remoto(sesion, archivo_info.get("sha_url"))
+        sha_local = None
+        if os.path.exists(ruta_sha):
+            with open(ruta_sha, encoding="utf-8") as f_sha:
+                sha_local = leer_hash(f_sha.read())
+
+        json_ok = os.path.exists(ruta_json_final) and os.path.getsize(ruta_json_final) > 0
+        if json_ok and (sha_remoto is None or sha_remoto == sha_local):
+            res["estado"] = "OMITIDO"
+            res["mensaje"] = "SHA sin cambios" if sha_remoto else "Ya existe (sin SHA remoto)"
+            return res
+        if json_ok:
+            logging.info(f"🔁 SHA publicado cambió para {nombre_json}, se vuelve a descargar")
+
         try:
+            # 2. Descarga reanudable
             logging.info(f"⬇️ Descargando JSON: {nombre_json}...")
-            
-            with requests.get(archivo_info["json_url"], headers=HEADERS_HUMANOS, stream=True, timeout=600) as r:
-                r.raise_for_status()
-                with open(ruta_temp, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=1024*1024):
-                        f.write(chunk)
-            
-            es_zip = zipfile.is_zipfile(ruta_temp)
-            es_gzip = False
-            with open(ruta_temp, 'rb') as f_check:
-                es_gzip = f_check.read(2) == b'\x1f\x8b'
-
-            if es_zip:
-                with zipfile.ZipFile(ruta_temp) as z:
-                    interno = next((n for n in z.namelist() if n.endswith(".json")), None)
-                    if interno:
-                        with z.open(interno) as zf, open(ruta_json_final, "wb") as fout:
-                            shutil.copyfileobj(zf, fout)
-                    else:
-                        raise Exception("ZIP sin JSON")
-            elif es_gzip:
-                try:
-                    with gzip.open(ruta_temp, 'rb') as f_in, open(ruta_json_final, 'wb') as f_out:
-                        shutil.copyfileobj(f_in, f_out)
-                except Exception as e:
-                    raise Exception(f"Error GZIP: {e}")
-            else:
-                 shutil.move(ruta_temp, ruta_json_final)
-                 
+            inicio = time.time()
+            descargar_reanudable(sesion, archivo_info["json_url"], ruta_part, sha_remoto, res)
+            res["segundos"] = time.time() - inicio
+
+            # 3. Descompresión en streaming, calculando el hash de la salida en la misma pasada
+            hash_crudo = nuevo_hasher(sha_remoto)
+            hash_archivo(ruta_part, hash_crudo)
+            hash_salida = nuevo_hasher(sha_remoto)
+            with abrir_contenido(ruta_part) as f_in, open(ruta_tmp, "wb") as f_out:
+                for bloque in iter(lambda: f_in.read(TAMANO_BLOQUE), b""):
+                    hash_salida.update(bloque)
+                    f_out.write(bloque)
+
+            # 4. Verificación: el SHA publicado puede ser del archivo servido o del JSON
+            if sha_remoto and sha_remoto not in (hash_crudo.hexdigest(), hash_salida.hexdigest()):
+                # Parcial corrupto o truncado: no se reanuda sobre él
+                for ruta in (ruta_part, ruta_part + ".meta"): os.remove(ruta)
+                raise Exception(f"SHA no coincide (esperado {sha_remoto[:12]}…, obtenido {hash_crudo.hexdigest()[:12]}…)")
+            if not sha_remoto:
+                logging.warning(f"⚠️ {nombre_json} sin SHA publicado: no se pudo verificar integridad")
+
+            # 5. Publicación atómica: primero el JSON, luego el SHA que lo acredita
+            os.replace(ruta_tmp, ruta_json_final)
+            escribir_atomico(ruta_sha, sha_remoto or hash_salida.hexdigest())
+            for ruta in (ruta_part, ruta_part + ".meta"):
+                if os.path.exists(ruta): os.remove(ruta)
+
             res["estado"] = "DESCARGADO"
-            
+
         except Exception as e:
             res["estado"] = "FALLO"
             res["mensaje"] = str(e)
             logging.error(f"Error en {nombre_json}: {e}")
-            # Si falla el JSON, nos vamos, no tiene sentido bajar el SHA
-            if os.path.exists(ruta_temp): 
-                try: os.remove(ruta_temp)
+        finally:
+            # El .part se conserva para reanudar; el JSON a medio escribir no
+            if os.path.exists(ruta_tmp):
+                try: os.remove(ruta_tmp)
                 except: pass
-            return res
 
-    # ---------------------------------------------------------
-    # 4. DESCARGA DEL SHA (NUEVO: INTEGRIDAD COMPLETA)
-    # ---------------------------------------------------------
-    sha_url = archivo_info.get("sha_url")
-    if sha_url:
-        nombre_sha = f"{archivo_info['nombre_base']}.sha"
-        ruta_sha = os.path.join(db_folder_path, nombre_sha)
-        
-        # Solo bajamos el SHA si no existe o si acabamos de bajar un JSON nuevo
-        if not os.path.exists(ruta_sha) or res["estado"] == "DESCARGADO":
-            try:
-                # Es un archivo pequeño, no necesitamos stream
-                r_sha = requests.get(sha_url, headers=HEADERS_HUMANOS, timeout=30)
-                if r_sha.status_code == 200:
-                    with open(ruta_sha, "w", encoding="utf-8") as f_sha:
-                        f_sha.write(r_sha.text.strip())
-                    # Solo logueamos si fue una descarga activa
-                    if res["estado"] == "DESCARGADO":
-                        logging.info(f"   ↳ SHA descargado: {nombre_sha}")
-            except Exception as e:
-                # El fallo del SHA no debe marcar el proceso principal como error
-                logging.warning(f"⚠️ Alerta menor: No se pudo bajar SHA para {nombre_json}: {e}")
-
-    # Limpieza final del temporal por si acaso
-    if os.path.exists(ruta_temp): 
-        try: os.remove(ruta_temp)
-        except: pass
-                
     return res
 
+def describir_velocidad(r: Dict) -> str:
+    mb = r["bytes"] / (1024 * 1024)
+    velocidad = mb / r["segundos"] if r["segundos"] else 0
+    reanudado = f", reanudado desde {r['reanudado_desde'] / (1024 * 1024):.1f} MB" if r["reanudado_desde"] else ""
+    return f"{mb:.1f} MB en {r['segundos']:.1f}s ({velocidad:.2f} MB/s{reanudado})"
+
 # --- 5. MAIN ---
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--years", nargs="+", type=int, default=[2024, 2025])
     parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--descubrimiento", choices=["auto", "http", "selenium"], default="auto",
+                        help="auto: HTTP y Selenium solo como respaldo")
+    parser.add_argument("--refrescar-manifiesto", action="store_true", help="Ignora los manifiestos en caché")
     args = parser.parse_args()
     
-    logging.info(f"🚀 DESCARGADOR V3.4 (Integrity Edition + SHA)")
+    logging.info(f"🚀 DESCARGADOR V3.6 (Descubrimiento HTTP + reanudable + SHA)")
     
-    todos = encontrar_links_de_descarga(args.years)
+    todos = encontrar_links_de_descarga(args.years, args.descubrimiento, args.refrescar_manifiesto)
     logging.info(f"📋 Archivos totales a gestionar: {len(todos)}")
     
+    total_bytes = 0
+    inicio = time.time()
     with ThreadPoolExecutor(max_workers=args.workers) as exe:
         futures = {exe.submit(tarea_descarga, item): item for item in todos}
         
@@ -241,14 +430,19 @@ def main():
             try:
                 r = f.result()
                 estado = r['estado']
+                total_bytes += r['bytes']
                 if estado == "DESCARGADO":
-                    print(f"✅ {r['nombre']}")
+                    print(f"✅ {r['nombre']}: {describir_velocidad(r)}")
                 elif estado == "FALLO":
                     print(f"❌ {r['nombre']}: {r['mensaje']}")
                 else:
-                    print(f"⏭️ {r['nombre']} (Omitido)")
+                    print(f"⏭️ {r['nombre']} (Omitido: {r['mensaje']})")
             except Exception as e:
                 print(f"☠️ Error hilo {item['nombre_base']}: {e}")
 
+    dur = time.time() - inicio
+    logging.info(f"📊 Total bajado: {total_bytes / (1024 * 1024):.1f} MB en {dur:.1f}s "
+                 f"({total_bytes / (1024 * 1024) / dur if dur else 0:.2f} MB/s agregados)")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
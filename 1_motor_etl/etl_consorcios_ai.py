@@ -1,13 +1,17 @@
 import mysql.connector
 import requests
-import google.generativeai as genai
 import os
 import sys
-import json
 import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from cache_contratos import CacheContratos, CacheExtracciones
+from extractores_consorcio import crear_extractor
+from generaciones import AvisoGeneracion
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
-import pypdf
 
 # --- CONFIGURACIÓN ---
 if sys.platform.startswith('win'):
@@ -28,35 +32,61 @@ DB_CONFIG = {
     'host': os.getenv("DB_HOST"), 'user': os.getenv("DB_USER"),
     'password': os.getenv("DB_PASS"), 'database': os.getenv("DB_NAME"), 'charset': 'utf8mb4'
 }
-API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not API_KEY:
-    print("❌ Error Fatal: Configura GEMINI_API_KEY en tu .env")
-    sys.exit()
-
-genai.configure(api_key=API_KEY)
+# Pipeline: descargas y llamadas al modelo en pools acotados
+HILOS_DESCARGA = int(os.getenv("CONSORCIOS_HILOS_DESCARGA", "4"))
+HILOS_EXTRACCION = int(os.getenv("CONSORCIOS_HILOS_EXTRACCION", "2"))
+TAMANO_LOTE = 100
 
 # URLs
 URL_METADATA = "https://prod4.seace.gob.pe:9000/api/bus/contrato/idContrato/{}"
 URL_DESCARGA = "https://prod4.seace.gob.pe:9000/api/con/documentos/descargar/{}"
 HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"}
 
-def obtener_pendientes():
+# Metadata compartida con spider_garantias (caché local) y conexión keep-alive
+CACHE_CONTRATOS = CacheContratos()
+SESION = requests.Session()
+
+def hay_cola_spider(cursor):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'spider_trabajos'
+    """)
+    return cursor.fetchone()[0] > 0
+
+def obtener_pendientes(desde=""):
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
         cursor = conn.cursor()
-        # Buscamos contratos 'CONSORCIO' que aún NO tengan detalle en la tabla hija
-        # LIMIT 100 protege tu RAM. El bucle infinito en main() se encarga de pedir más lotes.
-        sql = """
-            SELECT a.id_contrato, a.ganador_nombre 
+        # Lo que el spider aún va a consultar se le deja a él (corre en paralelo, ver
+        # main_auto.py): la API suele traer los consorciados sin PDF ni IA. Son los contratos
+        # con trabajo abierto y los que el spider encolará al arrancar (sin banco ni trabajo).
+        # Si la API no los tenía, entran en la siguiente corrida.
+        filtro_spider = """
+              AND NOT EXISTS (
+                  SELECT 1 FROM spider_trabajos t
+                  WHERE t.id_contrato = a.id_contrato AND t.estado IN ('PENDIENTE', 'EN_PROCESO')
+              )
+              AND NOT (
+                  a.entidad_financiera IS NULL
+                  AND NOT EXISTS (SELECT 1 FROM spider_trabajos t WHERE t.id_adjudicacion = a.id_adjudicacion)
+              )
+        """ if hay_cola_spider(cursor) else ""
+        # Buscamos contratos 'CONSORCIO' que aún NO tengan detalle en la tabla hija.
+        # Se avanza por id_contrato: los que no tienen PDF no vuelven en el mismo ciclo.
+        sql = f"""
+            SELECT DISTINCT a.id_contrato, a.ganador_nombre 
             FROM Licitaciones_Adjudicaciones a
             LEFT JOIN Detalle_Consorcios d ON a.id_contrato = d.id_contrato
             WHERE a.ganador_nombre LIKE '%CONSORCIO%' 
               AND d.id_contrato IS NULL
               AND a.id_contrato IS NOT NULL AND a.id_contrato != ''
-            LIMIT 100
+              AND a.id_contrato > %s
+              {filtro_spider}
+            ORDER BY a.id_contrato
+            LIMIT {TAMANO_LOTE}
         """
-        cursor.execute(sql)
+        cursor.execute(sql, (desde,))
         data = cursor.fetchall()
         conn.close()
         return data
@@ -64,6 +94,9 @@ def obtener_pendientes():
         print(f"Error DB: {e}")
         return []
 
+# Detalle_Consorcios cambia lo que ve la API: generación nueva (a lo sumo cada INTERVALO_GENERACION)
+AVISO_GENERACION = AvisoGeneracion()
+
 def guardar_en_bd(id_contrato, miembros):
     if not miembros: return
     try:
@@ -89,6 +122,7 @@ def guardar_en_bd(id_contrato, miembros):
             datos.append((id_contrato, ruc, nombre[:500], part))
             
         cursor.executemany(sql, datos)
+        AVISO_GENERACION.registrar(cursor)
         conn.commit()
         print(f"   💾 ¡ÉXITO! Guardadas {len(datos)} empresas.")
         conn.close()
@@ -98,9 +132,10 @@ def guardar_en_bd(id_contrato, miembros):
 def descargar_pdf_inteligente(id_contrato):
     try:
         # 1. Metadata
-        r = requests.get(URL_METADATA.format(id_contrato), headers=HEADERS, verify=False, timeout=10)
-        if r.status_code != 200: return None
-        data = r.json()
+        status, data = CACHE_CONTRATOS.obtener(
+            SESION, URL_METADATA.format(id_contrato), id_contrato, headers=HEADERS, verify=False, timeout=10
+        )
+        if status != 200: return None
         
         # 2. Búsqueda de ID (Prioridad al Anexo/Consorcio)
         id_doc = None
@@ -115,7 +150,7 @@ def descargar_pdf_inteligente(id_contrato):
         ruta_final = os.path.join(CARPETA_EVIDENCIA, nombre_archivo)
         
         # 3. Descarga (Stream)
-        with requests.get(URL_DESCARGA.format(id_doc), headers=HEADERS, stream=True, verify=False, timeout=60) as r_down:
+        with SESION.get(URL_DESCARGA.format(id_doc), headers=HEADERS, stream=True, verify=False, timeout=60) as r_down:
             if r_down.status_code == 200:
                 with open(ruta_final, 'wb') as f:
                     for chunk in r_down.iter_content(chunk_size=8192):
@@ -124,151 +159,190 @@ def descargar_pdf_inteligente(id_contrato):
         return None
     except: return None
 
-def recortar_pdf(ruta_origen, max_paginas=12):
-    """ Corta el PDF si es muy pesado para la IA """
-    try:
-        ruta_destino = ruta_origen.replace(".pdf", "_mini.pdf")
-        reader = pypdf.PdfReader(ruta_origen)
-        writer = pypdf.PdfWriter()
-        
-        if len(reader.pages) <= max_paginas:
-            return ruta_origen, False
+def sha256_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloque)
+    return h.hexdigest()
 
-        print(f"   ✂️ Archivo pesado. Recortando primeras {max_paginas} páginas...")
-        for i in range(max_paginas):
-            writer.add_page(reader.pages[i])
-            
-        with open(ruta_destino, "wb") as f_out:
-            writer.write(f_out)
-        return ruta_destino, True
-    except Exception as e:
-        print(f"   ⚠️ Error recortando: {e}")
-        return ruta_origen, False
-
-def analizar_con_ia(ruta_pdf):
-    archivo_a_subir = ruta_pdf
-    es_recorte = False
-
-    # 1. Verificar Peso
-    peso_mb = os.path.getsize(ruta_pdf) / (1024 * 1024)
-    if peso_mb > 25: 
-        print(f"   ⚖️ Detectado archivo de {peso_mb:.2f} MB. Activando recorte...")
-        archivo_a_subir, es_recorte = recortar_pdf(ruta_pdf)
-
-    # 2. Intentos con Backoff
-    intentos = 0
-    while intentos < 3:
-        try:
-            print(f"   🤖 Enviando a Gemini 2.0 Flash (Intento {intentos+1})...")
-            archivo = genai.upload_file(archivo_a_subir, mime_type='application/pdf')
-            
-            # Esperar procesamiento
-            wait_count = 0
-            while archivo.state.name == "PROCESSING":
-                time.sleep(2)
-                archivo = genai.get_file(archivo.name)
-                wait_count += 1
-                if wait_count > 45: raise Exception("Timeout Google Cloud")
-
-            if archivo.state.name == "FAILED": 
-                print("   ❌ Google marcó FAILED.")
-                return None
-
-            # Prompt
-            model = genai.GenerativeModel('gemini-2.0-flash')
-            prompt = """
-            Eres un experto digitador de contratos públicos.
-            Tarea: Extrae los miembros del CONSORCIO (las empresas privadas, no la entidad pública).
-            
-            Salida JSON estricta: 
-            [{"ruc": "...", "nombre": "...", "participacion": 50.0}]
-            
-            Reglas: 
-            - RUC: Solo números. Si no hay, null.
-            - Participación: Número decimal.
-            """
-            
-            res = model.generate_content([archivo, prompt])
-            
-            # Limpieza nube
-            try: genai.delete_file(archivo.name)
-            except: pass
-            
-            # Limpieza recorte local
-            if es_recorte and os.path.exists(archivo_a_subir):
-                try: os.remove(archivo_a_subir)
-                except: pass
-
-            texto = res.text.replace("```json", "").replace("```", "").strip()
-            return json.loads(texto)
-
-        except Exception as e:
-            msg = str(e)
-            if "429" in msg or "Resource exhausted" in msg:
-                print(f"   🛑 Tráfico alto (429). Esperando 30s...")
-                time.sleep(30)
-                intentos += 1
-            elif "400" in msg:
-                 print("   ❌ Error 400 (Archivo corrupto/complejo).")
-                 return None
-            else:
-                print(f"   ⚠️ Error IA: {e}")
-                return None
-    return None
+def borrar(ruta):
+    if ruta and os.path.exists(ruta):
+        try: os.remove(ruta)
+        except: pass
 
-def main():
-    print("🚀 ETL CONSORCIOS CON IA (MODO MASIVO AUTOMÁTICO)")
-    
-    ciclo = 1
-    while True:
-        print(f"\n🔄 INICIANDO CICLO #{ciclo}")
-        
-        # 1. Pedir lote
-        pendientes = obtener_pendientes()
-        
-        if not pendientes:
-            print("\n🏁 ¡FELICIDADES! No quedan contratos pendientes.")
-            print("   La base de datos está al día.")
-            break 
-            
-        print(f"🎯 Procesando lote de {len(pendientes)} contratos...")
-        
-        # 2. Procesar lote
-        for id_contrato, nombre_ganador in pendientes:
-            print(f"\n🔍 Contrato: {id_contrato} ({nombre_ganador})")
-            
-            ruta_pdf = None
+# --- MÉTRICAS ---
+class MetricasEtapa:
+    """Cantidad, latencia (media / p95) y rendimiento de una etapa del pipeline"""
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.latencias = []
+        self.fallos = 0
+        self.inicio = None
+        self.fin = None
+        self._lock = threading.Lock()
+
+    def medir(self, funcion):
+        def envuelta(*args):
+            t0 = time.time()
+            with self._lock:
+                if self.inicio is None: self.inicio = t0
             try:
-                ruta_pdf = descargar_pdf_inteligente(id_contrato)
-                if not ruta_pdf:
-                    print("   ⏩ Saltando (Sin PDF disponible).")
-                    continue
-                    
-                datos = analizar_con_ia(ruta_pdf)
-                
-                if datos:
-                    guardar_en_bd(id_contrato, datos)
-                else:
-                    print("   ⚠️ Sin datos extraídos.")
-
-            except Exception as e:
-                print(f"   ☠️ Error ciclo: {e}")
-
-            finally:
-                # 3. Limpieza Forzosa
-                if ruta_pdf and os.path.exists(ruta_pdf):
-                    try:
-                        time.sleep(0.5) 
-                        os.remove(ruta_pdf)
-                        print("   🗑️ PDF eliminado.")
-                    except: pass
-            
-            # Pausa táctica
-            time.sleep(2)
-        
-        print(f"✅ CICLO #{ciclo} COMPLETADO. Descansando 5 segundos...")
-        time.sleep(5)
-        ciclo += 1
+                resultado = funcion(*args)
+            except Exception:
+                resultado = None
+            t1 = time.time()
+            with self._lock:
+                self.latencias.append(t1 - t0)
+                if resultado is None: self.fallos += 1
+                self.fin = max(self.fin or t1, t1)
+            return resultado
+        return envuelta
+
+    def resumen(self):
+        n = len(self.latencias)
+        if not n: return f"{self.nombre:<11} sin trabajo"
+        orden = sorted(self.latencias)
+        p95 = orden[min(n - 1, int(n * 0.95))]
+        pared = (self.fin - self.inicio) or 1e-9
+        return (f"{self.nombre:<11} {n:>5} ops  media {sum(orden) / n:6.2f}s  p95 {p95:6.2f}s  "
+                f"{n / pared:6.2f} ops/s  fallos {self.fallos}")
+
+# --- PIPELINE ---
+class PipelineConsorcios:
+    """
+    descarga (pool) -> SHA-256 -> caché/dedup -> extracción (pool) -> BD
+
+    PDFs idénticos (mismo hash) se analizan una vez: si ya hay resultado en la
+    caché se reutiliza, y si otro contrato del lote lo está analizando se espera
+    ese mismo resultado.
+    """
+
+    def __init__(self, extractor, guardar=True, hilos_descarga=HILOS_DESCARGA, hilos_extraccion=HILOS_EXTRACCION):
+        self.extractor = extractor
+        self.guardar = guardar
+        self.cache = CacheExtracciones()
+        self.pool_descarga = ThreadPoolExecutor(max_workers=hilos_descarga, thread_name_prefix="descarga")
+        self.pool_extraccion = ThreadPoolExecutor(max_workers=hilos_extraccion, thread_name_prefix="extraccion")
+        self.metricas = {n: MetricasEtapa(n) for n in ("descarga", "extraccion")}
+        self.contadores = {"contratos": 0, "sin_pdf": 0, "cache": 0, "duplicados": 0, "guardados": 0}
+
+    def procesar_lote(self, trabajos, descargar=descargar_pdf_inteligente, borrar_pdf=True):
+        """trabajos: [(id_contrato, nombre_ganador)]"""
+        descargas = {
+            self.pool_descarga.submit(self.metricas["descarga"].medir(descargar), id_contrato): id_contrato
+            for id_contrato, _ in trabajos
+        }
+        en_vuelo = {}   # sha -> future de extracción (un solo análisis por PDF)
+        esperando = []  # (id_contrato, sha, ruta, future, es_primero)
+
+        for futuro in as_completed(descargas):
+            id_contrato = descargas[futuro]
+            self.contadores["contratos"] += 1
+            ruta_pdf = futuro.result()
+            if not ruta_pdf:
+                self.contadores["sin_pdf"] += 1
+                continue
+
+            sha = sha256_archivo(ruta_pdf)
+            previo = self.cache.buscar(sha, self.extractor.nombre)
+            if previo is not None:
+                self.contadores["cache"] += 1
+                self._guardar(id_contrato, previo)
+                if borrar_pdf: borrar(ruta_pdf)
+                continue
+
+            if sha in en_vuelo:
+                self.contadores["duplicados"] += 1
+                esperando.append((id_contrato, sha, ruta_pdf, en_vuelo[sha], False))
+                continue
+
+            en_vuelo[sha] = self.pool_extraccion.submit(self.metricas["extraccion"].medir(self.extractor.extraer), ruta_pdf)
+            esperando.append((id_contrato, sha, ruta_pdf, en_vuelo[sha], True))
+
+        for id_contrato, sha, ruta_pdf, futuro, es_primero in esperando:
+            datos = futuro.result()
+            # None = falló (se reintenta en otra corrida); [] = analizado, sin consorciados
+            if es_primero and datos is not None:
+                self.cache.guardar(sha, self.extractor.nombre, datos)
+            self._guardar(id_contrato, datos)
+            if borrar_pdf: borrar(ruta_pdf)
+
+    def _guardar(self, id_contrato, datos):
+        if not datos: return
+        self.contadores["guardados"] += 1
+        if self.guardar:
+            guardar_en_bd(id_contrato, datos)
+
+    def reporte(self):
+        c = self.contadores
+        print("\n📊 MÉTRICAS DEL PIPELINE")
+        for m in self.metricas.values():
+            print(f"   {m.resumen()}")
+        if hasattr(self.extractor, "resumen"):
+            print(f"   extractor {self.extractor.nombre}: {self.extractor.resumen()}")
+        print(f"   contratos {c['contratos']} | sin PDF {c['sin_pdf']} | desde caché {c['cache']} | "
+              f"duplicados en lote {c['duplicados']} | con consorciados {c['guardados']}")
+
+    def cerrar(self):
+        self.pool_descarga.shutdown()
+        self.pool_extraccion.shutdown()
+        self.cache.cerrar()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--extractor", default=None, help="local (por defecto, con respaldo CONSORCIOS_RESPALDO), gemini o stub")
+    parser.add_argument("--carpeta", help="Benchmark offline: procesa los PDF de esta carpeta sin SEACE ni BD")
+    args = parser.parse_args()
+
+    print("🚀 ETL CONSORCIOS CON IA (PIPELINE PARALELO)")
+    try:
+        extractor = crear_extractor(args.extractor)
+    except Exception as e:
+        print(f"❌ Error Fatal: {e}")
+        sys.exit()
+
+    inicio = time.time()
+
+    if args.carpeta:
+        pipeline = PipelineConsorcios(extractor, guardar=False)
+        pdfs = sorted(f for f in os.listdir(args.carpeta) if f.lower().endswith(".pdf"))
+        print(f"🧪 Modo offline: {len(pdfs)} PDF con extractor {extractor.nombre}")
+        pipeline.procesar_lote(
+            [(os.path.join(args.carpeta, f), None) for f in pdfs],
+            descargar=lambda ruta: ruta, borrar_pdf=False
+        )
+    else:
+        pipeline = PipelineConsorcios(extractor)
+        ciclo = 1
+        ultimo = ""
+        while True:
+            print(f"\n🔄 INICIANDO CICLO #{ciclo}")
+
+            # 1. Pedir lote
+            pendientes = obtener_pendientes(ultimo)
+
+            if not pendientes:
+                print("\n🏁 ¡FELICIDADES! No quedan contratos pendientes.")
+                print("   La base de datos está al día.")
+                break
+
+            print(f"🎯 Procesando lote de {len(pendientes)} contratos...")
+            pipeline.procesar_lote(pendientes)
+            ultimo = pendientes[-1][0]
+
+            print(f"✅ CICLO #{ciclo} COMPLETADO.")
+            ciclo += 1
+
+    pipeline.reporte()
+    pipeline.cerrar()
+    if AVISO_GENERACION.pendiente:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        AVISO_GENERACION.cerrar(conn)
+        conn.close()
+    print(f"   Caché de contratos: {CACHE_CONTRATOS.resumen()}")
+    print(f"⏱️ Total: {time.time() - inicio:.1f}s")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -10,6 +10,8 @@ import json
 import time
 import base64
 from dotenv import load_dotenv
+from cache_contratos import CacheContratos
+from generaciones import AvisoGeneracion
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 from openai import OpenAI
 
@@ -46,6 +48,10 @@ URL_METADATA = "https://prod4.seace.gob.pe:9000/api/bus/contrato/idContrato/{}"
 URL_DESCARGA = "https://prod4.seace.gob.pe:9000/api/con/documentos/descargar/{}"
 HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
 
+# Metadata compartida con spider_garantias (caché local) y conexión keep-alive
+CACHE_CONTRATOS = CacheContratos()
+SESION = requests.Session()
+
 def obtener_pendientes():
     try:
         conn = mysql.connector.connect(**DB_CONFIG)
@@ -67,6 +73,9 @@ def obtener_pendientes():
         print(f"Error DB: {e}")
         return []
 
+# Detalle_Consorcios cambia lo que ve la API: generación nueva (a lo sumo cada INTERVALO_GENERACION)
+AVISO_GENERACION = AvisoGeneracion()
+
 def guardar_en_bd(id_contrato, miembros):
     if not miembros: return
     try:
@@ -89,6 +98,7 @@ def guardar_en_bd(id_contrato, miembros):
             datos.append((id_contrato, ruc, nombre, part))
             
         cursor.executemany(sql, datos)
+        AVISO_GENERACION.registrar(cursor)
         conn.commit()
         print(f"   💾 ¡ÉXITO! Guardadas {len(datos)} empresas.")
         conn.close()
@@ -98,9 +108,10 @@ def guardar_en_bd(id_contrato, miembros):
 def descargar_pdf(id_contrato):
     try:
         # 1. Metadata
-        r = requests.get(URL_METADATA.format(id_contrato), headers=HEADERS, verify=False, timeout=10)
-        if r.status_code != 200: return None
-        data = r.json()
+        status, data = CACHE_CONTRATOS.obtener(
+            SESION, URL_METADATA.format(id_contrato), id_contrato, headers=HEADERS, verify=False, timeout=10
+        )
+        if status != 200: return None
         
         # 2. Buscar ID del PDF
         id_doc = None
@@ -117,7 +128,7 @@ def descargar_pdf(id_contrato):
         ruta_final = os.path.join(CARPETA_EVIDENCIA, nombre_archivo)
         
         # 3. Descargar
-        with requests.get(URL_DESCARGA.format(id_doc), headers=HEADERS, stream=True, verify=False, timeout=60) as r_down:
+        with SESION.get(URL_DESCARGA.format(id_doc), headers=HEADERS, stream=True, verify=False, timeout=60) as r_down:
             if r_down.status_code == 200:
                 with open(ruta_final, 'wb') as f:
                     for chunk in r_down.iter_content(chunk_size=8192):
@@ -264,6 +275,11 @@ def main():
         time.sleep(3)
         ciclo += 1
     
+    if AVISO_GENERACION.pendiente:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        AVISO_GENERACION.cerrar(conn)
+        conn.close()
+    
     print(f"\n🎉 PROCESO FINALIZADO")
     print(f"   Total contratos procesados: {total_procesados}")
     print(f"   Consorcios con datos extraídos: {total_exitosos}")
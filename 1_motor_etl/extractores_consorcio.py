@@ -0,0 +1,268 @@
+"""
+Extractores de miembros de consorcio a partir del PDF del contrato.
+
+Todos exponen `nombre` y `extraer(ruta_pdf)` -> [{"ruc", "nombre", "participacion"}],
+[] si el documento no trae consorciados, o None si falló (se puede reintentar).
+
+- ExtractorLocal: lee la capa de texto con pypdf (RUC de 11 dígitos y % de participación)
+  y solo llama al modelo de respaldo con las páginas relevantes si la confianza es baja
+- ExtractorGemini: sube el PDF a Gemini (el SDK se importa y configura al crearlo)
+- ExtractorStub: sin red; latencia fija y resultado de un .json junto al PDF, para
+  medir el pipeline offline (CONSORCIOS_EXTRACTOR=stub)
+"""
+import os
+import re
+import json
+import time
+import pypdf
+from collections import Counter
+
+PROMPT_CONSORCIO = """
+            Eres un experto digitador de contratos públicos.
+            Tarea: Extrae los miembros del CONSORCIO (las empresas privadas, no la entidad pública).
+
+            Salida JSON estricta:
+            [{"ruc": "...", "nombre": "...", "participacion": 50.0}]
+
+            Reglas:
+            - RUC: Solo números. Si no hay, null.
+            - Participación: Número decimal.
+            """
+
+def recortar_pdf(ruta_origen, max_paginas=12):
+    """ Corta el PDF si es muy pesado para la IA """
+    try:
+        ruta_destino = ruta_origen.replace(".pdf", "_mini.pdf")
+        reader = pypdf.PdfReader(ruta_origen)
+        writer = pypdf.PdfWriter()
+
+        if len(reader.pages) <= max_paginas:
+            return ruta_origen, False
+
+        print(f"   ✂️ Archivo pesado. Recortando primeras {max_paginas} páginas...")
+        for i in range(max_paginas):
+            writer.add_page(reader.pages[i])
+
+        with open(ruta_destino, "wb") as f_out:
+            writer.write(f_out)
+        return ruta_destino, True
+    except Exception as e:
+        print(f"   ⚠️ Error recortando: {e}")
+        return ruta_origen, False
+
+class ExtractorConsorcio:
+    nombre = "base"
+
+    def extraer(self, ruta_pdf):
+        raise NotImplementedError
+
+class ExtractorGemini(ExtractorConsorcio):
+    nombre = "gemini-2.0-flash"
+
+    def __init__(self, api_key=None):
+        import google.generativeai as genai
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise RuntimeError("Configura GEMINI_API_KEY en tu .env")
+        genai.configure(api_key=api_key)
+        self.genai = genai
+
+    def extraer(self, ruta_pdf):
+        genai = self.genai
+        archivo_a_subir = ruta_pdf
+        es_recorte = False
+
+        # 1. Verificar Peso
+        peso_mb = os.path.getsize(ruta_pdf) / (1024 * 1024)
+        if peso_mb > 25:
+            print(f"   ⚖️ Detectado archivo de {peso_mb:.2f} MB. Activando recorte...")
+            archivo_a_subir, es_recorte = recortar_pdf(ruta_pdf)
+
+        # 2. Intentos con Backoff
+        intentos = 0
+        try:
+            while intentos < 3:
+                try:
+                    archivo = genai.upload_file(archivo_a_subir, mime_type='application/pdf')
+
+                    # Esperar procesamiento
+                    wait_count = 0
+                    while archivo.state.name == "PROCESSING":
+                        time.sleep(2)
+                        archivo = genai.get_file(archivo.name)
+                        wait_count += 1
+                        if wait_count > 45: raise Exception("Timeout Google Cloud")
+
+                    if archivo.state.name == "FAILED":
+                        print("   ❌ Google marcó FAILED.")
+                        return None
+
+                    model = genai.GenerativeModel(self.nombre)
+                    res = model.generate_content([archivo, PROMPT_CONSORCIO])
+
+                    # Limpieza nube
+                    try: genai.delete_file(archivo.name)
+                    except: pass
+
+                    texto = res.text.replace("```json", "").replace("```", "").strip()
+                    return json.loads(texto)
+
+                except Exception as e:
+                    msg = str(e)
+                    if "429" in msg or "Resource exhausted" in msg:
+                        print(f"   🛑 Tráfico alto (429). Esperando 30s...")
+                        time.sleep(30)
+                        intentos += 1
+                    elif "400" in msg:
+                         print("   ❌ Error 400 (Archivo corrupto/complejo).")
+                         return None
+                    else:
+                        print(f"   ⚠️ Error IA: {e}")
+                        return None
+            return None
+        finally:
+            # Limpieza recorte local
+            if es_recorte and os.path.exists(archivo_a_subir):
+                try: os.remove(archivo_a_subir)
+                except: pass
+
+# --- EXTRACCIÓN LOCAL ---
+RE_RUC = re.compile(r"(?<!\d)((?:10|15|17|20)\d{9})(?!\d)")
+RE_PORCENTAJE = re.compile(r"(\d{1,3}(?:[.,]\d{1,2})?)\s*%")
+RE_ETIQUETA_RUC = re.compile(r"(?:\b(?:IDENTIFICAD[OA]\s+)?CON\s+)?R\.?\s?U\.?\s?C\.?\s*(?:N[°º.]?|NRO\.?)?\s*:?\s*$", re.I)
+PALABRAS_ENTIDAD = ("ENTIDAD", "MUNICIPALIDAD", "GOBIERNO REGIONAL", "MINISTERIO", "PROGRAMA", "UNIDAD EJECUTORA", "SUPERINTENDENCIA")
+MAX_PAGINAS_TEXTO = 40
+
+def limpiar_nombre(texto):
+    texto = RE_ETIQUETA_RUC.sub("", texto)
+    texto = re.sub(r"^[\s\-–•*\d.)]+", "", texto)           # viñetas y numeración
+    texto = re.sub(r"[\s,;:(\-–]+$", "", texto)
+    return " ".join(texto.split()).upper()
+
+def miembros_en_texto(texto):
+    """[{"ruc", "nombre", "participacion"}] a partir de líneas con RUC de empresa"""
+    lineas = [l.strip() for l in texto.splitlines()]
+    miembros = {}
+    for i, linea in enumerate(lineas):
+        for m in RE_RUC.finditer(linea):
+            ruc = m.group(1)
+            contexto = " ".join(lineas[max(0, i - 1):i + 1]).upper()
+            if ruc in miembros or any(p in contexto for p in PALABRAS_ENTIDAD):
+                continue
+
+            nombre = limpiar_nombre(linea[:m.start()])
+            if len(re.sub(r"[^A-ZÁÉÍÓÚÑ]", "", nombre)) < 3 and i > 0:
+                nombre = limpiar_nombre(lineas[i - 1])
+
+            resto = linea[m.end():] + " " + (lineas[i + 1] if i + 1 < len(lineas) else "")
+            # El % debe estar antes del siguiente RUC para no robarlo al otro miembro
+            siguiente = RE_RUC.search(resto)
+            pct = RE_PORCENTAJE.search(resto[:siguiente.start()] if siguiente else resto)
+            participacion = float(pct.group(1).replace(",", ".")) if pct else None
+
+            miembros[ruc] = {"ruc": ruc, "nombre": nombre or None, "participacion": participacion}
+    return list(miembros.values())
+
+def confianza(miembros):
+    """0..1: al menos dos miembros con nombre, todos con % y que sumen 100"""
+    if not miembros: return 0.0
+    puntaje = 0.3 if len(miembros) >= 2 else 0.1
+    if all(m["nombre"] for m in miembros): puntaje += 0.2
+    porcentajes = [m["participacion"] for m in miembros]
+    if all(p is not None for p in porcentajes):
+        puntaje += 0.2
+        if abs(sum(porcentajes) - 100) <= 0.5: puntaje += 0.3
+    return round(puntaje, 2)
+
+def paginas_relevantes(textos):
+    """Índices de páginas que hablan del consorcio y traen RUC o %, más la siguiente (tablas partidas)"""
+    paginas = set()
+    for i, texto in enumerate(textos):
+        mayus = texto.upper()
+        if "CONSORCI" in mayus and (RE_RUC.search(texto) or "PARTICIPACI" in mayus):
+            paginas.update({i, i + 1})
+    return sorted(p for p in paginas if p < len(textos))
+
+class ExtractorLocal(ExtractorConsorcio):
+    """
+    Pre-pase determinista sobre la capa de texto. Con confianza >= `umbral` responde
+    sin red; si no, envía al extractor de respaldo un PDF con solo las páginas relevantes
+    (o el documento completo si no hay texto, p. ej. escaneos).
+    """
+
+    def __init__(self, respaldo=None, umbral=None):
+        self.umbral = float(os.getenv("CONSORCIOS_CONFIANZA_MIN", "0.8") if umbral is None else umbral)
+        self._respaldo = respaldo
+        nombre_respaldo = respaldo.nombre if respaldo else os.getenv("CONSORCIOS_RESPALDO", "gemini").lower()
+        self.nombre = f"local-v1+{nombre_respaldo}"
+        self.stats = Counter()
+
+    @property
+    def respaldo(self):
+        # El SDK del modelo solo se carga si algún documento lo necesita
+        if self._respaldo is None:
+            nombre = os.getenv("CONSORCIOS_RESPALDO", "gemini").lower()
+            self._respaldo = False if nombre == "ninguno" else crear_extractor(nombre)
+        return self._respaldo
+
+    def extraer(self, ruta_pdf):
+        try:
+            reader = pypdf.PdfReader(ruta_pdf)
+            textos = [pagina.extract_text() or "" for pagina in reader.pages[:MAX_PAGINAS_TEXTO]]
+        except Exception as e:
+            print(f"   ⚠️ pypdf no pudo leer {os.path.basename(ruta_pdf)}: {e}")
+            reader, textos = None, []
+
+        relevantes = paginas_relevantes(textos)
+        miembros = miembros_en_texto("\n".join(textos[i] for i in relevantes))
+        puntaje = confianza(miembros)
+
+        if puntaje >= self.umbral:
+            self.stats["local"] += 1
+            return miembros
+        if not self.respaldo:
+            self.stats["sin_respaldo"] += 1
+            return miembros
+
+        self.stats["respaldo"] += 1
+        ruta_envio = ruta_pdf
+        if reader is not None and relevantes and len(relevantes) < len(reader.pages):
+            ruta_envio = ruta_pdf.replace(".pdf", "_paginas.pdf")
+            writer = pypdf.PdfWriter()
+            for i in relevantes:
+                writer.add_page(reader.pages[i])
+            with open(ruta_envio, "wb") as f_out:
+                writer.write(f_out)
+            self.stats["paginas_enviadas"] += len(relevantes)
+        try:
+            return self.respaldo.extraer(ruta_envio)
+        finally:
+            if ruta_envio != ruta_pdf and os.path.exists(ruta_envio):
+                try: os.remove(ruta_envio)
+                except: pass
+
+    def resumen(self):
+        return ", ".join(f"{k}={v}" for k, v in sorted(self.stats.items())) or "sin documentos"
+
+class ExtractorStub(ExtractorConsorcio):
+    """Sin red: espera `latencia` segundos y devuelve <pdf>.json si existe, si no []"""
+    nombre = "stub"
+
+    def __init__(self, latencia=None):
+        self.latencia = float(os.getenv("STUB_LATENCIA", "0.5") if latencia is None else latencia)
+
+    def extraer(self, ruta_pdf):
+        time.sleep(self.latencia)
+        ruta_json = os.path.splitext(ruta_pdf)[0] + ".json"
+        if os.path.exists(ruta_json):
+            with open(ruta_json, encoding="utf-8") as f:
+                return json.load(f)
+        return []
+
+EXTRACTORES = {"local": ExtractorLocal, "gemini": ExtractorGemini, "stub": ExtractorStub}
+
+def crear_extractor(nombre=None):
+    nombre = (nombre or os.getenv("CONSORCIOS_EXTRACTOR", "local")).lower()
+    if nombre not in EXTRACTORES:
+        raise ValueError(f"Extractor desconocido: {nombre} (opciones: {', '.join(EXTRACTORES)})")
+    return EXTRACTORES[nombre]()
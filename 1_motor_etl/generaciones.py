@@ -0,0 +1,78 @@
+"""
+Generación de datos compartida con la API (control_generaciones, ver app/services/data_version.py).
+
+Cada proceso que escribe licitaciones, bancos o consorcios la incrementa para que la API
+reconstruya el catálogo de filtros, el índice de sugerencias y sus cachés.
+"""
+import os
+import time
+import logging
+import threading
+from mysql.connector import Error
+
+# Segundos mínimos entre incrementos de un proceso que escribe en lotes (spider, consorcios):
+# cada incremento invalida las cachés de la API
+INTERVALO_GENERACION = float(os.getenv("ETL_INTERVALO_GENERACION", "60"))
+
+def crear_tabla_generaciones(cursor):
+    """DDL: hace commit implícito, llamar fuera de una transacción de datos"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS control_generaciones (
+            ambito VARCHAR(50) PRIMARY KEY,
+            generacion BIGINT NOT NULL DEFAULT 0,
+            actualizado DATETIME
+        )
+    """)
+
+def incrementar_generacion(cursor):
+    """Dentro de la transacción del llamador; un fallo se registra sin abortar la escritura"""
+    try:
+        cursor.execute("""
+            INSERT INTO control_generaciones (ambito, generacion, actualizado)
+            VALUES ('licitaciones', 1, NOW())
+            ON DUPLICATE KEY UPDATE generacion = generacion + 1, actualizado = NOW()
+        """)
+        return True
+    except Error as e:
+        logging.warning(f"⚠️ No se pudo actualizar control_generaciones: {e}")
+        return False
+
+def notificar_nueva_generacion(conn):
+    """Avisa a la API (índices y cachés en memoria) que los datos cambiaron"""
+    try:
+        cursor = conn.cursor()
+        crear_tabla_generaciones(cursor)
+        incrementar_generacion(cursor)
+        conn.commit()
+        cursor.close()
+    except Error as e:
+        logging.warning(f"⚠️ No se pudo actualizar control_generaciones: {e}")
+
+class AvisoGeneracion:
+    """
+    Para escritores que confirman muchos lotes pequeños: incrementa como mucho cada
+    `intervalo` segundos y deja lo demás pendiente para cerrar(). Seguro entre hilos.
+    """
+
+    def __init__(self, intervalo=INTERVALO_GENERACION):
+        self.intervalo = intervalo
+        self.ultimo = None
+        self.pendiente = False
+        self._lock = threading.Lock()
+
+    def registrar(self, cursor):
+        """Llamar en la transacción que cambió filas, antes de su commit"""
+        with self._lock:
+            ahora = time.monotonic()
+            if self.ultimo is not None and ahora - self.ultimo < self.intervalo:
+                self.pendiente = True
+                return
+            self.ultimo = ahora
+            self.pendiente = False
+        if not incrementar_generacion(cursor):
+            self.pendiente = True
+
+    def cerrar(self, conn):
+        if self.pendiente:
+            notificar_nueva_generacion(conn)
+            self.pendiente = False
@@ -0,0 +1,106 @@
+"""
+Lector OCDS por eventos para el cargador.
+
+- Usa el backend C de ijson (yajl2_c) si está instalado; si no, el mejor disponible
+  (se puede forzar con IJSON_BACKEND=yajl2_c|yajl2_cffi|yajl2|python)
+- Filtra a nivel de eventos: en cuanto aparece tender.procurementMethodDetails
+  distinto del buscado, el resto del registro se salta sin construir objetos
+- Solo arma los campos que mapea el cargador (tender, buyer, parties, awards,
+  contracts y date del compiledRelease, más el ocid del registro)
+- Lleva estadísticas (leídos, aceptados, segundos de parseo) para comparar backends
+"""
+import os
+import time
+import ijson
+from ijson.common import ObjectBuilder
+
+CAMPOS_RELEASE = {'tender', 'buyer', 'parties', 'awards', 'contracts', 'date'}
+RAICES = ('records.item', 'item')  # {"records": [...]} o un arreglo suelto
+ORDEN_BACKENDS = ('yajl2_c', 'yajl2_cffi', 'yajl2', 'python')
+
+def elegir_backend():
+    """Backend de ijson más rápido disponible (o el indicado en IJSON_BACKEND)"""
+    preferido = os.getenv("IJSON_BACKEND")
+    candidatos = ((preferido,) if preferido else ()) + ORDEN_BACKENDS
+    for nombre in candidatos:
+        try:
+            return ijson.get_backend(nombre)
+        except Exception:
+            continue
+    return ijson
+
+def nombre_backend(backend):
+    return getattr(backend, 'backend_name', None) or getattr(backend, 'backend', 'desconocido')
+
+class EstadisticasLectura:
+    """Contadores de una lectura: registros leídos/aceptados y tiempo de parseo puro"""
+
+    def __init__(self, backend):
+        self.backend = nombre_backend(backend)
+        self.leidos = 0
+        self.aceptados = 0
+        self.segundos = 0.0
+
+    @property
+    def registros_por_segundo(self):
+        return self.leidos / self.segundos if self.segundos else 0.0
+
+    def resumen(self, nombre):
+        return (f"⚡ {nombre}: {self.leidos} registros leídos, {self.aceptados} aceptados, "
+                f"{self.segundos:.2f}s de parseo ({self.registros_por_segundo:.0f} reg/s, backend {self.backend})")
+
+def leer_proyectado(f, tipo_procedimiento, backend=None, stats=None):
+    """
+    Genera registros {'ocid', 'compiledRelease': {...}} con solo los campos proyectados,
+    descartando en el flujo de eventos los de otro tipo de procedimiento.
+    El tiempo de parseo excluye lo que tarde el consumidor entre registros.
+    """
+    backend = backend or elegir_backend()
+    stats = stats or EstadisticasLectura(backend)
+
+    raiz = None
+    registro = None
+    builders = {}
+    descartado = False
+    pref_release = pref_tipo = pref_ocid = ""
+
+    t0 = time.perf_counter()
+    for prefix, event, value in backend.parse(f, use_float=True):
+        if registro is None:
+            if event == 'start_map' and (prefix == raiz or (raiz is None and prefix in RAICES)):
+                raiz = prefix
+                pref_release = raiz + '.compiledRelease.'
+                pref_tipo = pref_release + 'tender.procurementMethodDetails'
+                pref_ocid = raiz + '.ocid'
+                registro, builders, descartado = {}, {}, False
+            continue
+
+        if prefix == raiz and event == 'end_map':
+            stats.leidos += 1
+            if not descartado:
+                registro['compiledRelease'] = {campo: b.value for campo, b in builders.items()}
+                stats.aceptados += 1
+                stats.segundos += time.perf_counter() - t0
+                yield registro
+                t0 = time.perf_counter()
+            registro = None
+            continue
+
+        if descartado:
+            continue
+
+        if prefix == pref_tipo and value != tipo_procedimiento:
+            descartado, builders = True, {}
+            continue
+
+        if prefix == pref_ocid:
+            registro['ocid'] = value
+        elif prefix.startswith(pref_release):
+            campo = prefix[len(pref_release):].split('.', 1)[0]
+            if campo in CAMPOS_RELEASE:
+                b = builders.get(campo)
+                if b is None:
+                    b = builders[campo] = ObjectBuilder()
+                b.event(event, value)
+
+    stats.segundos += time.perf_counter() - t0
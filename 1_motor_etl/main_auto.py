@@ -2,9 +2,14 @@ import subprocess
 import sys
 import os
 import time
+import uuid
 import smtplib
 import logging
+import argparse
+import threading
 import re  # <--- Importamos Regex
+import mysql.connector
+from collections import deque
 from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -24,14 +29,29 @@ def sanitizar(texto):
     return texto.encode('utf-8', 'ignore').decode('utf-8')
 
 # LIMPIEZA PREVENTIVA DE PIPELINE
+# DAG: una etapa arranca cuando todas sus dependencias terminaron OK. Bancos y consorcios
+# solo dependen de la carga, así que corren en paralelo; consorcios omite los contratos que
+# el spider aún tiene en cola (la API los resuelve sin PDF) y los retoma en la corrida siguiente.
 PIPELINE = [
-    {"archivo": "descargador.py", "nombre": sanitizar("1. DESCARGA (SEACE)"), "critico": True},
-    {"archivo": "cargador.py",    "nombre": sanitizar("2. CARGA (MySQL)"),    "critico": True},
-    {"archivo": "spider_garantias.py", "nombre": sanitizar("3. ENRIQUECIMIENTO (Bancos)"), "critico": False},
+    {"id": "descarga",   "archivo": "descargador.py", "nombre": sanitizar("1. DESCARGA (SEACE)"), "critico": True, "depende": []},
+    {"id": "carga",      "archivo": "cargador.py",    "nombre": sanitizar("2. CARGA (MySQL)"),    "critico": True, "depende": ["descarga"]},
+    {"id": "bancos",     "archivo": "spider_garantias.py", "nombre": sanitizar("3. ENRIQUECIMIENTO (Bancos)"), "critico": False, "depende": ["carga"]},
 
-    {"archivo": "etl_consorcios_ai.py", "nombre": "4. INTELIGENCIA ARTIFICIAL (Consorcios)", "critico": False}
+    {"id": "consorcios", "archivo": "etl_consorcios_ai.py", "nombre": "4. INTELIGENCIA ARTIFICIAL (Consorcios)", "critico": False, "depende": ["carga"]}
 ]
 
+# Avance por archivo / por trabajo que cada etapa ya guarda en la BD (se copia al checkpoint)
+PROGRESO_SQL = {
+    "carga": "SELECT estado, COUNT(*) FROM control_cargas WHERE fecha_fin >= %s GROUP BY estado",
+    "bancos": "SELECT estado, COUNT(*) FROM spider_trabajos GROUP BY estado",
+}
+
+DB_CONFIG = {
+    'host': os.getenv("DB_HOST"), 'user': os.getenv("DB_USER"),
+    'password': os.getenv("DB_PASS"), 'database': os.getenv("DB_NAME"), 'charset': 'utf8mb4'
+}
+LINEAS_REPORTE = 200  # líneas finales de cada etapa que viajan en el correo
+
 # Configuración Email (Con limpieza)
 SMTP_CFG = {
     'host': os.getenv("EMAIL_HOST", "smtp.gmail.com"),
@@ -50,42 +70,196 @@ if sys.platform.startswith('win'):
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s', handlers=[logging.StreamHandler(sys.stdout)])
 
-def ejecutar_script(info_script):
+# --- CHECKPOINTS ---
+class Checkpoints:
+    """Estado y duración de cada etapa por corrida en `etl_checkpoints` (sin BD, solo se avisa)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        try:
+            self.conn = mysql.connector.connect(**DB_CONFIG)
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS etl_checkpoints (
+                    id_corrida VARCHAR(32) NOT NULL,
+                    etapa VARCHAR(50) NOT NULL,
+                    estado VARCHAR(20) NOT NULL,
+                    inicio DATETIME,
+                    fin DATETIME,
+                    duracion_s DOUBLE,
+                    codigo INT,
+                    detalle TEXT,
+                    PRIMARY KEY (id_corrida, etapa),
+                    INDEX idx_checkpoints_inicio (inicio)
+                )
+            """)
+            self.conn.commit()
+            cursor.close()
+        except Exception as e:
+            logging.warning(f"⚠️ Sin BD para checkpoints ({e}). --resume no estará disponible.")
+            self.conn = None
+
+    def _ejecutar(self, sql, params=(), leer=False):
+        if not self.conn: return []
+        with self._lock:
+            try:
+                self.conn.ping(reconnect=True, attempts=3, delay=2)
+                cursor = self.conn.cursor()
+                cursor.execute(sql, params)
+                filas = cursor.fetchall() if leer else []
+                self.conn.commit()
+                cursor.close()
+                return filas
+            except Exception as e:
+                logging.warning(f"⚠️ Checkpoint no registrado: {e}")
+                return []
+
+    def ultima_corrida(self):
+        filas = self._ejecutar("SELECT id_corrida FROM etl_checkpoints ORDER BY inicio DESC LIMIT 1", leer=True)
+        return filas[0][0] if filas else None
+
+    def completadas(self, id_corrida):
+        filas = self._ejecutar(
+            "SELECT etapa FROM etl_checkpoints WHERE id_corrida = %s AND estado = 'OK'", (id_corrida,), leer=True
+        )
+        return {f[0] for f in filas}
+
+    def iniciar(self, id_corrida, etapa):
+        self._ejecutar("""
+            INSERT INTO etl_checkpoints (id_corrida, etapa, estado, inicio)
+            VALUES (%s, %s, 'EN_CURSO', NOW())
+            ON DUPLICATE KEY UPDATE estado = 'EN_CURSO', inicio = NOW(), fin = NULL, duracion_s = NULL, codigo = NULL, detalle = NULL
+        """, (id_corrida, etapa))
+
+    def terminar(self, id_corrida, etapa, estado, duracion=None, codigo=None, detalle=None):
+        self._ejecutar("""
+            INSERT INTO etl_checkpoints (id_corrida, etapa, estado, inicio, fin, duracion_s, codigo, detalle)
+            VALUES (%s, %s, %s, NOW(), NOW(), %s, %s, %s)
+            ON DUPLICATE KEY UPDATE estado = VALUES(estado), fin = NOW(), duracion_s = VALUES(duracion_s),
+                codigo = VALUES(codigo), detalle = VALUES(detalle)
+        """, (id_corrida, etapa, estado, duracion, codigo, detalle))
+
+    def progreso(self, etapa, desde):
+        """Resumen 'ESTADO=n' de la tabla de avance por archivo/trabajo de la etapa"""
+        sql = PROGRESO_SQL.get(etapa)
+        if not sql: return None
+        params = (desde,) if "%s" in sql else ()
+        filas = self._ejecutar(sql, params, leer=True)
+        return ", ".join(f"{estado}={n}" for estado, n in filas) or None
+
+    def cerrar(self):
+        if self.conn: self.conn.close()
+
+# --- EJECUCIÓN DE ETAPAS ---
+def ejecutar_script(info_script, id_corrida=None):
+    """Corre la etapa transmitiendo su salida en vivo; solo guarda las últimas líneas para el reporte"""
     ruta_script = os.path.join(script_dir, info_script["archivo"])
     nombre_mostrar = info_script["nombre"]
-    
-    print("\n" + "="*60)
+    prefijo = f"[{info_script['id']}]"
+
     logging.info(f"🎬 EJECUTANDO: {nombre_mostrar}")
-    print("="*60)
 
     if not os.path.exists(ruta_script):
-        return False, "Archivo no encontrado", "File not found"
+        return False, "Archivo no encontrado", "File not found", None
+
+    entorno = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+    if id_corrida: entorno["ETL_ID_CORRIDA"] = id_corrida
 
+    cola = deque(maxlen=LINEAS_REPORTE)
     inicio = time.time()
     try:
-        resultado = subprocess.run(
+        # stderr va al mismo pipe: los scripts loguean por stderr y no debe bloquearse
+        proceso = subprocess.Popen(
             [sys.executable, ruta_script],
-            capture_output=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             text=True,
             encoding='utf-8', 
-            errors='replace' 
+            errors='replace',
+            cwd=script_dir,
+            env=entorno,
+            bufsize=1
         )
+        for linea in proceso.stdout:
+            linea = linea.rstrip("\n")
+            cola.append(linea)
+            print(f"{prefijo} {linea}", flush=True)
+        codigo = proceso.wait()
         duracion = time.time() - inicio
-        logs = resultado.stdout
-        errores = resultado.stderr
-        print(logs) 
+        logs = "\n".join(cola)
 
-        if resultado.returncode == 0:
+        if codigo == 0:
             logging.info(f"✅ {nombre_mostrar} FINALIZADO (Tiempo: {duracion:.2f}s)")
-            return True, logs, ""
+            return True, logs, "", codigo
         else:
-            logging.error(f"❌ {nombre_mostrar} FALLÓ (Código: {resultado.returncode})")
-            print(f"--- ERRORES CAPTURADOS ---\n{errores}")
-            return False, logs, errores
+            logging.error(f"❌ {nombre_mostrar} FALLÓ (Código: {codigo}, Tiempo: {duracion:.2f}s)")
+            return False, logs, f"Código de salida {codigo}", codigo
 
     except Exception as e:
         logging.critical(f"☠️ Error ejecutando: {e}")
-        return False, "", str(e)
+        return False, "\n".join(cola), str(e), None
+
+def etapas_a_correr(solo=None):
+    ids = {p["id"] for p in PIPELINE}
+    if not solo: return list(PIPELINE)
+    desconocidas = set(solo) - ids
+    if desconocidas:
+        raise SystemExit(f"Etapas desconocidas: {', '.join(sorted(desconocidas))} (opciones: {', '.join(p['id'] for p in PIPELINE)})")
+    return [p for p in PIPELINE if p["id"] in solo]
+
+def orquestar(etapas, id_corrida, checkpoints, hechas=frozenset()):
+    """
+    Lanza cada etapa en su hilo apenas sus dependencias (dentro de `etapas`) terminan OK.
+    Si una etapa crítica falla no se lanza nada más; si falla una no crítica solo se
+    omiten las que dependen de ella. Devuelve {id: resultado}.
+    """
+    incluidas = {p["id"] for p in etapas}
+    resultados = {}
+    for paso in etapas:
+        if paso["id"] in hechas:
+            resultados[paso["id"]] = {"nombre": paso["nombre"], "exito": True, "log": "CHECKPOINT (ya completada)", "duracion": 0.0}
+    pendientes = [p for p in etapas if p["id"] not in hechas]
+    en_curso = {}
+    terminado = threading.Condition()
+    abortar = False
+
+    def correr(paso):
+        nonlocal abortar
+        inicio = time.time()
+        momento = datetime.now()
+        checkpoints.iniciar(id_corrida, paso["id"])
+        exito, log, err, codigo = ejecutar_script(paso, id_corrida)
+        duracion = time.time() - inicio
+        detalle = checkpoints.progreso(paso["id"], momento) or (None if exito else err)
+        checkpoints.terminar(id_corrida, paso["id"], "OK" if exito else "FALLO", duracion, codigo, detalle)
+        with terminado:
+            resultados[paso["id"]] = {
+                "nombre": paso["nombre"], "exito": exito, "duracion": duracion,
+                "log": log if exito else (log + "\nERR:\n" + err)
+            }
+            if not exito and paso["critico"]:
+                abortar = True
+            del en_curso[paso["id"]]
+            terminado.notify()
+
+    with terminado:
+        while pendientes or en_curso:
+            for paso in list(pendientes):
+                deps = [d for d in paso["depende"] if d in incluidas]
+                fallida = next((d for d in deps if d in resultados and not resultados[d]["exito"]), None)
+                if abortar or fallida:
+                    motivo = "OMITIDO (abortado)" if abortar else f"OMITIDO (falló {fallida})"
+                    resultados[paso["id"]] = {"nombre": paso["nombre"], "exito": False, "log": motivo, "duracion": 0.0}
+                    checkpoints.terminar(id_corrida, paso["id"], "OMITIDO", detalle=motivo)
+                    pendientes.remove(paso)
+                elif all(d in resultados for d in deps):
+                    pendientes.remove(paso)
+                    en_curso[paso["id"]] = threading.Thread(target=correr, args=(paso,), name=paso["id"])
+                    en_curso[paso["id"]].start()
+            if not en_curso: break
+            terminado.wait()
+
+    return [resultados[p["id"]] for p in etapas]
 
 def enviar_reporte(resultados, tiempo_total):
     if not SMTP_CFG['user'] or not SMTP_CFG['pass']:
@@ -101,7 +275,7 @@ def enviar_reporte(resultados, tiempo_total):
         filas_html = ""
         for res in resultados:
             nombre = sanitizar(res['nombre'])
-            estado = "OK" if res['exito'] else "ERROR"
+            estado = ("OK" if res['exito'] else "ERROR") + f" ({res.get('duracion', 0):.1f}s)"
             color = "green" if res['exito'] else "red"
             
             # Limpieza agresiva del log
@@ -158,31 +332,44 @@ def enviar_email_final(estado, cuerpo, es_html=True):
         logging.error(f"❌ IMPOSIBLE ENVIAR CORREO: {e}")
 
 def main():
-    start_global = time.time()
-    resultados = []
-    abortar = False
+    parser = argparse.ArgumentParser(description="Orquestador ETL SEACE")
+    parser.add_argument("--resume", nargs="?", const="ultima", metavar="ID_CORRIDA",
+                        help="Retoma una corrida (por defecto la última) saltando las etapas ya OK")
+    parser.add_argument("--only", nargs="+", metavar="ETAPA",
+                        help=f"Corre solo estas etapas ({', '.join(p['id'] for p in PIPELINE)})")
+    args = parser.parse_args()
 
-    print(f"🤖 ORQUESTADOR V4.0 - {datetime.now().strftime('%H:%M:%S')}")
+    start_global = time.time()
+    etapas = etapas_a_correr(args.only)
+    checkpoints = Checkpoints()
 
-    for paso in PIPELINE:
-        if abortar:
-            resultados.append({"nombre": paso['nombre'], "exito": False, "log": "OMITIDO"})
-            continue
+    id_corrida, hechas = None, set()
+    if args.resume:
+        id_corrida = checkpoints.ultima_corrida() if args.resume == "ultima" else args.resume
+        if id_corrida:
+            hechas = checkpoints.completadas(id_corrida)
+            logging.info(f"⏯️ Retomando corrida {id_corrida}. Ya completadas: {', '.join(sorted(hechas)) or 'ninguna'}")
+        else:
+            logging.warning("⚠️ No hay corrida previa para retomar; se inicia una nueva.")
+    id_corrida = id_corrida or datetime.now().strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:6]
 
-        exito, log, err = ejecutar_script(paso)
-        log_comb = log if exito else (log + "\nERR:\n" + err)
-        
-        resultados.append({"nombre": paso['nombre'], "exito": exito, "log": log_comb})
+    print(f"🤖 ORQUESTADOR V5.0 (DAG) - {datetime.now().strftime('%H:%M:%S')} - corrida {id_corrida}")
 
-        if not exito and paso["critico"]:
-            abortar = True
+    try:
+        resultados = orquestar(etapas, id_corrida, checkpoints, hechas)
+    finally:
+        checkpoints.cerrar()
 
     tiempo_total = time.time() - start_global
     
     print("\n" + "="*60)
+    print("⏱️ DURACIÓN POR ETAPA")
+    for res in resultados:
+        print(f"   {'✅' if res['exito'] else '❌'} {res['nombre']:<45} {res['duracion']:8.1f}s")
+    print(f"   {'TOTAL':<48} {tiempo_total:8.1f}s")
     enviar_reporte(resultados, tiempo_total)
     print("="*60)
     print("✨ CICLO FINALIZADO ✨")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
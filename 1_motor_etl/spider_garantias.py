@@ -1,24 +1,27 @@
 import sys
-import requests
+import asyncio
+import aiohttp
+import argparse
+import random
 import mysql.connector
 from mysql.connector import Error
 import os
 import time
+import socket
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter
 from dotenv import load_dotenv
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
+from cache_contratos import CacheContratos
+from generaciones import AvisoGeneracion, crear_tabla_generaciones
 
 # --- CONFIGURACIÓN INICIAL ---
 # Parche de codificación para Windows
 if sys.platform.startswith('win'):
-    try: 
+    try:
         sys.stdout.reconfigure(encoding='utf-8')
         sys.stderr.reconfigure(encoding='utf-8')
     except: pass
 
-requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
-
 script_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(script_dir)
 load_dotenv(os.path.join(parent_dir, ".env"))
@@ -35,202 +38,473 @@ DB_CONFIG = {
     'charset': 'utf8mb4'
 }
 
-# URLs
-URL_API_CONTRATO = "https://prod4.seace.gob.pe:9000/api/bus/contrato/idContrato/{}"
-URL_DESCARGA_DOC = "https://prod4.seace.gob.pe:9000/api/con/documentos/descargar/{}"
+# URLs (SEACE_API_BASE permite apuntar a un servidor simulado local)
+API_BASE = os.getenv("SEACE_API_BASE", "https://prod4.seace.gob.pe:9000").rstrip("/")
+RUTA_API_CONTRATO = "/api/bus/contrato/idContrato/{}"
+RUTA_DESCARGA_DOC = "/api/con/documentos/descargar/{}"
+VERIFICAR_SSL = os.getenv("SEACE_VERIFY_SSL", "0") == "1"
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Referer": "https://prod4.seace.gob.pe/"
 }
 
+# Control de carga hacia SEACE
+CONCURRENCIA = int(os.getenv("SPIDER_CONCURRENCIA", "8"))
+PETICIONES_POR_SEG = float(os.getenv("SPIDER_RPS", "5"))
+MAX_REINTENTOS = int(os.getenv("SPIDER_REINTENTOS", "4"))
+TAMANO_LOTE = int(os.getenv("SPIDER_LOTE", "200"))
+MAX_CICLOS = int(os.getenv("SPIDER_MAX_CICLOS", "50"))
+LOTE_ESCRITURA = 100
+ESTADOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+# Cola persistente (spider_trabajos): reintentos de fallos transitorios con espera creciente
+MAX_INTENTOS_TRABAJO = int(os.getenv("SPIDER_MAX_INTENTOS", "6"))
+ESPERA_BASE_TRABAJO = 300          # 5 min, 10 min, 20 min...
+ESPERA_MAX_TRABAJO = 24 * 3600
+MINUTOS_BLOQUEO = 15               # un trabajo EN_PROCESO más viejo se considera abandonado
+ID_WORKER = f"{socket.gethostname()}:{os.getpid()}"
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s', handlers=[logging.StreamHandler(sys.stdout)])
 
-# --- GESTIÓN DE BASE DE DATOS ---
-def obtener_conexion():
-    try: return mysql.connector.connect(**DB_CONFIG)
-    except Error as e: 
-        logging.error(f"Error DB: {e}")
-        return None
-
-def obtener_pendientes():
-    conn = obtener_conexion()
-    if not conn: return []
-    cursor = conn.cursor()
-    # Buscamos registros que les falte el banco O que sean consorcios sin procesar
-    # Nota: Asumimos que si entidad_financiera es NULL, no hemos pasado por aquí.
-    sql = """
-        SELECT id_adjudicacion, id_contrato, ganador_nombre 
-        FROM Licitaciones_Adjudicaciones 
-        WHERE (id_contrato IS NOT NULL AND id_contrato != '')
-          AND (entidad_financiera IS NULL) 
-        LIMIT 50 
-    """
-    cursor.execute(sql)
-    pendientes = cursor.fetchall()
-    conn.close()
-    return pendientes
-
-def guardar_garantias(resultados):
-    if not resultados: return
-    conn = obtener_conexion()
-    if not conn: return
-    cursor = conn.cursor()
-    sql = "UPDATE Licitaciones_Adjudicaciones SET entidad_financiera = %s WHERE id_adjudicacion = %s"
-    try:
-        cursor.executemany(sql, resultados)
-        conn.commit()
-    except Error as e:
-        logging.error(f"❌ Error guardando garantías: {e}")
-    finally:
-        cursor.close()
-        conn.close()
-
-def guardar_consorcio_db(id_contrato, miembros):
-    conn = obtener_conexion()
-    if not conn: return
-    cursor = conn.cursor()
-    sql = """
-        INSERT INTO Detalle_Consorcios (id_contrato, ruc_miembro, nombre_miembro, porcentaje_participacion)
-        VALUES (%s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE fecha_registro=NOW()
-    """
+# --- EXTRACCIÓN (sin red ni BD) ---
+def extraer_bancos(data):
+    """'BCP | INTERBANK' a partir de listaGarantiaContrato, o SIN_GARANTIA"""
+    emisores = set()
+    for g in data.get('listaGarantiaContrato') or []:
+        banco = g.get('entidadEmisora')
+        if banco:
+            banco_limpio = banco.strip().upper().replace("BANCO", "").strip()
+            emisores.add(banco_limpio)
+    return " | ".join(sorted(emisores)) if emisores else "SIN_GARANTIA"
+
+def extraer_miembros(data):
+    contratista = data.get('contratista', {})
+    if isinstance(contratista, dict):
+        return contratista.get('listaMiembrosConsorcio') or contratista.get('listaConsorciados') or []
+    return []
+
+def id_pdf_consorcio(data):
+    """Documento del contrato de consorcio (plan B cuando la API no trae miembros)"""
+    if data.get("idDocumentoConsorcio"):
+        return data.get("idDocumentoConsorcio")
+    if data.get("idDocumento2") and "CONTRATO" in str(data.get("archivoAdjunto2", "")).upper():
+        return data.get("idDocumento2")
+    return None
+
+def filas_consorcio(id_contrato, miembros):
     datos = []
     for m in miembros:
         ruc = str(m.get('nroDocumento') or m.get('ruc') or 'S/N')[:20]
         nombre = str(m.get('nombreRazonSocial') or m.get('nombre') or 'DESCONOCIDO')[:500]
         part = m.get('porcentajeParticipacion') or 0.0
         datos.append((id_contrato, ruc, nombre, part))
-    
-    try:
-        if datos: cursor.executemany(sql, datos)
+    return datos
+
+# --- CONTROL DE TASA ---
+class TokenBucket:
+    """`tasa` peticiones por segundo con ráfagas de hasta `capacidad`"""
+
+    def __init__(self, tasa, capacidad=None):
+        self.tasa = tasa
+        self.capacidad = capacidad or max(1.0, tasa)
+        self.tokens = self.capacidad
+        self.ultimo = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def tomar(self):
+        async with self._lock:
+            while True:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+                self.ultimo = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.tasa)
+
+def espera_reintento(intento, retry_after=None):
+    """Retry-After si el servidor lo manda; si no, backoff exponencial con jitter (1s, 2s, 4s...)"""
+    if retry_after:
+        try: return min(float(retry_after), 60.0)
+        except ValueError: pass
+    return min(2 ** intento, 30) + random.uniform(0, 0.5)
+
+# --- GESTIÓN DE BASE DE DATOS ---
+def es_error_transitorio(res_banco):
+    """ERROR_CONEXION / ERROR_API_xxx se reintentan; el resto es un resultado definitivo"""
+    return str(res_banco).startswith("ERROR_")
+
+class EscritorDB:
+    """
+    Una sola conexión para todo el spider. Las actualizaciones de bancos y consorcios
+    se acumulan y se escriben en lote desde un hilo, sin bloquear el event loop.
+
+    Los contratos a consultar salen de la cola `spider_trabajos`, que se reclama con
+    FOR UPDATE SKIP LOCKED para poder correr varios spiders en paralelo.
+    """
+
+    def __init__(self, tamano_lote=LOTE_ESCRITURA):
+        self.tamano_lote = tamano_lote
+        self.bancos = []
+        self.consorcios = []
+        self.hechos = []
+        self.reintentos = []
+        self.conn = None
+        self._lock = asyncio.Lock()
+        # Bancos y consorcios alimentan el catálogo de filtros y las sugerencias de la API
+        self.aviso = AvisoGeneracion()
+
+    def _conexion(self):
+        if self.conn is None:
+            self.conn = mysql.connector.connect(**DB_CONFIG)
+        else:
+            self.conn.ping(reconnect=True, attempts=3, delay=2)
+        return self.conn
+
+    async def _ejecutar(self, funcion, *args):
+        async with self._lock:
+            return await asyncio.to_thread(funcion, *args)
+
+    def _preparar(self):
+        conn = self._conexion()
+        cursor = conn.cursor()
+        # Crear columna en BD si no existe (Solo bancos, la tabla consorcios debe existir aparte)
+        try: cursor.execute("ALTER TABLE Licitaciones_Adjudicaciones ADD COLUMN entidad_financiera VARCHAR(255)")
+        except Error: pass
+        crear_tabla_generaciones(cursor)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS spider_trabajos (
+                id_adjudicacion VARCHAR(100) PRIMARY KEY,
+                id_contrato VARCHAR(100) NOT NULL,
+                ganador_nombre VARCHAR(500),
+                estado VARCHAR(20) NOT NULL DEFAULT 'PENDIENTE',
+                intentos INT NOT NULL DEFAULT 0,
+                proximo_intento DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                ultimo_error VARCHAR(255),
+                tomado_por VARCHAR(100),
+                tomado_en DATETIME,
+                actualizado DATETIME,
+                INDEX idx_trabajos_cola (estado, proximo_intento),
+                INDEX idx_trabajos_contrato (id_contrato)
+            )
+        """)
+        # etl_consorcios_ai consulta la cola por contrato (tablas creadas antes del índice)
+        try: cursor.execute("ALTER TABLE spider_trabajos ADD INDEX idx_trabajos_contrato (id_contrato)")
+        except Error: pass
+        # Los errores transitorios quedaban grabados como entidad_financiera y nunca se reintentaban
+        cursor.execute("""
+            UPDATE Licitaciones_Adjudicaciones SET entidad_financiera = NULL
+            WHERE entidad_financiera = 'ERROR_CONEXION' OR entidad_financiera LIKE 'ERROR\\_API\\_%'
+        """)
+        if cursor.rowcount:
+            logging.info(f"♻️ {cursor.rowcount} errores transitorios anteriores vuelven a la cola")
+        # Encolar lo que aún no tiene banco ni trabajo
+        cursor.execute("""
+            INSERT IGNORE INTO spider_trabajos (id_adjudicacion, id_contrato, ganador_nombre, actualizado)
+            SELECT a.id_adjudicacion, a.id_contrato, a.ganador_nombre, NOW()
+            FROM Licitaciones_Adjudicaciones a
+            LEFT JOIN spider_trabajos t ON t.id_adjudicacion = a.id_adjudicacion
+            WHERE (a.id_contrato IS NOT NULL AND a.id_contrato != '')
+              AND a.entidad_financiera IS NULL
+              AND t.id_adjudicacion IS NULL
+        """)
+        if cursor.rowcount:
+            logging.info(f"📥 {cursor.rowcount} contratos nuevos en spider_trabajos")
+        # Trabajos HECHO cuyo banco se borró (p.ej. el reseteo de arriba) vuelven a pendientes
+        cursor.execute("""
+            UPDATE spider_trabajos t JOIN Licitaciones_Adjudicaciones a ON a.id_adjudicacion = t.id_adjudicacion
+            SET t.estado = 'PENDIENTE', t.intentos = 0, t.proximo_intento = NOW(), t.actualizado = NOW()
+            WHERE t.estado = 'HECHO' AND a.entidad_financiera IS NULL
+        """)
         conn.commit()
-    except Error as e:
-        logging.error(f"❌ Error guardando consorcio {id_contrato}: {e}")
-    finally:
         cursor.close()
-        conn.close()
-
-# --- WORKER PRINCIPAL ---
-def procesar_contrato(item):
-    id_adj, id_contrato, nombre_ganador = item
-    url = URL_API_CONTRATO.format(id_contrato)
-    
-    res_banco = "NO_INFO"
-    info_consorcio = "NO_CONSORCIO" # Estados: OK_API, PDF_DOWNLOADED, ERROR
-    
-    try:
-        r = requests.get(url, headers=HEADERS, verify=False, timeout=15)
-        
-        if r.status_code == 200:
-            data = r.json()
-            
-            # --- 1. EXTRACCIÓN DE GARANTÍAS (BANCOS) ---
-            garantias = data.get('listaGarantiaContrato') or []
-            emisores = set()
-            for g in garantias:
-                banco = g.get('entidadEmisora')
-                if banco: 
-                    banco_limpio = banco.strip().upper().replace("BANCO", "").strip()
-                    emisores.add(banco_limpio)
-            
-            if emisores: res_banco = " | ".join(sorted(emisores))
-            else: res_banco = "SIN_GARANTIA"
-
-            # --- 2. EXTRACCIÓN DE CONSORCIOS (LÓGICA HÍBRIDA) ---
-            # Solo si el nombre del ganador indica que es un consorcio
-            if "CONSORCIO" in str(nombre_ganador).upper():
-                contratista = data.get('contratista', {})
-                miembros = []
-                
-                # A) INTENTO API
-                if isinstance(contratista, dict):
-                    miembros = contratista.get('listaMiembrosConsorcio') or contratista.get('listaConsorciados') or []
-                
-                if miembros:
-                    guardar_consorcio_db(id_contrato, miembros)
-                    info_consorcio = "OK_API"
-                else:
-                    # B) INTENTO PDF (PLAN B)
-                    id_pdf = None
-                    nombre_pdf = f"Consorcio_{id_contrato}.pdf"
-                    
-                    if data.get("idDocumentoConsorcio"):
-                        id_pdf = data.get("idDocumentoConsorcio")
-                    elif data.get("idDocumento2") and "CONTRATO" in str(data.get("archivoAdjunto2", "")).upper():
-                        id_pdf = data.get("idDocumento2")
-                    
-                    if id_pdf:
-                        # Descargar PDF
-                        url_pdf = URL_DESCARGA_DOC.format(id_pdf)
-                        ruta_pdf = os.path.join(CARPETA_EVIDENCIA, nombre_pdf)
-                        try:
-                            with requests.get(url_pdf, headers=HEADERS, stream=True, verify=False, timeout=30) as r_pdf:
-                                if r_pdf.status_code == 200:
-                                    with open(ruta_pdf, 'wb') as f:
-                                        for chunk in r_pdf.iter_content(chunk_size=1024):
-                                            f.write(chunk)
-                                    info_consorcio = "PDF_DOWNLOADED"
-                        except:
-                            info_consorcio = "ERROR_PDF"
-                    else:
-                        info_consorcio = "PDF_NOT_FOUND"
 
-        elif r.status_code == 404:
-            res_banco = "CONTRATO_NO_ENCONTRADO_API"
+    def _reclamar(self, limite):
+        """Toma hasta `limite` trabajos vencidos (o abandonados) sin pisar a otros spiders"""
+        conn = self._conexion()
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction()
+            cursor.execute("""
+                SELECT id_adjudicacion, id_contrato, ganador_nombre
+                FROM spider_trabajos
+                WHERE (estado = 'PENDIENTE' AND proximo_intento <= NOW())
+                   OR (estado = 'EN_PROCESO' AND tomado_en < NOW() - INTERVAL %s MINUTE)
+                ORDER BY proximo_intento
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (MINUTOS_BLOQUEO, limite))
+            trabajos = cursor.fetchall()
+            if trabajos:
+                cursor.executemany("""
+                    UPDATE spider_trabajos
+                    SET estado = 'EN_PROCESO', intentos = intentos + 1, tomado_por = %s, tomado_en = NOW()
+                    WHERE id_adjudicacion = %s
+                """, [(ID_WORKER, t[0]) for t in trabajos])
+            conn.commit()
+            return trabajos
+        except Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def _escribir(self, bancos, consorcios, hechos, reintentos):
+        conn = self._conexion()
+        cursor = conn.cursor()
+        try:
+            cambiadas = 0
+            if bancos:
+                cursor.executemany(
+                    "UPDATE Licitaciones_Adjudicaciones SET entidad_financiera = %s WHERE id_adjudicacion = %s", bancos
+                )
+                cambiadas += cursor.rowcount
+            if consorcios:
+                cursor.executemany("""
+                    INSERT INTO Detalle_Consorcios (id_contrato, ruc_miembro, nombre_miembro, porcentaje_participacion)
+                    VALUES (%s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE fecha_registro=NOW()
+                """, consorcios)
+                cambiadas += cursor.rowcount
+            if hechos:
+                cursor.executemany("""
+                    UPDATE spider_trabajos SET estado = 'HECHO', ultimo_error = NULL, actualizado = NOW()
+                    WHERE id_adjudicacion = %s
+                """, hechos)
+            if reintentos:
+                cursor.executemany(f"""
+                    UPDATE spider_trabajos
+                    SET estado = IF(intentos >= {MAX_INTENTOS_TRABAJO}, 'FALLIDO', 'PENDIENTE'),
+                        proximo_intento = NOW() + INTERVAL LEAST({ESPERA_BASE_TRABAJO} * POW(2, intentos - 1), {ESPERA_MAX_TRABAJO}) SECOND,
+                        ultimo_error = %s, actualizado = NOW()
+                    WHERE id_adjudicacion = %s
+                """, reintentos)
+            if cambiadas > 0:
+                self.aviso.registrar(cursor)
+            conn.commit()
+        except Error as e:
+            conn.rollback()
+            logging.error(f"❌ Error guardando lote ({len(bancos)} bancos, {len(consorcios)} consorciados): {e}")
+        finally:
+            cursor.close()
+
+    async def preparar(self):
+        await self._ejecutar(self._preparar)
+
+    async def reclamar(self, limite):
+        return await self._ejecutar(self._reclamar, limite)
+
+    async def agregar(self, res_banco, id_adj, consorcio=()):
+        if es_error_transitorio(res_banco):
+            # No se graba en entidad_financiera: el trabajo se reprograma
+            self.reintentos.append((res_banco, id_adj))
         else:
-            res_banco = f"ERROR_API_{r.status_code}"
-            
-    except Exception as e:
-        res_banco = "ERROR_CONEXION"
+            self.bancos.append((res_banco, id_adj))
+            self.consorcios.extend(consorcio)
+            self.hechos.append((id_adj,))
+        if len(self.bancos) + len(self.reintentos) >= self.tamano_lote:
+            await self.flush()
 
-    return (res_banco, id_adj, info_consorcio)
+    async def flush(self):
+        lote = (self.bancos, self.consorcios, self.hechos, self.reintentos)
+        self.bancos, self.consorcios, self.hechos, self.reintentos = [], [], [], []
+        if any(lote):
+            await self._ejecutar(self._escribir, *lote)
 
-# --- MAIN ---
-def main():
-    logging.info("🕷️ SPIDER UNIFICADO V2.0 (Bancos + Consorcios)")
-    
-    # Crear columna en BD si no existe (Solo bancos, la tabla consorcios debe existir aparte)
-    conn = obtener_conexion()
-    if conn:
+    def _cerrar_aviso(self):
+        self.aviso.cerrar(self._conexion())
+
+    async def cerrar(self):
+        await self.flush()
+        if self.aviso.pendiente:
+            await self._ejecutar(self._cerrar_aviso)
+        if self.conn is not None and self.conn.is_connected():
+            self.conn.close()
+
+# --- SPIDER ---
+class Spider:
+    def __init__(self, http, bd, base=API_BASE, concurrencia=CONCURRENCIA, rps=PETICIONES_POR_SEG, cache=None):
+        self.http = http
+        self.bd = bd
+        self.cache = cache
+        self.base = base.rstrip("/")
+        self.semaforo = asyncio.Semaphore(concurrencia)
+        self.bucket = TokenBucket(rps)
+        self.stats = Counter()
+
+    async def _get(self, url, headers=None):
+        """
+        GET con control de tasa y reintentos para 429/5xx y errores de red.
+        Devuelve (status, json si es 200, cabeceras de la respuesta); status None si no hubo respuesta.
+        """
+        for intento in range(MAX_REINTENTOS + 1):
+            await self.bucket.tomar()
+            self.stats["peticiones"] += 1
+            try:
+                async with self.http.get(url, headers=headers) as r:
+                    if r.status in ESTADOS_REINTENTABLES and intento < MAX_REINTENTOS:
+                        self.stats["reintentos"] += 1
+                        await asyncio.sleep(espera_reintento(intento, r.headers.get("Retry-After")))
+                        continue
+                    if r.status != 200:
+                        return r.status, None, r.headers
+                    return 200, await r.json(content_type=None), r.headers
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                if intento < MAX_REINTENTOS:
+                    self.stats["reintentos"] += 1
+                    await asyncio.sleep(espera_reintento(intento))
+                    continue
+                return None, None, {}
+
+    async def _metadata(self, id_contrato):
+        """Metadata del contrato pasando por la caché compartida (ver cache_contratos.py)"""
+        url = self.base + RUTA_API_CONTRATO.format(id_contrato)
+        if self.cache is None:
+            status, data, _ = await self._get(url)
+            return status, data
+
+        # SQLite es síncrono (y puede esperar el bloqueo de otro proceso): fuera del event loop
+        entrada = await asyncio.to_thread(self.cache.buscar, id_contrato)
+        if entrada and entrada.fresca:
+            return entrada.status, entrada.data
+
+        status, data, cabeceras = await self._get(url, self.cache.cabeceras_revalidacion(entrada))
+        if status == 304 and entrada:
+            await asyncio.to_thread(self.cache.renovar, id_contrato)
+            return entrada.status, entrada.data
+        if status is None and entrada:
+            return entrada.status, entrada.data
+        await asyncio.to_thread(
+            self.cache.guardar, id_contrato, status, data, cabeceras.get("ETag"), cabeceras.get("Last-Modified")
+        )
+        return status, data
+
+    async def _descargar_pdf(self, id_pdf, ruta_pdf):
+        url_pdf = self.base + RUTA_DESCARGA_DOC.format(id_pdf)
+        await self.bucket.tomar()
         try:
-            cursor = conn.cursor()
-            cursor.execute("ALTER TABLE Licitaciones_Adjudicaciones ADD COLUMN entidad_financiera VARCHAR(255)")
-        except: pass
-        conn.close()
+            async with self.http.get(url_pdf, timeout=aiohttp.ClientTimeout(total=60)) as r_pdf:
+                if r_pdf.status != 200:
+                    return "ERROR_PDF"
+                with open(ruta_pdf, 'wb') as f:
+                    async for chunk in r_pdf.content.iter_chunked(64 * 1024):
+                        f.write(chunk)
+                return "PDF_DOWNLOADED"
+        except Exception:
+            return "ERROR_PDF"
+
+    async def _consultar(self, id_contrato, nombre_ganador):
+        """(res_banco, info_consorcio, filas de consorcio) de un contrato"""
+        res_banco = "NO_INFO"
+        info_consorcio = "NO_CONSORCIO" # Estados: OK_API, PDF_DOWNLOADED, ERROR
+        consorcio = []
+
+        async with self.semaforo:
+            status, data = await self._metadata(id_contrato)
+
+            if status == 200 and isinstance(data, dict):
+                # --- 1. EXTRACCIÓN DE GARANTÍAS (BANCOS) ---
+                res_banco = extraer_bancos(data)
+
+                # --- 2. EXTRACCIÓN DE CONSORCIOS (LÓGICA HÍBRIDA) ---
+                # Solo si el nombre del ganador indica que es un consorcio
+                if "CONSORCIO" in str(nombre_ganador).upper():
+                    miembros = extraer_miembros(data)
+                    if miembros:
+                        consorcio = filas_consorcio(id_contrato, miembros)
+                        info_consorcio = "OK_API"
+                    else:
+                        id_pdf = id_pdf_consorcio(data)
+                        if id_pdf:
+                            ruta_pdf = os.path.join(CARPETA_EVIDENCIA, f"Consorcio_{id_contrato}.pdf")
+                            info_consorcio = await self._descargar_pdf(id_pdf, ruta_pdf)
+                        else:
+                            info_consorcio = "PDF_NOT_FOUND"
+            elif status == 404:
+                res_banco = "CONTRATO_NO_ENCONTRADO_API"
+            elif status is None:
+                res_banco = "ERROR_CONEXION"
+            else:
+                res_banco = f"ERROR_API_{status}"
+
+        return res_banco, info_consorcio, consorcio
 
+    async def procesar_contrato(self, item):
+        id_adj, id_contrato, nombre_ganador = item
+        try:
+            res_banco, info_consorcio, consorcio = await self._consultar(id_contrato, nombre_ganador)
+        except Exception as e:
+            # Un fallo local (caché, disco) no tumba el lote: el trabajo se reprograma
+            logging.warning(f"⚠️ Error procesando contrato {id_contrato}: {e}")
+            res_banco, info_consorcio, consorcio = "ERROR_INTERNO", "ERROR", []
+
+        await self.bd.agregar(res_banco, id_adj, consorcio)
+        self.stats[info_consorcio] += 1
+        if info_consorcio == "PDF_DOWNLOADED":
+            logging.info(f"   📂 PDF Descargado para adjudicación {id_adj}")
+        return (res_banco, id_adj, info_consorcio)
+
+# --- MAIN ---
+async def ejecutar(args):
+    bd = EscritorDB()
+    await bd.preparar()
+    cache = None if args.sin_cache else CacheContratos()
+
+    connector = aiohttp.TCPConnector(limit=args.concurrencia, keepalive_timeout=30, ssl=None if VERIFICAR_SSL else False)
+    timeout = aiohttp.ClientTimeout(total=30, connect=10)
     total_procesados = 0
     ciclos = 0
-    
-    while ciclos < 50: 
-        pendientes = obtener_pendientes()
-        if not pendientes:
-            logging.info("🏁 No hay más pendientes.")
-            break
-            
-        logging.info(f"⚡ Procesando lote de {len(pendientes)}...")
-        
-        datos_para_update_bancos = []
-        
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = {executor.submit(procesar_contrato, item): item for item in pendientes}
-            for future in as_completed(futures):
-                res_banco, id_adj, estado_consorcio = future.result()
-                
-                # Preparamos update masivo de bancos
-                datos_para_update_bancos.append((res_banco, id_adj))
-                
-                # Log rápido de qué pasó con el consorcio
-                if estado_consorcio == "PDF_DOWNLOADED":
-                    logging.info(f"   📂 PDF Descargado para adjudicación {id_adj}")
-                
-                total_procesados += 1
-
-        # Guardamos bancos en lote
-        guardar_garantias(datos_para_update_bancos)
-        ciclos += 1
-    
+    inicio = time.time()
+
+    try:
+        async with aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout) as http:
+            spider = Spider(http, bd, args.base_url, args.concurrencia, args.rps, cache)
+
+            while ciclos < args.ciclos:
+                pendientes = await bd.reclamar(args.lote)
+                if not pendientes:
+                    logging.info("🏁 No hay trabajos pendientes (los reintentos programados quedan en spider_trabajos).")
+                    break
+
+                logging.info(f"⚡ Procesando lote de {len(pendientes)}...")
+                resultados = await asyncio.gather(
+                    *(spider.procesar_contrato(item) for item in pendientes), return_exceptions=True
+                )
+                # Lo que falle fuera de procesar_contrato (p.ej. al escribir) queda EN_PROCESO
+                # y se vuelve a reclamar pasados MINUTOS_BLOQUEO
+                for error in (r for r in resultados if isinstance(r, BaseException)):
+                    logging.error(f"❌ Error no controlado en el lote: {error}")
+                await bd.flush()
+
+                total_procesados += len(pendientes)
+                ciclos += 1
+
+            dur = time.time() - inicio
+            logging.info(f"📈 {spider.stats['peticiones']} peticiones, {spider.stats['reintentos']} reintentos, "
+                         f"{total_procesados / dur if dur else 0:.1f} contratos/s")
+            if cache: logging.info(f"🗃️ Caché de contratos: {cache.resumen()}")
+    finally:
+        await bd.cerrar()
+        if cache: cache.cerrar()
+
     logging.info(f"🏁 Finalizado. Total procesados: {total_procesados}")
 
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default=API_BASE, help="Base de la API SEACE (p.ej. http://127.0.0.1:8080 para un mock)")
+    parser.add_argument("--concurrencia", type=int, default=CONCURRENCIA)
+    parser.add_argument("--rps", type=float, default=PETICIONES_POR_SEG, help="Peticiones por segundo hacia SEACE")
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE)
+    parser.add_argument("--ciclos", type=int, default=MAX_CICLOS)
+    parser.add_argument("--sin-cache", action="store_true", help="No usar la caché local de contratos")
+    args = parser.parse_args()
+
+    logging.info("🕷️ SPIDER UNIFICADO V3.0 (Bancos + Consorcios, asyncio)")
+    try:
+        asyncio.run(ejecutar(args))
+    except KeyboardInterrupt:
+        logging.warning("🛑 Interrumpido.")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -3,10 +3,17 @@ FastAPI main application for MQS Garantías - SEACE monitoring system.
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, mqs, admin, scraping, tendencias, etl, formatos, users, support, test, notifications, reportes, chatbot, exports
+from app.routers import auth, mqs, admin, scraping, tendencias, etl, formatos, users, support, test, notifications, reportes, chatbot, exports, cache
 from app.routers import dashboard_raw as dashboard
 from app.routers import licitaciones_raw as licitaciones
 from app.services.notification_scheduler import start_scheduler, stop_scheduler
+from app.services.data_version import data_version
+from app.services.suggestion_index import suggestion_index
+from app.services.filter_catalog import filter_catalog
+from app.services.resumen_cubo import resumen_cubo
+from app.services.event_outbox import event_outbox
+from app.database import SessionLocal
+import logging
 
 # Create FastAPI app
 app = FastAPI(
@@ -51,15 +58,31 @@ app.include_router(reportes.router)
 app.include_router(scraping.router)
 app.include_router(etl.router)
 app.include_router(exports.router)
+app.include_router(cache.router)
 
 
 # ====== Startup/Shutdown Events ======
 
 @app.on_event("startup")
 def startup_event():
-    """Iniciar scheduler de notificaciones al arranque"""
+    """Iniciar scheduler de notificaciones y cargar índices en memoria al arranque"""
     start_scheduler()
 
+    db = SessionLocal()
+    try:
+        for ensure_table in (data_version.ensure_table, filter_catalog.ensure_table, resumen_cubo.ensure_table,
+                             event_outbox.ensure_table):
+            try:
+                ensure_table(db)
+            except Exception as e:
+                db.rollback()
+                logging.getLogger(__name__).error(f"No se pudo preparar tabla ({ensure_table.__qualname__}): {e}")
+    finally:
+        db.close()
+
+    # En segundo plano: no retrasa el arranque, /suggestions usa SQL mientras tanto
+    suggestion_index.refresh_async()
+
 @app.on_event("shutdown")
 def shutdown_event():
     """Detener scheduler al apagar"""
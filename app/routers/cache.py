@@ -0,0 +1,22 @@
+"""
+Cache Router - Métricas y limpieza de la caché de respuestas analíticas
+"""
+from fastapi import APIRouter, Depends
+from app.models.user import User
+from app.services.response_cache import response_cache
+from app.utils.dependencies import get_current_admin_user
+
+router = APIRouter(prefix="/api/cache", tags=["Cache"])
+
+
+@router.get("/metrics")
+def get_cache_metrics():
+    """Hits, stale hits, misses y revalidaciones por ruta"""
+    return response_cache.metrics()
+
+
+@router.post("/clear")
+def clear_cache(current_admin: User = Depends(get_current_admin_user)):
+    """Vaciar la caché (no hace falta tras el ETL: la generación ya la invalida)"""
+    response_cache.clear()
+    return {"message": "Cache cleared"}
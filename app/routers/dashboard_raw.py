@@ -6,6 +6,10 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.database import get_db
+from app.services.response_cache import response_cache
+from app.services.filter_catalog import filter_catalog
+from app.services.resumen_cubo import CUBO_TABLE
+from app.utils.sql_filters import WhereBuilder
 from typing import Optional
 from decimal import Decimal
 
@@ -13,6 +17,7 @@ router = APIRouter(prefix="/api/dashboard", tags=["Dashboard"])
 
 
 @router.get("/kpis")
+@response_cache.cached("dashboard/kpis")
 def get_dashboard_kpis(
     year: Optional[int] = Query(None, description="Filter by year. 0 or None for All."),
     estado: Optional[str] = Query(None, description="Filter by estado_proceso"),
@@ -22,110 +27,75 @@ def get_dashboard_kpis(
     db: Session = Depends(get_db)
 ):
     """
-    Get dashboard KPIs using data from licitaciones_cabecera.
+    Get dashboard KPIs from the pre-aggregated summary cube (resumen_licitaciones_cubo).
     """
     
     try:
-        # Build WHERE clause for filters
-        where_clauses = []
-        params = {}
+        # Totals, departamentos, categorias and estados come from one pass over the cube
+        where = WhereBuilder()
+        where.equals("anio", year if year and year > 0 else None, param="year")
+        where.equals("estado_proceso", estado)
+        where.equals("tipo_procedimiento", tipo_procedimiento)
+        where.equals("categoria", categoria)
+        where.equals("departamento", departamento)
+        where_sql, params = where.sql(), where.params
         
-        if year and year > 0:
-            where_clauses.append("YEAR(fecha_publicacion) = :year")
-            params['year'] = year
-        if estado:
-            where_clauses.append("estado_proceso = :estado")
-            params['estado'] = estado
-        if tipo_procedimiento:
-            where_clauses.append("tipo_procedimiento = :tipo_proc")
-            params['tipo_proc'] = tipo_procedimiento
-        if categoria:
-            where_clauses.append("categoria = :categoria")
-            params['categoria'] = categoria
-        if departamento:
-            where_clauses.append("departamento = :departamento")
-            params['departamento'] = departamento
-        
-        where_sql = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
-        
-        # 1. Total monto estimado y cantidad de licitaciones
-        sql_kpis = text(f"""
-            SELECT 
-                COALESCE(SUM(monto_estimado), 0) as monto_total,
-                COUNT(DISTINCT id_convocatoria) as total_licitaciones
-            FROM licitaciones_cabecera
+        sql_cubo = text(f"""
+            SELECT departamento, categoria, estado_proceso, SUM(total), SUM(monto_total)
+            FROM {CUBO_TABLE}
             {where_sql}
+            GROUP BY departamento, categoria, estado_proceso
         """)
         
-        result = db.execute(sql_kpis, params).fetchone()
-        monto_total = float(result[0]) if result[0] else 0
-        total_licitaciones = result[1] or 0
+        monto_total = 0.0
+        total_licitaciones = 0
+        por_departamento, por_categoria, por_estado = {}, {}, {}
+        for dept, cat, est, total, monto in db.execute(sql_cubo, params).fetchall():
+            total, monto = int(total or 0), float(monto or 0)
+            monto_total += monto
+            total_licitaciones += total
+            for grupo, nombre in ((por_departamento, dept), (por_categoria, cat), (por_estado, est)):
+                if nombre:
+                    acc = grupo.setdefault(nombre, [0, 0.0])
+                    acc[0] += total
+                    acc[1] += monto
         
-        # 2. Top 5 departamentos
-        sql_deptos = text(f"""
-            SELECT 
-                departamento as nombre,
-                COUNT(*) as total,
-                COALESCE(SUM(monto_estimado), 0) as monto
-            FROM licitaciones_cabecera
-            WHERE departamento IS NOT NULL AND departamento != ''
-            {("AND " + " AND ".join(where_clauses)) if where_clauses else ""}
-            GROUP BY departamento
-            ORDER BY total DESC
-            LIMIT 5
-        """)
+        def ranking(grupo):
+            return sorted(grupo.items(), key=lambda item: item[1][0], reverse=True)
+        
+        # 1. Top 5 departamentos
+        top_departamentos = [{"nombre": k, "total": v[0], "monto": v[1]} for k, v in ranking(por_departamento)[:5]]
+        
+        # 2. Distribución por categoría (Bien/Obra/Servicio/Consultoría)
+        distribucion_categorias = [{"nombre": k, "total": v[0], "monto": v[1]} for k, v in ranking(por_categoria)]
         
-        deptos = db.execute(sql_deptos, params).fetchall()
-        top_departamentos = [{"nombre": row[0], "total": row[1], "monto": float(row[2]) if row[2] else 0} for row in deptos]
+        # 3. Licitaciones por estado
+        distribucion_estados = [{"nombre": k, "total": v[0]} for k, v in ranking(por_estado)]
+        
+        # 4. Top 5 entidades compradoras (comprador is not a cube dimension;
+        #    a half-open date range keeps this scan on the fecha_publicacion index)
+        entidad_where = WhereBuilder().add("comprador IS NOT NULL").add("comprador != ''")
+        entidad_where.period("fecha_publicacion", year if year and year > 0 else None)
+        entidad_where.equals("estado_proceso", estado)
+        entidad_where.equals("tipo_procedimiento", tipo_procedimiento)
+        entidad_where.equals("categoria", categoria)
+        entidad_where.equals("departamento", departamento)
         
-        # 3. Top 5 entidades compradoras
         sql_entidades = text(f"""
             SELECT 
                 comprador as nombre,
                 COUNT(*) as total,
                 COALESCE(SUM(monto_estimado), 0) as monto
             FROM licitaciones_cabecera
-            WHERE comprador IS NOT NULL AND comprador != ''
-            {("AND " + " AND ".join(where_clauses)) if where_clauses else ""}
+            {entidad_where.sql()}
             GROUP BY comprador
             ORDER BY total DESC
             LIMIT 5
         """)
         
-        entidades = db.execute(sql_entidades, params).fetchall()
+        entidades = db.execute(sql_entidades, entidad_where.params).fetchall()
         top_entidades = [{"nombre": row[0], "total": row[1], "monto": float(row[2]) if row[2] else 0} for row in entidades]
         
-        # 4. Distribución por categoría (Bien/Obra/Servicio/Consultoría)
-        sql_categorias = text(f"""
-            SELECT 
-                categoria as nombre,
-                COUNT(*) as total,
-                COALESCE(SUM(monto_estimado), 0) as monto
-            FROM licitaciones_cabecera
-            WHERE categoria IS NOT NULL AND categoria != ''
-            {("AND " + " AND ".join(where_clauses)) if where_clauses else ""}
-            GROUP BY categoria
-            ORDER BY total DESC
-        """)
-        
-        categorias = db.execute(sql_categorias, params).fetchall()
-        distribucion_categorias = [{"nombre": row[0], "total": row[1], "monto": float(row[2]) if row[2] else 0} for row in categorias]
-        
-        # 5. Licitaciones por estado
-        sql_estados = text(f"""
-            SELECT 
-                estado_proceso as nombre,
-                COUNT(*) as total
-            FROM licitaciones_cabecera
-            WHERE estado_proceso IS NOT NULL AND estado_proceso != ''
-            {("AND " + " AND ".join(where_clauses)) if where_clauses else ""}
-            GROUP BY estado_proceso
-            ORDER BY total DESC
-        """)
-        
-        estados = db.execute(sql_estados, params).fetchall()
-        distribucion_estados = [{"nombre": row[0], "total": row[1]} for row in estados]
-        
         return {
             "monto_total_estimado": str(Decimal(str(monto_total))),
             "total_licitaciones": total_licitaciones,
@@ -153,39 +123,14 @@ def get_filter_options(db: Session = Depends(get_db)):
     Get all available filter options for dropdowns (Raw SQL version).
     """
     try:
-        # Estados
-        estados = db.execute(text("SELECT DISTINCT estado_proceso FROM licitaciones_cabecera WHERE estado_proceso IS NOT NULL AND estado_proceso != '' ORDER BY estado_proceso")).fetchall()
-        
-        # Categorias
-        categorias = db.execute(text("SELECT DISTINCT categoria FROM licitaciones_cabecera WHERE categoria IS NOT NULL AND categoria != '' ORDER BY categoria")).fetchall()
-        
-        # Departamentos
-        deptos = db.execute(text("SELECT DISTINCT departamento FROM licitaciones_cabecera WHERE departamento IS NOT NULL AND departamento != '' ORDER BY departamento")).fetchall()
-        
-        # Tipos Entidad
-        tipos = db.execute(text("SELECT DISTINCT tipo_procedimiento FROM licitaciones_cabecera WHERE tipo_procedimiento IS NOT NULL AND tipo_procedimiento != '' ORDER BY tipo_procedimiento")).fetchall()
-        
-        # Aseguradoras (check if table exists or has data)
-        aseguradoras_list = []
-        try:
-            raw_aseguradoras = db.execute(text("SELECT DISTINCT entidad_financiera FROM licitaciones_adjudicaciones WHERE entidad_financiera IS NOT NULL AND entidad_financiera != ''")).fetchall()
-            
-            # Normalize list
-            from app.utils.normalization import normalize_insurer_name
-            norm_set = set()
-            for r in raw_aseguradoras:
-                norm_set.add(normalize_insurer_name(r[0]))
-            
-            aseguradoras_list = sorted(list(norm_set))
-        except:
-            aseguradoras_list = []
-
+        catalog = filter_catalog.get(db)
+        raw = catalog["raw"]
         return {
-            "estados": [r[0] for r in estados],
-            "objetos": [r[0] for r in categorias],
-            "departamentos": [r[0] for r in deptos],
-            "tipos_entidad": [r[0] for r in tipos],
-            "aseguradoras": aseguradoras_list
+            "estados": raw["estado_proceso"],
+            "objetos": raw["categoria"],
+            "departamentos": raw["departamento"],
+            "tipos_entidad": raw["tipo_procedimiento"],
+            "aseguradoras": catalog["aseguradoras_dashboard"]
         }
     except Exception as e:
         print(f"Error getting filter options: {e}")
@@ -198,65 +143,66 @@ def get_filter_options(db: Session = Depends(get_db)):
         }
 
 @router.get("/distribution-by-type")
+@response_cache.cached("dashboard/distribution-by-type")
 def get_distribution_by_type(year: int = 2024, db: Session = Depends(get_db)):
     try:
-        year_filter = "AND YEAR(fecha_publicacion) = :year" if year > 0 else ""
+        where = WhereBuilder().add("categoria != ''")
+        where.equals("anio", year if year > 0 else None, param="year")
         sql = text(f"""
             SELECT 
                 categoria as name,
-                COUNT(*) as value,
-                COALESCE(SUM(monto_estimado), 0) as amount
-            FROM licitaciones_cabecera
-            WHERE categoria IS NOT NULL AND categoria != ''
-            {year_filter}
+                SUM(total) as value,
+                SUM(monto_total) as amount
+            FROM {CUBO_TABLE}
+            {where.sql()}
             GROUP BY categoria
             ORDER BY value DESC
         """)
-        params = {"year": year} if year > 0 else {}
-        result = db.execute(sql, params).fetchall()
-        data = [{"name": row[0], "value": row[1], "amount": float(row[2])} for row in result]
+        result = db.execute(sql, where.params).fetchall()
+        data = [{"name": row[0], "value": int(row[1]), "amount": float(row[2])} for row in result]
         return {"data": data}
     except Exception as e:
         return {"data": [], "error": str(e)}
 
 @router.get("/stats-by-status")
+@response_cache.cached("dashboard/stats-by-status")
 def get_stats_by_status(db: Session = Depends(get_db)):
     try:
-        sql = text("""
+        sql = text(f"""
             SELECT 
                 estado_proceso as name,
-                COUNT(*) as value
-            FROM licitaciones_cabecera
-            WHERE estado_proceso IS NOT NULL AND estado_proceso != ''
+                SUM(total) as value
+            FROM {CUBO_TABLE}
+            WHERE estado_proceso != ''
             GROUP BY estado_proceso
             ORDER BY value DESC
         """)
         result = db.execute(sql).fetchall()
-        data = [{"name": row[0], "value": row[1]} for row in result]
+        data = [{"name": row[0], "value": int(row[1])} for row in result]
         return {"data": data}
     except Exception as e:
         return {"data": [], "error": str(e)}
 
 @router.get("/monthly-trend")
+@response_cache.cached("dashboard/monthly-trend")
 def get_monthly_trend(year: int = 2024, db: Session = Depends(get_db)):
     try:
         # If year > 0, filter by specific year. If 0 (All), average or sum by month across years?
         # Requirement says "All" shows total. So likely sum of all Januaries, all Februaries, etc.
-        year_filter = "WHERE YEAR(fecha_publicacion) = :year" if year > 0 else ""
+        where = WhereBuilder().equals("anio", year if year > 0 else None, param="year")
         
         sql = text(f"""
             SELECT 
-                MONTH(fecha_publicacion) as mes,
-                COUNT(*) as count,
-                COALESCE(SUM(monto_estimado), 0) as amount
-            FROM licitaciones_cabecera
-            {year_filter}
-            GROUP BY MONTH(fecha_publicacion)
+                mes,
+                SUM(total) as count,
+                SUM(monto_total) as amount
+            FROM {CUBO_TABLE}
+            {where.sql()}
+            GROUP BY mes
             ORDER BY mes
         """)
         
-        params = {"year": year} if year > 0 else {}
-        result = db.execute(sql, params).fetchall()
+        result = db.execute(sql, where.params).fetchall()
         
         months = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
         data = []
@@ -265,7 +211,7 @@ def get_monthly_trend(year: int = 2024, db: Session = Depends(get_db)):
             row = next((r for r in result if r[0] == month_idx), None)
             data.append({
                 "name": months[i],
-                "count": row[1] if row else 0,
+                "count": int(row[1]) if row else 0,
                 "value": float(row[2]) if row else 0
             })
             
@@ -274,32 +220,31 @@ def get_monthly_trend(year: int = 2024, db: Session = Depends(get_db)):
         return {"data": [], "error": str(e)}
 
 @router.get("/department-ranking")
+@response_cache.cached("dashboard/department-ranking")
 def get_department_ranking(year: int = 2024, db: Session = Depends(get_db)):
     try:
-        print(f"DEBUG: get_department_ranking called with year={year}")
-        where_year = "AND EXTRACT(YEAR FROM fecha_publicacion) = :year" if year > 0 else ""
-        print(f"DEBUG: where_year clause: {where_year}")
+        where = WhereBuilder().add("departamento != ''")
+        where.equals("anio", year if year > 0 else None, param="year")
         
         sql = text(f"""
             SELECT 
                 departamento as name,
-                COUNT(*) as count,
-                COALESCE(SUM(monto_estimado), 0) as amount
-            FROM licitaciones_cabecera
-            WHERE departamento IS NOT NULL AND departamento != ''
-            {where_year}
+                SUM(total) as count,
+                SUM(monto_total) as amount
+            FROM {CUBO_TABLE}
+            {where.sql()}
             GROUP BY departamento
             ORDER BY count DESC
         """)
         
-        params = {"year": year} if year > 0 else {}
-        result = db.execute(sql, params).fetchall()
-        data = [{"name": row[0], "count": row[1], "amount": float(row[2])} for row in result]
+        result = db.execute(sql, where.params).fetchall()
+        data = [{"name": row[0], "count": int(row[1]), "amount": float(row[2])} for row in result]
         return {"data": data}
     except Exception as e:
         return {"data": [], "error": str(e)}
 
 @router.get("/financial-entities-ranking")
+@response_cache.cached("dashboard/financial-entities-ranking")
 def get_financial_entities_ranking(
     year: int = 2024,
     department: Optional[str] = Query(None, description="Filter by department"),
@@ -307,18 +252,12 @@ def get_financial_entities_ranking(
 ):
     try:
         # Build SQL with filters
-        where_clauses = []
-        params = {}
+        where = WhereBuilder(alias="c")
+        where.period("fecha_publicacion", year if year > 0 else None)
+        where.equals("departamento", department, param="department")
         
-        if year > 0:
-            where_clauses.append("EXTRACT(YEAR FROM c.fecha_publicacion) = :year")
-            params["year"] = year
-            
-        if department:
-            where_clauses.append("c.departamento = :department")
-            params["department"] = department
-
-        where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
+        params = where.params
+        where_sql = where.sql(prefix="", empty="1=1")
 
         # Primary Query: Entidad Financiera (Insurers) from Adjudicaciones
         # Note: We rely on the fact that licitaciones_adjudicaciones has id_convocatoria matching cabecera
@@ -391,34 +330,29 @@ def get_financial_entities_ranking(
          return {"data": [], "error": str(e)}
 
 @router.get("/province-ranking")
+@response_cache.cached("dashboard/province-ranking")
 def get_province_ranking(
     department: str = Query(..., description="Department name"), 
     year: int = 2024,
     db: Session = Depends(get_db)
 ):
     try:
-        where_year = "AND YEAR(fecha_publicacion) = :year" if year > 0 else ""
+        where = WhereBuilder().equals("departamento", department, param="department").add("provincia != ''")
+        where.equals("anio", year if year > 0 else None, param="year")
         
         sql = text(f"""
             SELECT 
                 provincia as name,
-                COUNT(*) as count,
-                COALESCE(SUM(monto_estimado), 0) as amount
-            FROM licitaciones_cabecera
-            WHERE departamento = :department 
-              AND provincia IS NOT NULL 
-              AND provincia != ''
-              {where_year}
+                SUM(total) as count,
+                SUM(monto_total) as amount
+            FROM {CUBO_TABLE}
+            {where.sql()}
             GROUP BY provincia
             ORDER BY count DESC
         """)
-        
-        params = {"department": department}
-        if year > 0:
-            params["year"] = year
             
-        result = db.execute(sql, params).fetchall()
-        data = [{"name": row[0], "count": row[1], "amount": float(row[2])} for row in result]
+        result = db.execute(sql, where.params).fetchall()
+        data = [{"name": row[0], "count": int(row[1]), "amount": float(row[2])} for row in result]
         return {"data": data}
     except Exception as e:
         return {"data": [], "error": str(e)}
@@ -1,12 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from app.database import get_db
+from app.database import get_db, engine
+from app.services.resumen_adjudicaciones import rollup_subquery
+from app.services.filter_catalog import filter_catalog
+from app.utils.sql_filters import WhereBuilder
 from typing import List, Dict, Optional, Literal, Union, Any
 from pydantic import BaseModel
-import pandas as pd
+from collections import Counter
+from openpyxl import Workbook
+import csv
 import io
+import os
+import tempfile
 from datetime import datetime
 
 # ReportLab imports for PDF
@@ -24,80 +32,61 @@ class ExportRequest(BaseModel):
     all_matches: bool = False
     filters: Dict[str, Any] = {} # Use Any to avoid validation strictness causing issues
 
-def build_query(req: ExportRequest):
-    where_clauses = []
-    params = {}
+def build_query(req: ExportRequest, known_years=()):
+    where = WhereBuilder(alias="lc")
+    rollup_where = ""
 
     # If specific IDs are selected and NOT "All Matches"
     if not req.all_matches and req.ids:
-        where_ids = []
-        for i, uid in enumerate(req.ids):
-            param_name = f"id_{i}"
-            where_ids.append(f":{param_name}")
-            params[param_name] = uid
-        where_clauses.append(f"lc.id_convocatoria IN ({','.join(where_ids)})")
+        id_params = {f"id_{i}": uid for i, uid in enumerate(req.ids)}
+        placeholders = ",".join(f":{name}" for name in id_params)
+        where.add(f"lc.id_convocatoria IN ({placeholders})", **id_params)
+        # Only aggregate the selected convocatorias
+        rollup_where = f"WHERE la.id_convocatoria IN ({placeholders})"
     
     # If "All Matches" is true, ignore IDs and use filters
     elif req.all_matches:
         f = req.filters
         if f.get('search'):
-            where_clauses.append("(lc.nomenclatura LIKE :search OR lc.comprador LIKE :search)")
-            params['search'] = f"%{f['search']}%"
-        if f.get('estado'):
-            where_clauses.append("lc.estado_proceso = :estado")
-            params['estado'] = f.get('estado')
-        if f.get('categoria'):
-            where_clauses.append("lc.categoria = :categoria")
-            params['categoria'] = f.get('categoria')
-        if f.get('departamento'):
-            where_clauses.append("lc.departamento = :departamento")
-            params['departamento'] = f.get('departamento')
-        if f.get('provincia'):
-            where_clauses.append("lc.provincia = :provincia")
-            params['provincia'] = f.get('provincia')
-        if f.get('distrito'):
-            where_clauses.append("lc.distrito = :distrito")
-            params['distrito'] = f.get('distrito')
-        filter_anio = req.filters.get('anio')
-        if filter_anio:
-            where_clauses.append("EXTRACT(YEAR FROM lc.fecha_publicacion) = :anio")
-            params['anio'] = filter_anio
-
-        filter_mes = req.filters.get('mes')
-        if filter_mes:
-            where_clauses.append("EXTRACT(MONTH FROM lc.fecha_publicacion) = :mes")
-            params['mes'] = filter_mes
-        if f.get('comprador'):
-            where_clauses.append("lc.comprador = :comprador")
-            params['comprador'] = f.get('comprador')
+            where.add("(lc.nomenclatura LIKE :search OR lc.comprador LIKE :search)", search=f"%{f['search']}%")
+        where.equals("estado_proceso", f.get('estado'), param="estado")
+        where.equals("categoria", f.get('categoria'))
+        where.equals("departamento", f.get('departamento'))
+        where.equals("provincia", f.get('provincia'))
+        where.equals("distrito", f.get('distrito'))
+        # Year/month as half-open ranges on fecha_publicacion
+        where.period("fecha_publicacion", f.get('anio'), f.get('mes'), known_years=known_years)
+        where.equals("comprador", f.get('comprador'))
 
         # Complex filters (Subqueries)
         if f.get('entidad_financiera'):
-             where_clauses.append("""
+            where.add("""
                 EXISTS (
                     SELECT 1 FROM licitaciones_adjudicaciones la 
                     WHERE la.id_convocatoria = lc.id_convocatoria 
                     AND la.entidad_financiera LIKE :entidad_financiera_filter
                 )
-            """)
-             params['entidad_financiera_filter'] = f"%{f['entidad_financiera']}%"
+            """, entidad_financiera_filter=f"%{f['entidad_financiera']}%")
 
         if f.get('tipo_garantia'):
-            where_clauses.append("""
+            where.add("""
                 EXISTS (
                     SELECT 1 FROM licitaciones_adjudicaciones la 
                     WHERE la.id_convocatoria = lc.id_convocatoria 
                     AND la.tipo_garantia LIKE :tipo_garantia_filter
                 )
-            """)
-            params['tipo_garantia_filter'] = f"%{f['tipo_garantia']}%"
+            """, tipo_garantia_filter=f"%{f['tipo_garantia']}%")
     
     else:
         # No IDs and No All Matches -> Empty Result or Error?
         # User implies exporting nothing? Or whole DB? Let's assume nothing.
         return None, {}
 
-    where_sql = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+    where_sql = where.sql()
+    params = where.params
+    if req.all_matches and where_sql:
+        # Only aggregate the matching convocatorias (same filters and params)
+        rollup_where = f"WHERE la.id_convocatoria IN (SELECT lc.id_convocatoria FROM licitaciones_cabecera lc {where_sql})"
     
     # Query Data
     sql = text(f"""
@@ -112,173 +101,257 @@ def build_query(req: ExportRequest):
             lc.departamento,
             lc.provincia,
             lc.distrito,
-            (SELECT GROUP_CONCAT(DISTINCT tipo_garantia SEPARATOR ', ') FROM licitaciones_adjudicaciones WHERE id_convocatoria = lc.id_convocatoria) as tipos_garantia,
-            (SELECT GROUP_CONCAT(DISTINCT entidad_financiera SEPARATOR ', ') FROM licitaciones_adjudicaciones WHERE id_convocatoria = lc.id_convocatoria) as entidades_financieras
+            r.tipo_garantia as tipos_garantia,
+            r.entidad_financiera as entidades_financieras
         FROM licitaciones_cabecera lc
+        LEFT JOIN ({rollup_subquery(rollup_where, separator=', ', garantia_separator=', ')}) r
+            ON r.id_convocatoria = lc.id_convocatoria
         {where_sql}
         ORDER BY lc.fecha_publicacion DESC
     """)
     
     return sql, params
 
+EXPORT_CHUNK_SIZE = 2000
+PDF_DETAIL_ROWS = 100
+
+
+class ExportStats:
+    """Summary counts accumulated chunk by chunk while the rows stream past"""
+
+    def __init__(self):
+        self.total = 0
+        self.estados = Counter()
+        self.categorias = Counter()
+        self.departamentos = Counter()
+
+    def add(self, rows):
+        for row in rows:
+            self.total += 1
+            if row.estado_proceso is not None:
+                self.estados[row.estado_proceso] += 1
+            if row.categoria is not None:
+                self.categorias[row.categoria] += 1
+            if row.departamento is not None:
+                self.departamentos[row.departamento] += 1
+
+    def status_table(self):
+        return [["Estado", "Cantidad", "Porcentaje"]] + [
+            [status, count, f"{(count / self.total) * 100:.1f}%"]
+            for status, count in self.estados.most_common()
+        ]
+
+    def category_table(self):
+        return [["Categoría", "Cantidad"]] + [list(item) for item in self.categorias.most_common()]
+
+    def department_table(self, top: int = 10):
+        return [["Departamento", "Cantidad"]] + [list(item) for item in self.departamentos.most_common(top)]
+
+
+def open_export_stream(sql, params):
+    """
+    Run the export query on a server-side cursor (unbuffered) and fetch the first chunk.
+    Returns (connection, result, columns, first_chunk); the caller must close the connection.
+    """
+    conn = engine.connect().execution_options(stream_results=True)
+    try:
+        result = conn.execute(sql, params)
+        columns = list(result.keys())
+        first_chunk = result.fetchmany(EXPORT_CHUNK_SIZE)
+        return conn, result, columns, first_chunk
+    except Exception:
+        conn.close()
+        raise
+
+
+def iter_chunks(result, first_chunk):
+    chunk = first_chunk
+    while chunk:
+        yield chunk
+        chunk = result.fetchmany(EXPORT_CHUNK_SIZE)
+
+
+def csv_stream(conn, result, columns, first_chunk):
+    """Encode the rows incrementally; only one chunk is held in memory at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    try:
+        writer.writerow(columns)
+        for chunk in iter_chunks(result, first_chunk):
+            writer.writerows(chunk)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    except Exception as e:
+        print(f"EXPORT STREAM ERROR: {e}")
+        raise
+    finally:
+        conn.close()
+
+
+def write_excel(path, result, columns, first_chunk, stats):
+    """openpyxl write-only workbook: rows go straight to disk as they are fetched"""
+    wb = Workbook(write_only=True)
+    ws_resumen = wb.create_sheet("Resumen")
+    ws_detalle = wb.create_sheet("Detalle")
+
+    ws_detalle.append(columns)
+    for chunk in iter_chunks(result, first_chunk):
+        stats.add(chunk)
+        for row in chunk:
+            ws_detalle.append(list(row))
+
+    # Same layout as before: total, then each table separated by two blank rows
+    ws_resumen.append(["Total Licitaciones"])
+    ws_resumen.append([stats.total])
+    for table in (stats.status_table(), stats.category_table(), stats.department_table()):
+        ws_resumen.append([])
+        ws_resumen.append([])
+        for row in table:
+            ws_resumen.append(row)
+
+    wb.save(path)
+
+
+def build_pdf(stats, detail_rows):
+    stream = io.BytesIO()
+    doc = SimpleDocTemplate(stream, pagesize=landscape(A4))
+    elements = []
+    styles = getSampleStyleSheet()
+    
+    # Title
+    title_style = styles['Title']
+    title_style.textColor = colors.HexColor("#1e3a8a")
+    elements.append(Paragraph("Reporte de Licitaciones SEACE", title_style))
+    elements.append(Spacer(1, 10))
+    elements.append(Paragraph(f"Generado el: {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
+    elements.append(Paragraph(f"Total de registros: {stats.total}", styles['Normal']))
+    elements.append(Spacer(1, 20))
+
+    # Helper to create summary tables
+    def create_pdf_table(data):
+        table = Table(data)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#2563EB")),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor("#eff6ff")),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor("#bfdbfe")),
+        ]))
+        return table
+
+    # Summaries Section
+    elements.append(Paragraph("Resumen Ejecutivo", styles['Heading2']))
+
+    # Status Table
+    elements.append(Paragraph("Distribución por Estado", styles['Heading3']))
+    if stats.estados:
+        elements.append(create_pdf_table(stats.status_table()))
+    elements.append(Spacer(1, 15))
+
+    # Category Table
+    elements.append(Paragraph("Distribución por Categoría", styles['Heading3']))
+    if stats.categorias:
+        elements.append(create_pdf_table(stats.category_table()))
+    elements.append(Spacer(1, 20))
+
+    # Detailed List (Limited to first 100)
+    elements.append(Paragraph(f"Detalle de Licitaciones (Primeros {PDF_DETAIL_ROWS} registros)", styles['Heading2']))
+
+    def truncate(value, size):
+        return (str(value)[:size] + '...') if value and len(str(value)) > size else str(value)
+
+    data = [['Nomenclatura', 'Comprador', 'Estado', 'Monto (S/)']] + [
+        [truncate(row.nomenclatura, 40), truncate(row.comprador, 30), row.estado_proceso, row.monto_estimado]
+        for row in detail_rows
+    ]
+    
+    # Adjust column widths
+    col_widths = [250, 200, 100, 100]
+    
+    table = Table(data, colWidths=col_widths)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1e293b")),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ]))
+    
+    elements.append(table)
+    
+    doc.build(elements)
+    stream.seek(0)
+    return stream
+
+
 @router.post("")
 def generate_export_file(req: ExportRequest, db: Session = Depends(get_db)):
     try:
         print(f"Export Request: {req.dict()}") # Debug log
         
         # Build query
-        sql, params = build_query(req)
-        
-        # In exports.py, build_query returns a raw string or text() object? 
-        # If it returns text(...), bool() fails.
-        # We should assume if build_query returns, it's valid, unless it returns None.
+        known_years = filter_catalog.get(db)["anios"] if req.filters.get('mes') and not req.filters.get('anio') else ()
+        sql, params = build_query(req, known_years)
         
         if sql is None:
              raise HTTPException(status_code=400, detail="No selection provided")
 
-        # Load data into DataFrame
-        print("Executing SQL query...") # Debug log
-        # Ensure connection is valid
-        # pd.read_sql with SQLAlchemy connection
-        df = pd.read_sql(sql, db.bind, params=params)
-        print(f"Data loaded. Rows: {len(df)}") # Debug log
+        # Server-side cursor: rows are fetched in chunks, never all at once
+        conn, result, columns, first_chunk = open_export_stream(sql, params)
 
-        if df.empty:
-             raise HTTPException(status_code=404, detail="No matching records found to export")
-
-        # --- Calculations / Aggregations ---
-        total_items = len(df)
-        
-        # Status Stats
-        status_counts = df['estado_proceso'].value_counts()
-        status_stats = []
-        for status, count in status_counts.items():
-            pct = (count / total_items) * 100
-            status_stats.append({"Estado": status, "Cantidad": count, "Porcentaje": f"{pct:.1f}%"})
-        df_status = pd.DataFrame(status_stats)
-
-        # Category Stats
-        cat_counts = df['categoria'].value_counts().reset_index()
-        cat_counts.columns = ['Categoría', 'Cantidad']
-        
-        # Dept Stats (Top 10)
-        dept_counts = df['departamento'].value_counts().head(10).reset_index()
-        dept_counts.columns = ['Departamento', 'Cantidad']
+        if not first_chunk:
+            conn.close()
+            raise HTTPException(status_code=404, detail="No matching records found to export")
 
         filename_prefix = f"reporte_seace_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
         # --- Output Generation ---
 
         if req.format == 'csv':
-            # CSV Just Raw Data
-            stream = io.StringIO()
-            df.to_csv(stream, index=False)
-            response = StreamingResponse(iter([stream.getvalue()]), media_type="text/csv")
+            # CSV Just Raw Data (the generator owns and closes the connection)
+            response = StreamingResponse(csv_stream(conn, result, columns, first_chunk), media_type="text/csv")
             response.headers["Content-Disposition"] = f"attachment; filename={filename_prefix}.csv"
             return response
 
-        elif req.format == 'excel':
-            stream = io.BytesIO()
-            with pd.ExcelWriter(stream, engine='openpyxl') as writer:
-                # Sheet 1: Resumen
-                pd.DataFrame([{"Total Licitaciones": total_items}]).to_excel(writer, sheet_name='Resumen', startrow=0, index=False)
-                
-                # Write aggregated tables with spacing
-                row = 3
-                df_status.to_excel(writer, sheet_name='Resumen', startrow=row, index=False)
-                row += len(df_status) + 3
-                
-                cat_counts.to_excel(writer, sheet_name='Resumen', startrow=row, index=False)
-                row += len(cat_counts) + 3
-                
-                dept_counts.to_excel(writer, sheet_name='Resumen', startrow=row, index=False)
-
-                # Sheet 2: Data
-                df.to_excel(writer, sheet_name='Detalle', index=False)
-                
-            stream.seek(0)
-            response = StreamingResponse(stream, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-            response.headers["Content-Disposition"] = f"attachment; filename={filename_prefix}.xlsx"
-            return response
+        stats = ExportStats()
+        try:
+            if req.format == 'excel':
+                fd, path = tempfile.mkstemp(suffix=".xlsx")
+                os.close(fd)
+                try:
+                    write_excel(path, result, columns, first_chunk, stats)
+                except Exception:
+                    os.remove(path)
+                    raise
+                response = FileResponse(
+                    path,
+                    media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    background=BackgroundTask(os.remove, path)
+                )
+                response.headers["Content-Disposition"] = f"attachment; filename={filename_prefix}.xlsx"
+                return response
 
-        elif req.format == 'pdf':
-            stream = io.BytesIO()
-            doc = SimpleDocTemplate(stream, pagesize=landscape(A4))
-            elements = []
-            styles = getSampleStyleSheet()
-            
-            # Title
-            title_style = styles['Title']
-            title_style.textColor = colors.HexColor("#1e3a8a")
-            elements.append(Paragraph("Reporte de Licitaciones SEACE", title_style))
-            elements.append(Spacer(1, 10))
-            elements.append(Paragraph(f"Generado el: {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
-            elements.append(Paragraph(f"Total de registros: {total_items}", styles['Normal']))
-            elements.append(Spacer(1, 20))
-
-            # Helper to create tables from DF
-            def create_pdf_table(dataframe, title):
-                data = [dataframe.columns.tolist()] + dataframe.values.tolist()
-                table = Table(data)
-                table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#2563EB")),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor("#eff6ff")),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor("#bfdbfe")),
-                ]))
-                return table
-
-            # Summaries Section
-            elements.append(Paragraph("Resumen Ejecutivo", styles['Heading2']))
-
-            # Status Table
-            elements.append(Paragraph("Distribución por Estado", styles['Heading3']))
-            if not df_status.empty:
-                elements.append(create_pdf_table(df_status, "Estados"))
-            elements.append(Spacer(1, 15))
-
-            # Category Table
-            elements.append(Paragraph("Distribución por Categoría", styles['Heading3']))
-            if not cat_counts.empty:
-                elements.append(create_pdf_table(cat_counts, "Categorías"))
-            elements.append(Spacer(1, 20))
-
-            # Detailed List (Limited to first 50)
-            elements.append(Paragraph("Detalle de Licitaciones (Primeros 100 registros)", styles['Heading2']))
-            
-            list_df = df[['nomenclatura', 'comprador', 'estado_proceso', 'monto_estimado']].head(100)
-            list_df.columns = ['Nomenclatura', 'Comprador', 'Estado', 'Monto (S/)']
-            
-            # Truncate long text
-            list_df['Nomenclatura'] = list_df['Nomenclatura'].apply(lambda x: (str(x)[:40] + '...') if x and len(str(x)) > 40 else str(x))
-            list_df['Comprador'] = list_df['Comprador'].apply(lambda x: (str(x)[:30] + '...') if x and len(str(x)) > 30 else str(x))
-            
-            data = [list_df.columns.tolist()] + list_df.values.tolist()
-            
-            # Adjust column widths
-            col_widths = [250, 200, 100, 100]
-            
-            table = Table(data, colWidths=col_widths)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#1e293b")),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ]))
-            
-            elements.append(table)
-            
-            doc.build(elements)
-            stream.seek(0)
-            
-            response = StreamingResponse(stream, media_type="application/pdf")
-            response.headers["Content-Disposition"] = f"attachment; filename={filename_prefix}.pdf"
-            return response
+            elif req.format == 'pdf':
+                # Stats need every row, the detail table only the first ones
+                detail_rows = []
+                for chunk in iter_chunks(result, first_chunk):
+                    stats.add(chunk)
+                    if len(detail_rows) < PDF_DETAIL_ROWS:
+                        detail_rows.extend(chunk[:PDF_DETAIL_ROWS - len(detail_rows)])
+
+                response = StreamingResponse(build_pdf(stats, detail_rows), media_type="application/pdf")
+                response.headers["Content-Disposition"] = f"attachment; filename={filename_prefix}.pdf"
+                return response
+        finally:
+            conn.close()
+
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {req.format}")
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"EXPORT ERROR: {e}")
         import traceback
@@ -1,10 +1,19 @@
 """
 Raw SQL licitaciones endpoint - bypasses SQLAlchemy mapper issues
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.database import get_db
+from app.services.search_index import search_index
+from app.services.suggestion_index import suggestion_index
+from app.services.data_version import data_version
+from app.services.event_outbox import event_outbox, EVENT_NUEVA_CONVOCATORIA, EVENT_NUEVA_ADJUDICACION, EVENT_CAMBIO_ESTADO
+from app.services.resumen_adjudicaciones import fetch_rollups, empty_rollup
+from app.services.filter_catalog import filter_catalog
+from app.services.resumen_cubo import resumen_cubo, periodo_de_fecha
+from app.utils.sql_filters import WhereBuilder
+from app.services.paginacion import count_cache, encode_cursor, keyset_predicate, InvalidCursor, KEYSET_ORDER_SQL
 from typing import Optional
 from datetime import date
 
@@ -18,87 +27,98 @@ def get_search_suggestions(
 ):
     """
     Get autocomplete suggestions for Universal Search.
-    Searches: Comprador, Nomenclatura, Descripcion, RUC Ganador, Ganador Name, Entidad Financiera.
+    Served from the in-memory suggestion index (Comprador, Nomenclatura, OCID,
+    Departamento, Ganador, RUC, Banco); falls back to SQL while it loads.
     """
     try:
-        query_upper = query.upper().strip()
-        search_pattern = f"%{query_upper}%"
-        
-        suggestions = []
-        
-        # 1. Search Entidades, Nomenclaturas, Descripciones, Ubicaciones
-        sql_entidad = text("""
-            SELECT DISTINCT UPPER(TRIM(comprador)) 
-            FROM licitaciones_cabecera 
-            WHERE UPPER(comprador) LIKE :pattern
-            UNION
-            SELECT DISTINCT TRIM(nomenclatura) 
-            FROM licitaciones_cabecera 
-            WHERE UPPER(nomenclatura) LIKE :pattern
-            UNION
-            SELECT DISTINCT ocid 
-            FROM licitaciones_cabecera 
-            WHERE UPPER(ocid) LIKE :pattern
-            UNION
-            SELECT DISTINCT UPPER(TRIM(departamento)) 
-            FROM licitaciones_cabecera 
-            WHERE UPPER(departamento) LIKE :pattern
-            UNION
-            SELECT DISTINCT SUBSTRING(descripcion FROM 1 FOR 60) 
-            FROM licitaciones_cabecera 
-            WHERE UPPER(descripcion) LIKE :pattern
-            LIMIT 8
-        """)
-        entidad_rows = db.execute(sql_entidad, {"pattern": search_pattern}).fetchall()
-        for row in entidad_rows:
-            if row[0]:
-                # Infer type for better UI UX
-                val = row[0]
-                type_label = "General"
-                if len(val) == 2 and val.isdigit(): type_label = "Departamento" # false positive safety, likely won't hit
-                elif "MUNICIPALIDAD" in val or "GOBIERNO" in val or "MINISTERIO" in val: type_label = "Entidad"
-                elif "-" in val and any(c.isdigit() for c in val): type_label = "Código" # OCID/Noms usually have dashes/nums
-                elif len(val) > 20 and " " in val: type_label = "Descripción"
-                else: type_label = "Ubicación/Otro"
-                
-                suggestions.append({"value": val, "type": type_label})
-
-        # 2. Search RUCs and Proveedores (Adjudicaciones)
-        sql_details = text("""
-            SELECT DISTINCT provider, type_label FROM (
-                SELECT UPPER(TRIM(ganador_nombre)) as provider, 'Proveedor' as type_label
-                FROM licitaciones_adjudicaciones 
-                WHERE UPPER(ganador_nombre) LIKE :pattern
-                UNION
-                SELECT ganador_ruc as provider, 'RUC' as type_label
-                FROM licitaciones_adjudicaciones 
-                WHERE ganador_ruc LIKE :pattern
-                UNION
-                SELECT UPPER(TRIM(entidad_financiera)) as provider, 'Banco' as type_label
-                FROM licitaciones_adjudicaciones 
-                WHERE UPPER(entidad_financiera) LIKE :pattern
-            ) as sub
-            LIMIT 10
-        """)
-        detail_rows = db.execute(sql_details, {"pattern": search_pattern}).fetchall()
-        for row in detail_rows:
-            if row[0]:
-                suggestions.append({"value": row[0], "type": row[1]})
-        
-        # Deduplicate
-        seen = set()
-        unique_results = []
-        for s in suggestions:
-            if s['value'] not in seen:
-                seen.add(s['value'])
-                unique_results.append(s)
-        
-        return unique_results[:10]
+        suggestion_index.ensure_fresh(db)
+        if suggestion_index.ready:
+            return suggestion_index.search(query, limit=10)
+        return _search_suggestions_sql(query, db)
     except Exception as e:
         import traceback
         traceback.print_exc()
         return [{"value": f"Error: {str(e)}", "type": "Error"}]
 
+
+def _search_suggestions_sql(query: str, db: Session):
+    """
+    Legacy LIKE-based suggestions, used until the suggestion index is ready.
+    """
+    query_upper = query.upper().strip()
+    search_pattern = f"%{query_upper}%"
+    
+    suggestions = []
+    
+    # 1. Search Entidades, Nomenclaturas, Descripciones, Ubicaciones
+    sql_entidad = text("""
+        SELECT DISTINCT UPPER(TRIM(comprador)) 
+        FROM licitaciones_cabecera 
+        WHERE UPPER(comprador) LIKE :pattern
+        UNION
+        SELECT DISTINCT TRIM(nomenclatura) 
+        FROM licitaciones_cabecera 
+        WHERE UPPER(nomenclatura) LIKE :pattern
+        UNION
+        SELECT DISTINCT ocid 
+        FROM licitaciones_cabecera 
+        WHERE UPPER(ocid) LIKE :pattern
+        UNION
+        SELECT DISTINCT UPPER(TRIM(departamento)) 
+        FROM licitaciones_cabecera 
+        WHERE UPPER(departamento) LIKE :pattern
+        UNION
+        SELECT DISTINCT SUBSTRING(descripcion FROM 1 FOR 60) 
+        FROM licitaciones_cabecera 
+        WHERE UPPER(descripcion) LIKE :pattern
+        LIMIT 8
+    """)
+    entidad_rows = db.execute(sql_entidad, {"pattern": search_pattern}).fetchall()
+    for row in entidad_rows:
+        if row[0]:
+            # Infer type for better UI UX
+            val = row[0]
+            type_label = "General"
+            if len(val) == 2 and val.isdigit(): type_label = "Departamento" # false positive safety, likely won't hit
+            elif "MUNICIPALIDAD" in val or "GOBIERNO" in val or "MINISTERIO" in val: type_label = "Entidad"
+            elif "-" in val and any(c.isdigit() for c in val): type_label = "Código" # OCID/Noms usually have dashes/nums
+            elif len(val) > 20 and " " in val: type_label = "Descripción"
+            else: type_label = "Ubicación/Otro"
+            
+            suggestions.append({"value": val, "type": type_label})
+
+    # 2. Search RUCs and Proveedores (Adjudicaciones)
+    sql_details = text("""
+        SELECT DISTINCT provider, type_label FROM (
+            SELECT UPPER(TRIM(ganador_nombre)) as provider, 'Proveedor' as type_label
+            FROM licitaciones_adjudicaciones 
+            WHERE UPPER(ganador_nombre) LIKE :pattern
+            UNION
+            SELECT ganador_ruc as provider, 'RUC' as type_label
+            FROM licitaciones_adjudicaciones 
+            WHERE ganador_ruc LIKE :pattern
+            UNION
+            SELECT UPPER(TRIM(entidad_financiera)) as provider, 'Banco' as type_label
+            FROM licitaciones_adjudicaciones 
+            WHERE UPPER(entidad_financiera) LIKE :pattern
+        ) as sub
+        LIMIT 10
+    """)
+    detail_rows = db.execute(sql_details, {"pattern": search_pattern}).fetchall()
+    for row in detail_rows:
+        if row[0]:
+            suggestions.append({"value": row[0], "type": row[1]})
+    
+    # Deduplicate
+    seen = set()
+    unique_results = []
+    for s in suggestions:
+        if s['value'] not in seen:
+            seen.add(s['value'])
+            unique_results.append(s)
+    
+    return unique_results[:10]
+
 @router.get("/filters/all")
 def get_all_filters(db: Session = Depends(get_db)):
     """
@@ -115,73 +135,16 @@ def get_all_filters(db: Session = Depends(get_db)):
     }
 
     try:
-        # 1. Departamentos
-        depts = db.execute(text("SELECT DISTINCT UPPER(TRIM(departamento)) FROM licitaciones_cabecera WHERE departamento IS NOT NULL AND TRIM(departamento) != '' ORDER BY 1")).fetchall()
-        departamentos = [r[0] for r in depts if r[0]]
-        if not departamentos: departamentos = DEFAULTS["departamentos"]
-
-        # 2. Categorias
-        cats = db.execute(text("SELECT DISTINCT UPPER(TRIM(categoria)) FROM licitaciones_cabecera WHERE categoria IS NOT NULL AND TRIM(categoria) != '' ORDER BY 1")).fetchall()
-        categorias = [r[0] for r in cats if r[0]]
-        if not categorias: categorias = DEFAULTS["categorias"]
-
-        # 3. Estados
-        ests = db.execute(text("SELECT DISTINCT UPPER(TRIM(estado_proceso)) FROM licitaciones_cabecera WHERE estado_proceso IS NOT NULL AND TRIM(estado_proceso) != '' ORDER BY 1")).fetchall()
-        estados = [r[0] for r in ests if r[0]]
-        if not estados: estados = DEFAULTS["estados"]
-
-        # 4. Aseguradoras in adjudicaciones
-        asegs_raw = db.execute(text("SELECT DISTINCT UPPER(TRIM(entidad_financiera)) FROM licitaciones_adjudicaciones WHERE entidad_financiera IS NOT NULL AND TRIM(entidad_financiera) != ''")).fetchall()
-        
-        aseguradoras_set = set()
-        for r in asegs_raw:
-            val = r[0]
-            if val:
-                # Split by '|' to handle consortiums like "AVLA | CESCE"
-                parts = val.split('|')
-                for p in parts:
-                    clean_p = p.strip()
-                    if clean_p:
-                        aseguradoras_set.add(clean_p)
-        
-        # Normalization Logic using Shared Utility
-        from app.utils.normalization import normalize_insurer_name
-        
-        normalized_set = set()
-        for name in aseguradoras_set:
-            mapped_name = normalize_insurer_name(name)
-            normalized_set.add(mapped_name)
-
-        aseguradoras = sorted(list(normalized_set))
-        if not aseguradoras: aseguradoras = DEFAULTS["aseguradoras"]
-
-        # NEW: 5. Periodos (Años)
-        anio_sql = text("SELECT DISTINCT EXTRACT(YEAR FROM fecha_publicacion) FROM licitaciones_cabecera WHERE fecha_publicacion IS NOT NULL")
-        db_anios = {int(r[0]) for r in db.execute(anio_sql).fetchall() if r[0]}
-        standard_anios = {2026, 2025, 2024}
-        anios = sorted(list(db_anios.union(standard_anios)), reverse=True)
-
-        # NEW: 6. Entidades (Comprador)
-        entidad_sql = text("SELECT DISTINCT UPPER(TRIM(comprador)) FROM licitaciones_cabecera WHERE comprador IS NOT NULL AND TRIM(comprador) != '' ORDER BY 1")
-        entidades = [r[0] for r in db.execute(entidad_sql).fetchall() if r[0]]
-
-        # NEW: 7. Tipos de Garantia
-        garantia_sql = text("SELECT DISTINCT UPPER(TRIM(tipo_garantia)) FROM licitaciones_adjudicaciones WHERE tipo_garantia IS NOT NULL AND TRIM(tipo_garantia) != ''")
-        raw_garantias = [r[0] for r in db.execute(garantia_sql).fetchall() if r[0]]
-        garantias_set = set()
-        for g in raw_garantias:
-            parts = [p.strip() for p in g.split('|')]
-            garantias_set.update(parts)
-        tipos_garantia = sorted(list(garantias_set))
-        
+        # Served from the materialized catalog (recomputed only when data changes)
+        catalog = filter_catalog.get(db)
         return {
-            "departamentos": departamentos,
-            "categorias": categorias,
-            "estados": estados,
-            "aseguradoras": aseguradoras,
-            "anios": anios,
-            "entidades": entidades,
-            "tipos_garantia": tipos_garantia
+            "departamentos": catalog["departamentos"] or DEFAULTS["departamentos"],
+            "categorias": catalog["categorias"] or DEFAULTS["categorias"],
+            "estados": catalog["estados"] or DEFAULTS["estados"],
+            "aseguradoras": catalog["aseguradoras"] or DEFAULTS["aseguradoras"],
+            "anios": catalog["anios"],
+            "entidades": catalog["entidades"],
+            "tipos_garantia": catalog["tipos_garantia"]
         }
     except Exception as e:
         print(f"Error getting filters: {e}")
@@ -203,37 +166,51 @@ def get_licitaciones(
     entidad_financiera: Optional[str] = Query(None),
     comprador: Optional[str] = Query(None),
     origen: Optional[str] = Query(None), # New parameter
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from the previous response"),
+    keyset: bool = Query(False, description="Use cursor pagination (first page)"),
+    include_total: bool = Query(True, description="Compute the (cached) total count"),
     db: Session = Depends(get_db)
 ):
     """
     Get paginated list of licitaciones using RAW SQL.
     Returns data from licitaciones_cabecera table.
+
+    Cursor mode (keyset=true or cursor=...) orders by (fecha_publicacion, id_convocatoria)
+    and seeks past the previous page instead of using OFFSET, so deep pages cost the
+    same as the first one. The response carries next_cursor/has_more; `page` is ignored
+    and search results keep their filter but follow the date order instead of relevance.
     """
+    cursor_mode = keyset or bool(cursor)
+    search_join = ""
     
     try:
         # Build WHERE clause
-        where_clauses = []
+        where = WhereBuilder(alias="lc")
         params = {}
         
-        if search:
+        # Ranked FULLTEXT search when indexes exist; LIKE scan otherwise
+        fulltext = search_index.search_join(db, search) if search else None
+        if fulltext:
+            search_join, ft_params = fulltext
+            params.update(ft_params)
+        elif search:
             # Universal Search Logic - Comprehensive search across ALL relevant fields
-            search_term = f"%{search.upper()}%"
-            where_clauses.append("""
+            where.add("""
                 (
-                    UPPER(nomenclatura) LIKE :search OR 
-                    UPPER(comprador) LIKE :search OR 
-                    UPPER(descripcion) LIKE :search OR
-                    UPPER(ocid) LIKE :search OR
-                    UPPER(departamento) LIKE :search OR
-                    UPPER(provincia) LIKE :search OR
-                    UPPER(distrito) LIKE :search OR
-                    UPPER(ubicacion_completa) LIKE :search OR
-                    UPPER(categoria) LIKE :search OR
-                    UPPER(tipo_procedimiento) LIKE :search OR
-                    UPPER(estado_proceso) LIKE :search OR
+                    UPPER(lc.nomenclatura) LIKE :search OR 
+                    UPPER(lc.comprador) LIKE :search OR 
+                    UPPER(lc.descripcion) LIKE :search OR
+                    UPPER(lc.ocid) LIKE :search OR
+                    UPPER(lc.departamento) LIKE :search OR
+                    UPPER(lc.provincia) LIKE :search OR
+                    UPPER(lc.distrito) LIKE :search OR
+                    UPPER(lc.ubicacion_completa) LIKE :search OR
+                    UPPER(lc.categoria) LIKE :search OR
+                    UPPER(lc.tipo_procedimiento) LIKE :search OR
+                    UPPER(lc.estado_proceso) LIKE :search OR
                     EXISTS (
                         SELECT 1 FROM licitaciones_adjudicaciones la 
-                        WHERE la.id_convocatoria = licitaciones_cabecera.id_convocatoria 
+                        WHERE la.id_convocatoria = lc.id_convocatoria 
                         AND (
                             UPPER(la.ganador_nombre) LIKE :search OR 
                             la.ganador_ruc LIKE :search OR 
@@ -244,58 +221,36 @@ def get_licitaciones(
                         )
                     )
                 )
-            """)
-            params['search'] = search_term
-        if estado:
-            where_clauses.append("UPPER(TRIM(estado_proceso)) = :estado")
-            params['estado'] = estado
-        if categoria:
-            where_clauses.append("UPPER(TRIM(categoria)) = :categoria")
-            params['categoria'] = categoria
-        if departamento:
-            where_clauses.append("UPPER(TRIM(departamento)) = :departamento")
-            params['departamento'] = departamento
-        if provincia:
-            where_clauses.append("UPPER(TRIM(provincia)) = :provincia")
-            params['provincia'] = provincia
-        if distrito:
-            where_clauses.append("UPPER(TRIM(distrito)) = :distrito")
-            params['distrito'] = distrito
-        if anio:
-            where_clauses.append("EXTRACT(YEAR FROM fecha_publicacion) = :anio")
-            params['anio'] = anio
-        if comprador:
-            where_clauses.append("UPPER(TRIM(comprador)) = :comprador")
-            params['comprador'] = comprador
+            """, search=f"%{search.upper()}%")
+        where.equals("estado_proceso", estado, param="estado", normalize=True)
+        where.equals("categoria", categoria, normalize=True)
+        where.equals("departamento", departamento, normalize=True)
+        where.equals("provincia", provincia, normalize=True)
+        where.equals("distrito", distrito, normalize=True)
+        where.equals("comprador", comprador, normalize=True)
+        
+        # Year/month as half-open ranges on fecha_publicacion (index friendly)
+        known_years = filter_catalog.get(db)["anios"] if mes and not anio else ()
+        where.period("fecha_publicacion", anio, mes, known_years=known_years)
             
         # Origin Filter (Manual vs Automatic)
         if origen and origen != "Todos":
             if origen == "Manuales":
                 # Manual IDs are UUIDs (36 chars)
-                where_clauses.append("LENGTH(id_convocatoria) > 20")
+                where.add("LENGTH(lc.id_convocatoria) > 20")
             elif origen == "Automático":
                 # Automatic IDs are shorter SEACE IDs
-                where_clauses.append("LENGTH(id_convocatoria) <= 20")
-
-        if mes:
-            # Handle month filtering (1-12)
-            try:
-                mes_int = int(mes)
-                where_clauses.append("EXTRACT(MONTH FROM fecha_publicacion) = :mes")
-                params['mes'] = mes_int
-            except ValueError:
-                pass # Ignore invalid month inputs
+                where.add("LENGTH(lc.id_convocatoria) <= 20")
             
         # Advanced Filters: Subqueries for Adjudicaciones
         if tipo_garantia:
-            where_clauses.append("""
+            where.add("""
                 EXISTS (
                     SELECT 1 FROM licitaciones_adjudicaciones la 
-                    WHERE la.id_convocatoria = licitaciones_cabecera.id_convocatoria 
+                    WHERE la.id_convocatoria = lc.id_convocatoria 
                     AND UPPER(la.tipo_garantia) LIKE :garantia
                 )
-            """)
-            params['garantia'] = f"%{tipo_garantia.upper()}%"
+            """, garantia=f"%{tipo_garantia.upper()}%")
             
         if entidad_financiera:
             # Handle Aliases
@@ -303,52 +258,53 @@ def get_licitaciones(
             
             # Special BCP Hybrid Match
             if "BANCO DE CREDITO" in search_entidad or search_entidad == "BCP":
-                where_clauses.append("""
-                    EXISTS (
-                        SELECT 1 FROM licitaciones_adjudicaciones la 
-                        WHERE la.id_convocatoria = licitaciones_cabecera.id_convocatoria 
-                        AND (UPPER(la.entidad_financiera) LIKE '%CREDITO%' OR UPPER(la.entidad_financiera) LIKE '%BCP%')
-                    )
-                """)
+                entidad_sql = "(UPPER(la.entidad_financiera) LIKE '%CREDITO%' OR UPPER(la.entidad_financiera) LIKE '%BCP%')"
             elif search_entidad == "BBVA":
-                where_clauses.append("""
-                    EXISTS (
-                        SELECT 1 FROM licitaciones_adjudicaciones la 
-                        WHERE la.id_convocatoria = licitaciones_cabecera.id_convocatoria 
-                        AND UPPER(la.entidad_financiera) LIKE '%BBVA%'
-                    )
-                """)
+                entidad_sql = "UPPER(la.entidad_financiera) LIKE '%BBVA%'"
             elif search_entidad == "INTERBANK":
-                where_clauses.append("""
-                    EXISTS (
-                        SELECT 1 FROM licitaciones_adjudicaciones la 
-                        WHERE la.id_convocatoria = licitaciones_cabecera.id_convocatoria 
-                        AND (UPPER(la.entidad_financiera) LIKE '%INTERBANK%' OR UPPER(la.entidad_financiera) LIKE '%INTERNACIONAL%')
-                    )
-                """)
+                entidad_sql = "(UPPER(la.entidad_financiera) LIKE '%INTERBANK%' OR UPPER(la.entidad_financiera) LIKE '%INTERNACIONAL%')"
             else:
-                where_clauses.append("""
-                    EXISTS (
-                        SELECT 1 FROM licitaciones_adjudicaciones la 
-                        WHERE la.id_convocatoria = licitaciones_cabecera.id_convocatoria 
-                        AND UPPER(la.entidad_financiera) LIKE :entidad
-                    )
-                """)
+                entidad_sql = "UPPER(la.entidad_financiera) LIKE :entidad"
                 params['entidad'] = f"%{search_entidad}%"
+            where.add(f"""
+                EXISTS (
+                    SELECT 1 FROM licitaciones_adjudicaciones la 
+                    WHERE la.id_convocatoria = lc.id_convocatoria 
+                    AND {entidad_sql}
+                )
+            """)
 
-        where_sql = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+        params.update(where.params)
+        where_sql = where.sql()
         
-        # Get total count
-        count_sql = text(f"""
-            SELECT COUNT(DISTINCT id_convocatoria)
-            FROM licitaciones_cabecera
-            {where_sql}
-        """)
-        
-        total = db.execute(count_sql, params).scalar() or 0
+        # Get total count (cached per filter combination and data generation)
+        total = None
+        if include_total:
+            count_sql = f"""
+                SELECT COUNT(DISTINCT lc.id_convocatoria)
+                FROM licitaciones_cabecera lc
+                {search_join}
+                {where_sql}
+            """
+            total = count_cache.get_or_count(db, count_sql, params)
         
         # Get paginated data
-        offset = (page - 1) * limit
+        if cursor_mode:
+            page_where_sql = where_sql
+            if cursor:
+                seek_sql, seek_params = keyset_predicate(cursor)
+                params.update(seek_params)
+                page_where_sql = where.add(seek_sql).sql()
+            order_sql = KEYSET_ORDER_SQL
+            # One extra row tells whether there is a next page
+            params['limit'] = limit + 1
+            params['offset'] = 0
+        else:
+            page_where_sql = where_sql
+            order_sql = f'{"sh.score DESC, " if search_join else ""}lc.fecha_publicacion DESC'
+            params['limit'] = limit
+            params['offset'] = (page - 1) * limit
+        
         data_sql = text(f"""
             SELECT 
                 lc.id_convocatoria,
@@ -365,29 +321,28 @@ def get_licitaciones(
                 lc.ubicacion_completa,
                 lc.departamento,
                 lc.provincia,
-                lc.distrito,
-                (SELECT GROUP_CONCAT(DISTINCT la.ganador_nombre SEPARATOR ' | ') FROM licitaciones_adjudicaciones la WHERE la.id_convocatoria = lc.id_convocatoria) as ganador_nombre,
-                (SELECT GROUP_CONCAT(DISTINCT la.ganador_ruc SEPARATOR ' | ') FROM licitaciones_adjudicaciones la WHERE la.id_convocatoria = lc.id_convocatoria) as ganador_ruc,
-                (SELECT GROUP_CONCAT(DISTINCT la.entidad_financiera SEPARATOR ' | ') FROM licitaciones_adjudicaciones la WHERE la.id_convocatoria = lc.id_convocatoria) as entidad_financiera,
-                (SELECT GROUP_CONCAT(DISTINCT la.tipo_garantia SEPARATOR ',') FROM licitaciones_adjudicaciones la WHERE la.id_convocatoria = lc.id_convocatoria) as tipo_garantia,
-                (SELECT SUM(la.monto_adjudicado) FROM licitaciones_adjudicaciones la WHERE la.id_convocatoria = lc.id_convocatoria) as monto_total_adjudicado,
-                (SELECT COUNT(*) FROM licitaciones_adjudicaciones la WHERE la.id_convocatoria = lc.id_convocatoria) as total_adjudicaciones,
-                (SELECT la.fecha_adjudicacion FROM licitaciones_adjudicaciones la WHERE la.id_convocatoria = lc.id_convocatoria LIMIT 1) as fecha_adjudicacion,
-                (SELECT la.id_contrato FROM licitaciones_adjudicaciones la WHERE la.id_convocatoria = lc.id_convocatoria LIMIT 1) as id_contrato
+                lc.distrito
             FROM licitaciones_cabecera lc
-            {where_sql.replace('licitaciones_cabecera', 'lc') if where_sql else ''}
-            ORDER BY lc.fecha_publicacion DESC
+            {search_join}
+            {page_where_sql}
+            ORDER BY {order_sql}
             LIMIT :limit OFFSET :offset
         """)
         
-        params['limit'] = limit
-        params['offset'] = offset
-        
         rows = db.execute(data_sql, params).fetchall()
         
+        has_more = False
+        if cursor_mode and len(rows) > limit:
+            has_more = True
+            rows = rows[:limit]
+        
+        # Adjudicaciones rollups for the whole page in one grouped query
+        rollups = fetch_rollups(db, [row[0] for row in rows])
+        
         # Format results
         items = []
         for row in rows:
+            rollup = rollups.get(row[0]) or empty_rollup()
             items.append({
                 "id_convocatoria": row[0],
                 "ocid": row[1],
@@ -404,18 +359,29 @@ def get_licitaciones(
                 "departamento": row[12],
                 "provincia": row[13],
                 "distrito": row[14],
-                # New fields from subqueries
-                "ganador_nombre": row[15],
-                "ganador_ruc": row[16],
-                "entidad_financiera": row[17],
-                "tipo_garantia": row[18],
-                "monto_total_adjudicado": float(row[19]) if row[19] else 0,
-                "total_adjudicaciones": int(row[20]) if row[20] else 0,
-                "fecha_adjudicacion": row[21].isoformat() if row[21] else None,
-                "id_contrato": row[22]
+                # Fields from the adjudicaciones rollup
+                "ganador_nombre": rollup["ganador_nombre"],
+                "ganador_ruc": rollup["ganador_ruc"],
+                "entidad_financiera": rollup["entidad_financiera"],
+                "tipo_garantia": rollup["tipo_garantia"],
+                "monto_total_adjudicado": float(rollup["monto_total_adjudicado"]) if rollup["monto_total_adjudicado"] else 0,
+                "total_adjudicaciones": int(rollup["total_adjudicaciones"]) if rollup["total_adjudicaciones"] else 0,
+                "fecha_adjudicacion": rollup["fecha_adjudicacion"].isoformat() if rollup["fecha_adjudicacion"] else None,
+                "id_contrato": rollup["id_contrato"]
             })
         
+        if cursor_mode:
+            last = rows[-1] if rows else None
+            return {
+                "total": total,
+                "limit": limit,
+                "has_more": has_more,
+                "next_cursor": encode_cursor(last[9], last[0]) if has_more else None,
+                "items": items
+            }
+        
         # Calculate pagination
+        total = total or 0
         total_pages = (total + limit - 1) // limit if limit > 0 else 0
         
         return {
@@ -426,7 +392,13 @@ def get_licitaciones(
             "items": items
         }
         
+    except InvalidCursor as e:
+        # Client error, not an empty result
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        if search_join:
+            # The FULLTEXT indexes may have been dropped: re-check before the next search
+            search_index.invalidate()
         import traceback
         traceback.print_exc()
         return {
@@ -441,46 +413,45 @@ def get_licitaciones(
 
 @router.get("/locations")
 def get_locations(
+    request: Request,
+    response: Response,
     departamento: Optional[str] = Query(None),
     provincia: Optional[str] = Query(None),
     db: Session = Depends(get_db)
 ):
     """
-    Get cascading location options (Raw Repo Version)
+    Get cascading location options from the prebuilt location tree.
+    Besides the legacy provincias/distritos lists, `arbol` carries the whole
+    subtree below the requested level (the full tree when no departamento is
+    given), so the dropdowns can be filled without chained requests.
+    Supports ETag / If-None-Match.
     """
     try:
+        catalog = filter_catalog.get(db)
+        etag = catalog["ubicaciones_etag"]
+        headers = {"ETag": etag, "Cache-Control": "public, max-age=300"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+        tree = catalog["ubicaciones"]
         provincias = []
         distritos = []
+        arbol = tree
 
         if departamento:
-            # Normalize input
-            dept_normalized = departamento.upper().strip()
-            
-            # Get Provincias
-            prov_sql = text("""
-                SELECT DISTINCT UPPER(TRIM(provincia)) 
-                FROM licitaciones_cabecera 
-                WHERE UPPER(TRIM(departamento)) = :dept AND provincia IS NOT NULL AND TRIM(provincia) != '' 
-                ORDER BY 1
-            """)
-            provincias = [row[0] for row in db.execute(prov_sql, {"dept": dept_normalized}).fetchall() if row[0]]
+            dept_tree = tree.get(departamento.upper().strip(), {})
+            provincias = list(dept_tree)
+            arbol = dept_tree
 
             if provincia:
-                # Normalize input
-                prov_normalized = provincia.upper().strip()
-                
-                # Get Distritos
-                dist_sql = text("""
-                    SELECT DISTINCT UPPER(TRIM(distrito)) 
-                    FROM licitaciones_cabecera 
-                    WHERE UPPER(TRIM(departamento)) = :dept AND UPPER(TRIM(provincia)) = :prov AND distrito IS NOT NULL AND TRIM(distrito) != '' 
-                    ORDER BY 1
-                """)
-                distritos = [row[0] for row in db.execute(dist_sql, {"dept": dept_normalized, "prov": prov_normalized}).fetchall() if row[0]]
+                distritos = dept_tree.get(provincia.upper().strip(), [])
+                arbol = {provincia.upper().strip(): distritos}
 
         return {
             "provincias": provincias,
-            "distritos": distritos
+            "distritos": distritos,
+            "arbol": arbol
         }
     except Exception as e:
         return {"error": str(e)}
@@ -572,52 +543,6 @@ def get_licitacion_detail(
 
 
 
-@router.get("/locations")
-def get_locations(
-    departamento: Optional[str] = Query(None),
-    provincia: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
-):
-    """
-    Get cascading location options (Raw Repo Version)
-    """
-    try:
-        provincias = []
-        distritos = []
-
-        if departamento:
-            # Normalize input
-            dept_normalized = departamento.upper().strip()
-            
-            # Get Provincias
-            prov_sql = text("""
-                SELECT DISTINCT UPPER(TRIM(provincia)) 
-                FROM licitaciones_cabecera 
-                WHERE UPPER(TRIM(departamento)) = :dept AND provincia IS NOT NULL AND TRIM(provincia) != '' 
-                ORDER BY 1
-            """)
-            provincias = [row[0] for row in db.execute(prov_sql, {"dept": dept_normalized}).fetchall() if row[0]]
-
-            if provincia:
-                # Normalize input
-                prov_normalized = provincia.upper().strip()
-                
-                # Get Distritos
-                dist_sql = text("""
-                    SELECT DISTINCT UPPER(TRIM(distrito)) 
-                    FROM licitaciones_cabecera 
-                    WHERE UPPER(TRIM(departamento)) = :dept AND UPPER(TRIM(provincia)) = :prov AND distrito IS NOT NULL AND TRIM(distrito) != '' 
-                    ORDER BY 1
-                """)
-                distritos = [row[0] for row in db.execute(dist_sql, {"dept": dept_normalized, "prov": prov_normalized}).fetchall() if row[0]]
-
-        return {
-            "provincias": provincias,
-            "distritos": distritos
-        }
-    except Exception as e:
-        return {"error": str(e)}
-
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -702,6 +627,8 @@ def create_licitacion(licitacion: LicitacionCreate, db: Session = Depends(get_db
             "dist": licitacion.distrito
         })
         
+        event_outbox.publish(db, EVENT_NUEVA_CONVOCATORIA, new_id)
+
         # 3. Insert Adjudicaciones
         if licitacion.adjudicaciones:
             sql_adj = text("""
@@ -730,7 +657,10 @@ def create_licitacion(licitacion: LicitacionCreate, db: Session = Depends(get_db
                     "garantia": adj.tipo_garantia,
                     "contrato": adj.id_contrato
                 })
+                event_outbox.publish(db, EVENT_NUEVA_ADJUDICACION, adj_id)
         
+        resumen_cubo.refresh_periods(db, [periodo_de_fecha(licitacion.fecha_publicacion)])
+        data_version.bump(db)
         db.commit()
         
         # NOTIFICATION
@@ -752,20 +682,33 @@ def create_licitacion(licitacion: LicitacionCreate, db: Session = Depends(get_db
         db.rollback()
         return {"error": str(e)}
 
+def _claves_adjudicacion(id_contrato, ganador_ruc, fecha_adjudicacion):
+    """Claves para reconocer una adjudicación ya existente: id_contrato, o RUC + fecha"""
+    claves = []
+    if id_contrato:
+        claves.append(("contrato", str(id_contrato)))
+    if ganador_ruc and fecha_adjudicacion:
+        claves.append(("ruc_fecha", str(ganador_ruc), str(fecha_adjudicacion)[:10]))
+    return claves
+
 @router.put("/{id}")
 def update_licitacion(id: str, licitacion: LicitacionCreate, db: Session = Depends(get_db)):
     """
     Update existing licitacion (Raw SQL)
     """
     try:
-        # Detect State Change
-        old_state = "DESCONOCIDO"
+        # Detect State Change (None si la licitación no existe o no tiene estado)
+        old_state = None
         try:
             current = db.execute(text("SELECT estado_proceso FROM licitaciones_cabecera WHERE id_convocatoria = :id"), {"id": id}).fetchone()
             if current:
                 old_state = current[0]
         except:
             pass
+        
+        # Dashboard cube periods touched by the old and the new fecha_publicacion
+        periodos = resumen_cubo.periods_for_ids(db, [id])
+        periodos.add(periodo_de_fecha(licitacion.fecha_publicacion))
             
         # 1. Update Header
         sql_header = text("""
@@ -799,6 +742,15 @@ def update_licitacion(id: str, licitacion: LicitacionCreate, db: Session = Depen
         })
         
         # 2. Handle Adjudicaciones (Simple Strategy: Delete All for this ID and Re-insert)
+        # Existing rows keep their id_adjudicacion so only truly new awards are published
+        previas = {}
+        for row in db.execute(text("""
+            SELECT id_adjudicacion, id_contrato, ganador_ruc, fecha_adjudicacion
+            FROM licitaciones_adjudicaciones WHERE id_convocatoria = :id
+        """), {"id": id}).fetchall():
+            for clave in _claves_adjudicacion(row[1], row[2], row[3]):
+                previas.setdefault(clave, row[0])
+
         del_adj = text("DELETE FROM licitaciones_adjudicaciones WHERE id_convocatoria = :id")
         db.execute(del_adj, {"id": id})
         
@@ -817,8 +769,15 @@ def update_licitacion(id: str, licitacion: LicitacionCreate, db: Session = Depen
             """)
             
             import uuid
+            reutilizadas = set()
             for adj in licitacion.adjudicaciones:
-                adj_id = str(uuid.uuid4()) # New ID for re-inserted items
+                # Each previous row can only be matched once
+                adj_id = next((previas[c] for c in _claves_adjudicacion(adj.id_contrato, adj.ganador_ruc, adj.fecha_adjudicacion)
+                               if c in previas and previas[c] not in reutilizadas), None)
+                es_nueva = adj_id is None
+                if es_nueva:
+                    adj_id = str(uuid.uuid4()) # New ID for new items
+                reutilizadas.add(adj_id)
                 db.execute(sql_adj, {
                     "id_adj": adj_id,
                     "id_conv": id,
@@ -831,7 +790,14 @@ def update_licitacion(id: str, licitacion: LicitacionCreate, db: Session = Depen
                     "garantia": adj.tipo_garantia,
                     "contrato": adj.id_contrato
                 })
+                if es_nueva:
+                    event_outbox.publish(db, EVENT_NUEVA_ADJUDICACION, adj_id)
         
+        if old_state and licitacion.estado_proceso and old_state != licitacion.estado_proceso:
+            event_outbox.publish(db, EVENT_CAMBIO_ESTADO, id, {"anterior": old_state, "nuevo": licitacion.estado_proceso})
+
+        resumen_cubo.refresh_periods(db, periodos)
+        data_version.bump(db)
         db.commit()
         
         # NOTIFICATION (State Change)
@@ -894,6 +860,8 @@ def delete_licitacion(id: str, db: Session = Depends(get_db)):
             row = db.execute(text("SELECT descripcion FROM licitaciones_cabecera WHERE id_convocatoria = :id"), {"id": id}).fetchone()
             if row: desc = row[0][:50]
         except: pass
+        
+        periodos = resumen_cubo.periods_for_ids(db, [id])
 
         # Delete Adjudicaciones First (Manual Cascade)
         sql_del_adj = text("DELETE FROM licitaciones_adjudicaciones WHERE id_convocatoria = :id")
@@ -903,6 +871,8 @@ def delete_licitacion(id: str, db: Session = Depends(get_db)):
         sql_del_head = text("DELETE FROM licitaciones_cabecera WHERE id_convocatoria = :id")
         result = db.execute(sql_del_head, {"id": id})
         
+        resumen_cubo.refresh_periods(db, periodos)
+        data_version.bump(db)
         db.commit()
         
         # NOTIFICATION
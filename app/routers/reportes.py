@@ -4,6 +4,9 @@ from sqlalchemy import func, case, text
 from typing import Optional, List, Any
 from pydantic import BaseModel
 from app.database import get_db
+from app.services.response_cache import response_cache
+from app.services.filter_catalog import filter_catalog
+from app.utils.sql_filters import WhereBuilder
 from app.models.seace import LicitacionesCabecera, LicitacionesAdjudicaciones
 from datetime import datetime
 
@@ -26,6 +29,7 @@ class GenerarReporteRequest(BaseModel):
     filtros: ReporteFiltros
 
 @router.post("/generar")
+@response_cache.cached("reportes/generar")
 def generar_reporte(request: GenerarReporteRequest, db: Session = Depends(get_db)):
     """
     Genera reportes agrupados según el tipo seleccionado y filtros aplicados.
@@ -49,41 +53,29 @@ def generar_reporte(request: GenerarReporteRequest, db: Session = Depends(get_db
     # Common joins
     # Most reports need headers + adjudications
     
-    params = {}
-    where_clauses = ["a.entidad_financiera IS NOT NULL", "a.entidad_financiera != ''", "a.entidad_financiera != 'SIN_GARANTIA'"] if tipo == 'entidad' else ["1=1"]
+    where = WhereBuilder(alias="c")
+    if tipo == 'entidad':
+        where.add("a.entidad_financiera IS NOT NULL")
+        where.add("a.entidad_financiera != ''")
+        where.add("a.entidad_financiera != 'SIN_GARANTIA'")
     
     # Apply filters to WHERE
-    if filtros.departamento:
-        where_clauses.append("UPPER(c.departamento) = UPPER(:departamento)")
-        params['departamento'] = filtros.departamento
-    if filtros.provincia:
-        where_clauses.append("UPPER(c.provincia) = UPPER(:provincia)")
-        params['provincia'] = filtros.provincia
-    if filtros.distrito:
-        where_clauses.append("UPPER(c.distrito) = UPPER(:distrito)")
-        params['distrito'] = filtros.distrito
-    if filtros.estado_proceso:
-        where_clauses.append("UPPER(c.estado_proceso) = UPPER(:estado_proceso)")
-        params['estado_proceso'] = filtros.estado_proceso
-    if filtros.categoria:
-        where_clauses.append("UPPER(c.categoria) = UPPER(:categoria)")
-        params['categoria'] = filtros.categoria
-    if filtros.comprador:
-        where_clauses.append("UPPER(c.comprador) LIKE UPPER(:comprador)")
-        params['comprador'] = f"%{filtros.comprador}%"
-    if filtros.year:
-        where_clauses.append("YEAR(c.fecha_publicacion) = :year")
-        params['year'] = filtros.year
-    if filtros.mes:
-        where_clauses.append("MONTH(c.fecha_publicacion) = :mes")
-        params['mes'] = filtros.mes
+    for column in ("departamento", "provincia", "distrito", "estado_proceso", "categoria"):
+        value = getattr(filtros, column)
+        if value:
+            where.add(f"UPPER(c.{column}) = UPPER(:{column})", **{column: value})
+    where.like("comprador", filtros.comprador, upper=True)
+    
+    # Year/month as half-open ranges on fecha_publicacion (index friendly)
+    known_years = filter_catalog.get(db)["anios"] if filtros.mes and not filtros.year else ()
+    where.period("fecha_publicacion", filtros.year, filtros.mes, known_years=known_years)
         
     # Additional specific filters
     if filtros.aseguradora and tipo != 'entidad': # If filtering by insurer
-        where_clauses.append("UPPER(a.entidad_financiera) LIKE UPPER(:aseguradora)")
-        params['aseguradora'] = f"%{filtros.aseguradora}%"
+        where.like("a.entidad_financiera", filtros.aseguradora, param="aseguradora", upper=True)
 
-    where_str = " AND ".join(where_clauses)
+    params = where.params
+    where_str = where.sql(prefix="", empty="1=1")
     
     sql = ""
     
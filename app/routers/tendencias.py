@@ -6,7 +6,10 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func, extract, and_, or_, case, desc
 from app.database import get_db
+from app.services.response_cache import response_cache
+from app.services.filter_catalog import filter_catalog
 from app.models.seace import LicitacionesCabecera, LicitacionesAdjudicaciones, DetalleConsorcios
+from app.utils.sql_filters import period_bounds
 from decimal import Decimal
 from typing import Optional, List, Dict, Any
 from datetime import datetime, date
@@ -19,6 +22,7 @@ router = APIRouter(prefix="/api/tendencias", tags=["Tendencias"])
 # ============================================
 
 @router.get("/kpis")
+@response_cache.cached("tendencias/kpis")
 def get_tendencias_kpis(
     objeto_contratacion: Optional[str] = Query(None, description="Filter by categoria (Obra/Bien/Servicio)"),
     tipo_procedimiento: Optional[str] = Query(None, description="Filter by tipo_procedimiento"),
@@ -76,6 +80,7 @@ def get_tendencias_kpis(
 # ============================================
 
 @router.get("/geographic-heatmap")
+@response_cache.cached("tendencias/geographic-heatmap")
 def get_geographic_heatmap(
     objeto_contratacion: Optional[str] = Query(None, description="Filter by categoria"),
     departamento: Optional[str] = Query(None, description="Drill-down to specific department"),
@@ -151,6 +156,7 @@ def get_geographic_heatmap(
 # ============================================
 
 @router.get("/bank-ranking")
+@response_cache.cached("tendencias/bank-ranking")
 def get_bank_ranking(
     tipo_procedimiento: Optional[str] = Query(None, description="Filter by tipo_procedimiento"),
     limit: int = Query(10, description="Number of top banks to return"),
@@ -203,6 +209,7 @@ def get_bank_ranking(
 # ============================================
 
 @router.get("/temporal-trend")
+@response_cache.cached("tendencias/temporal-trend")
 def get_temporal_trend(
     estado_proceso: Optional[str] = Query(None, description="Filter by estado_proceso"),
     year: Optional[int] = Query(None, description="Filter by year"),
@@ -214,6 +221,8 @@ def get_temporal_trend(
     """
     
     current_year = year or datetime.now().year
+    # Half-open range on the raw column (sargable), as WhereBuilder.period compiles it
+    desde, hasta = period_bounds(current_year)
     
     query = db.query(
         extract('year', LicitacionesAdjudicaciones.fecha_adjudicacion).label('year'),
@@ -224,8 +233,8 @@ def get_temporal_trend(
         LicitacionesCabecera,
         LicitacionesAdjudicaciones.id_convocatoria == LicitacionesCabecera.id_convocatoria
     ).filter(
-        LicitacionesAdjudicaciones.fecha_adjudicacion.isnot(None),
-        extract('year', LicitacionesAdjudicaciones.fecha_adjudicacion) == current_year
+        LicitacionesAdjudicaciones.fecha_adjudicacion >= desde,
+        LicitacionesAdjudicaciones.fecha_adjudicacion < hasta
     )
     
     # Apply estado_proceso filter
@@ -265,6 +274,7 @@ def get_temporal_trend(
 # ============================================
 
 @router.get("/top-providers")
+@response_cache.cached("tendencias/top-providers")
 def get_top_providers(
     banco_garantia: Optional[str] = Query(None, description="Filter by entidad_financiera"),
     limit: int = Query(20, description="Number of top providers to return"),
@@ -329,6 +339,7 @@ def get_top_providers(
 # ============================================
 
 @router.get("/savings-gauge")
+@response_cache.cached("tendencias/savings-gauge")
 def get_savings_gauge(
     departamento: Optional[str] = Query(None, description="Filter by departamento"),
     db: Session = Depends(get_db)
@@ -375,6 +386,7 @@ def get_savings_gauge(
 # ============================================
 
 @router.get("/consortium-breakdown")
+@response_cache.cached("tendencias/consortium-breakdown")
 def get_consortium_breakdown(
     search: Optional[str] = Query(None, description="Search by RUC, Name, Code, Member, etc."),
     limit: int = Query(1000, description="Limit number of results"),
@@ -481,43 +493,13 @@ def get_consortium_breakdown(
 def get_filter_options(db: Session = Depends(get_db)):
     """
     Get all available filter options for dropdowns.
-    Returns distinct values for each filter dimension.
+    Returns distinct values for each filter dimension (from the filter catalog).
     """
-    
-    # Objeto Contratacion (categoria)
-    objetos = db.query(LicitacionesCabecera.categoria).distinct().filter(
-        LicitacionesCabecera.categoria.isnot(None),
-        LicitacionesCabecera.categoria != ""
-    ).all()
-    
-    # Tipo Procedimiento
-    tipos = db.query(LicitacionesCabecera.tipo_procedimiento).distinct().filter(
-        LicitacionesCabecera.tipo_procedimiento.isnot(None),
-        LicitacionesCabecera.tipo_procedimiento != ""
-    ).all()
-    
-    # Estado Proceso
-    estados = db.query(LicitacionesCabecera.estado_proceso).distinct().filter(
-        LicitacionesCabecera.estado_proceso.isnot(None),
-        LicitacionesCabecera.estado_proceso != ""
-    ).all()
-    
-    # Departamentos
-    departamentos = db.query(LicitacionesCabecera.departamento).distinct().filter(
-        LicitacionesCabecera.departamento.isnot(None),
-        LicitacionesCabecera.departamento != ""
-    ).order_by(LicitacionesCabecera.departamento).all()
-    
-    # Bancos (entidad_financiera)
-    bancos = db.query(LicitacionesAdjudicaciones.entidad_financiera).distinct().filter(
-        LicitacionesAdjudicaciones.entidad_financiera.isnot(None),
-        LicitacionesAdjudicaciones.entidad_financiera != ""
-    ).order_by(LicitacionesAdjudicaciones.entidad_financiera).all()
-    
+    raw = filter_catalog.get(db)["raw"]
     return {
-        "objetos_contratacion": sorted([o[0] for o in objetos]),
-        "tipos_procedimiento": sorted([t[0] for t in tipos]),
-        "estados_proceso": sorted([e[0] for e in estados]),
-        "departamentos": [d[0] for d in departamentos],
-        "bancos_garantia": [b[0] for b in bancos]
+        "objetos_contratacion": raw["categoria"],
+        "tipos_procedimiento": raw["tipo_procedimiento"],
+        "estados_proceso": raw["estado_proceso"],
+        "departamentos": raw["departamento"],
+        "bancos_garantia": raw["entidad_financiera"]
     }
@@ -0,0 +1,79 @@
+"""
+Data Version - Contador de generación de los datos SEACE.
+
+El cargador ETL, el spider de garantías, los ETL de consorcios (1_motor_etl/generaciones.py)
+y los endpoints de escritura incrementan la generación;
+los índices y cachés en memoria la comparan para saber cuándo reconstruirse.
+La tabla es compartida, así que funciona entre procesos y workers de uvicorn.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, Tuple
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Ámbito por defecto: licitaciones_cabecera + licitaciones_adjudicaciones
+SCOPE_LICITACIONES = "licitaciones"
+
+# Segundos entre lecturas de la tabla (por proceso)
+CHECK_INTERVAL = 5.0
+
+
+class DataVersion:
+    """Lectura (con caché corta) e incremento de la generación por ámbito"""
+
+    def __init__(self):
+        self._cache: Dict[str, Tuple[int, float]] = {}
+
+    @staticmethod
+    def ensure_table(db: Session) -> None:
+        """Crear la tabla de control si no existe (DDL: hace commit implícito)"""
+        db.execute(text("""
+            CREATE TABLE IF NOT EXISTS control_generaciones (
+                ambito VARCHAR(50) PRIMARY KEY,
+                generacion BIGINT NOT NULL DEFAULT 0,
+                actualizado DATETIME
+            )
+        """))
+        db.commit()
+
+    def get(self, db: Session, scope: str = SCOPE_LICITACIONES) -> int:
+        """Generación actual del ámbito (0 si la tabla aún no existe)"""
+        now = time.time()
+        cached = self._cache.get(scope)
+        if cached and now - cached[1] < CHECK_INTERVAL:
+            return cached[0]
+
+        try:
+            value = db.execute(
+                text("SELECT generacion FROM control_generaciones WHERE ambito = :scope"),
+                {"scope": scope}
+            ).scalar() or 0
+        except Exception as e:
+            logger.warning(f"No se pudo leer control_generaciones: {e}")
+            value = cached[0] if cached else 0
+
+        self._cache[scope] = (value, now)
+        return value
+
+    def bump(self, db: Session, scope: str = SCOPE_LICITACIONES) -> None:
+        """
+        Incrementar la generación dentro de la transacción del llamador
+        (se confirma con el mismo db.commit() que los cambios de datos).
+        Un fallo aquí no debe abortar la escritura, solo se registra.
+        """
+        try:
+            db.execute(text("""
+                INSERT INTO control_generaciones (ambito, generacion, actualizado)
+                VALUES (:scope, 1, NOW())
+                ON DUPLICATE KEY UPDATE generacion = generacion + 1, actualizado = NOW()
+            """), {"scope": scope})
+        except Exception as e:
+            logger.error(f"No se pudo incrementar la generación '{scope}': {e}")
+        self._cache.pop(scope, None)
+
+
+# Singleton
+data_version = DataVersion()
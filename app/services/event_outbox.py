@@ -0,0 +1,99 @@
+"""
+Event Outbox - Eventos de cambio de licitaciones publicados por el ETL y la API.
+
+El cargador (1_motor_etl/carga_masiva.py) y los endpoints de escritura insertan en
+`eventos_outbox` dentro de la misma transacción que el cambio de datos; los
+consumidores leen por id creciente y guardan su posición en `eventos_outbox_cursor`.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import List, Optional
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tipos de evento (mismos nombres que usa el ETL)
+EVENT_NUEVA_CONVOCATORIA = "nueva_convocatoria"
+EVENT_NUEVA_ADJUDICACION = "nueva_adjudicacion"
+EVENT_CAMBIO_ESTADO = "cambio_estado"
+
+
+class EventOutbox:
+    """Publicación de eventos y lectura incremental por consumidor"""
+
+    @staticmethod
+    def ensure_table(db: Session) -> None:
+        """Crear outbox y tabla de cursores si no existen (DDL: hace commit implícito)"""
+        db.execute(text("""
+            CREATE TABLE IF NOT EXISTS eventos_outbox (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                tipo VARCHAR(40) NOT NULL,
+                entidad_id VARCHAR(100) NOT NULL,
+                origen VARCHAR(20) NOT NULL,
+                payload TEXT NULL,
+                creado DATETIME NOT NULL,
+                INDEX idx_outbox_tipo (tipo, id)
+            )
+        """))
+        db.execute(text("""
+            CREATE TABLE IF NOT EXISTS eventos_outbox_cursor (
+                consumidor VARCHAR(50) PRIMARY KEY,
+                ultimo_id BIGINT NOT NULL DEFAULT 0,
+                actualizado DATETIME
+            )
+        """))
+        db.commit()
+
+    @staticmethod
+    def publish(db: Session, tipo: str, entidad_id: str, payload: Optional[dict] = None, origen: str = "api") -> None:
+        """
+        Encolar un evento dentro de la transacción del llamador (se confirma con su
+        db.commit()). Un fallo aquí no debe abortar la escritura, solo se registra.
+        """
+        try:
+            db.execute(text("""
+                INSERT INTO eventos_outbox (tipo, entidad_id, origen, payload, creado)
+                VALUES (:tipo, :entidad_id, :origen, :payload, NOW())
+            """), {
+                "tipo": tipo,
+                "entidad_id": str(entidad_id),
+                "origen": origen,
+                "payload": json.dumps(payload, ensure_ascii=False, default=str) if payload else None
+            })
+        except Exception as e:
+            logger.error(f"No se pudo publicar el evento {tipo} {entidad_id}: {e}")
+
+    @staticmethod
+    def lock_cursor(db: Session, consumer: str) -> int:
+        """Último id procesado por el consumidor, bloqueando su fila hasta el commit"""
+        db.execute(text("""
+            INSERT IGNORE INTO eventos_outbox_cursor (consumidor, ultimo_id, actualizado)
+            VALUES (:consumer, 0, NOW())
+        """), {"consumer": consumer})
+        return db.execute(
+            text("SELECT ultimo_id FROM eventos_outbox_cursor WHERE consumidor = :consumer FOR UPDATE"),
+            {"consumer": consumer}
+        ).scalar() or 0
+
+    @staticmethod
+    def advance_cursor(db: Session, consumer: str, last_id: int) -> None:
+        db.execute(text("""
+            UPDATE eventos_outbox_cursor SET ultimo_id = :last_id, actualizado = NOW()
+            WHERE consumidor = :consumer
+        """), {"consumer": consumer, "last_id": last_id})
+
+    @staticmethod
+    def read_after(db: Session, after_id: int, limit: int) -> List:
+        rows = db.execute(text("""
+            SELECT id, tipo, entidad_id, payload, creado
+            FROM eventos_outbox
+            WHERE id > :after_id
+            ORDER BY id
+            LIMIT :limit
+        """), {"after_id": after_id, "limit": limit})
+        return rows.fetchall()
+
+
+# Singleton
+event_outbox = EventOutbox()
@@ -0,0 +1,199 @@
+"""
+Filter Catalog - Catálogo materializado de opciones de filtro.
+
+Los valores distintos de cabecera y adjudicaciones se calculan una sola vez por
+generación de datos (ver data_version), se guardan en la tabla `catalogo_filtros`
+para que otros workers no repitan los escaneos, y se sirven desde memoria a
+/api/licitaciones/filters/all, /api/dashboard/filter-options y
+/api/tendencias/filter-options, además del árbol de ubicaciones de
+/api/licitaciones/locations.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Any, Dict, List, Optional
+from app.services.data_version import data_version
+from app.utils.normalization import normalize_insurer_name
+import hashlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CATALOG_KEY = "filtros"
+
+# Valores crudos (SELECT DISTINCT) de los que se derivan todas las vistas
+RAW_SOURCES = {
+    "departamento": "SELECT DISTINCT departamento FROM licitaciones_cabecera WHERE departamento IS NOT NULL AND departamento != ''",
+    "categoria": "SELECT DISTINCT categoria FROM licitaciones_cabecera WHERE categoria IS NOT NULL AND categoria != ''",
+    "estado_proceso": "SELECT DISTINCT estado_proceso FROM licitaciones_cabecera WHERE estado_proceso IS NOT NULL AND estado_proceso != ''",
+    "tipo_procedimiento": "SELECT DISTINCT tipo_procedimiento FROM licitaciones_cabecera WHERE tipo_procedimiento IS NOT NULL AND tipo_procedimiento != ''",
+    "comprador": "SELECT DISTINCT comprador FROM licitaciones_cabecera WHERE comprador IS NOT NULL AND comprador != ''",
+    "anio": "SELECT DISTINCT EXTRACT(YEAR FROM fecha_publicacion) FROM licitaciones_cabecera WHERE fecha_publicacion IS NOT NULL",
+    "entidad_financiera": "SELECT DISTINCT entidad_financiera FROM licitaciones_adjudicaciones WHERE entidad_financiera IS NOT NULL AND entidad_financiera != ''",
+    "tipo_garantia": "SELECT DISTINCT tipo_garantia FROM licitaciones_adjudicaciones WHERE tipo_garantia IS NOT NULL AND tipo_garantia != ''",
+}
+
+# Jerarquía departamento -> provincia -> distrito (pocos miles de combinaciones)
+LOCATION_SQL = """
+    SELECT DISTINCT departamento, provincia, distrito FROM licitaciones_cabecera
+    WHERE departamento IS NOT NULL AND departamento != ''
+"""
+
+# Años que siempre se ofrecen aunque aún no tengan datos
+STANDARD_ANIOS = {2026, 2025, 2024}
+
+
+def _upper_distinct(values: List[str]) -> List[str]:
+    """Equivalente a SELECT DISTINCT UPPER(TRIM(col)) ... ORDER BY 1"""
+    return sorted({v.strip().upper() for v in values if v and v.strip()})
+
+
+def _split_pipes(values: List[str]) -> List[str]:
+    """Separar consorcios como "AVLA | CESCE" en valores individuales"""
+    parts = set()
+    for value in _upper_distinct(values):
+        parts.update(p.strip() for p in value.split("|") if p.strip())
+    return sorted(parts)
+
+
+def build_location_tree(rows: List[List[Optional[str]]]) -> Dict[str, Dict[str, List[str]]]:
+    """Árbol normalizado {DEPARTAMENTO: {PROVINCIA: [DISTRITOS]}}"""
+    tree: Dict[str, Dict[str, set]] = {}
+    for departamento, provincia, distrito in rows:
+        dept = (departamento or "").strip().upper()
+        if not dept:
+            continue
+        provincias = tree.setdefault(dept, {})
+        prov = (provincia or "").strip().upper()
+        if not prov:
+            continue
+        distritos = provincias.setdefault(prov, set())
+        dist = (distrito or "").strip().upper()
+        if dist:
+            distritos.add(dist)
+    return {
+        dept: {prov: sorted(dists) for prov, dists in sorted(provs.items())}
+        for dept, provs in sorted(tree.items())
+    }
+
+
+def build_catalog(raw: Dict[str, List[Any]]) -> Dict[str, Any]:
+    """Derivar todas las vistas de filtros a partir de los valores crudos"""
+    anios = {int(a) for a in raw["anio"] if a}
+    ubicaciones = build_location_tree(raw["ubicaciones"])
+    return {
+        "raw": raw,
+        "departamentos": _upper_distinct(raw["departamento"]),
+        "categorias": _upper_distinct(raw["categoria"]),
+        "estados": _upper_distinct(raw["estado_proceso"]),
+        "tipos_procedimiento": _upper_distinct(raw["tipo_procedimiento"]),
+        "entidades": _upper_distinct(raw["comprador"]),
+        "anios": sorted(anios | STANDARD_ANIOS, reverse=True),
+        "aseguradoras": sorted({normalize_insurer_name(n) for n in _split_pipes(raw["entidad_financiera"])}),
+        "tipos_garantia": _split_pipes(raw["tipo_garantia"]),
+        # /api/dashboard normaliza el valor completo, sin separar consorcios
+        "aseguradoras_dashboard": sorted({normalize_insurer_name(n) for n in raw["entidad_financiera"]}),
+        "ubicaciones": ubicaciones,
+        # Cambia solo si cambia el árbol, no con cada generación
+        "ubicaciones_etag": '"%s"' % hashlib.sha1(
+            json.dumps(ubicaciones, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16],
+    }
+
+
+class FilterCatalog:
+    """Catálogo en memoria, recalculado solo cuando cambia la generación"""
+
+    def __init__(self):
+        self._catalog: Optional[Dict[str, Any]] = None
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def ensure_table(db: Session) -> None:
+        """Crear la tabla de persistencia si no existe (DDL: hace commit implícito)"""
+        db.execute(text("""
+            CREATE TABLE IF NOT EXISTS catalogo_filtros (
+                clave VARCHAR(50) PRIMARY KEY,
+                generacion BIGINT NOT NULL,
+                valores LONGTEXT NOT NULL,
+                actualizado DATETIME
+            )
+        """))
+        db.commit()
+
+    def get(self, db: Session) -> Dict[str, Any]:
+        """Catálogo vigente; lo recalcula (una sola vez) si la generación cambió"""
+        generation = data_version.get(db)
+        if self._catalog is not None and self._generation == generation:
+            return self._catalog
+
+        with self._lock:
+            if self._catalog is not None and self._generation == generation:
+                return self._catalog
+
+            raw = self._load_persisted(db, generation)
+            if raw is None:
+                start = time.time()
+                raw = self._compute_raw(db)
+                self._persist(db, generation, raw)
+                logger.info(f"Catálogo de filtros recalculado en {time.time() - start:.2f}s (gen {generation})")
+
+            self._catalog = build_catalog(raw)
+            self._generation = generation
+            return self._catalog
+
+    def invalidate(self) -> None:
+        """Forzar recálculo en la próxima lectura de este proceso"""
+        self._generation = None
+
+    @staticmethod
+    def _compute_raw(db: Session) -> Dict[str, List[Any]]:
+        raw = {}
+        for key, sql in RAW_SOURCES.items():
+            raw[key] = sorted(
+                (r[0] for r in db.execute(text(sql)).fetchall() if r[0] is not None),
+                key=str
+            )
+        raw["anio"] = [int(a) for a in raw["anio"]]
+        raw["ubicaciones"] = [list(r) for r in db.execute(text(LOCATION_SQL)).fetchall()]
+        return raw
+
+    @staticmethod
+    def _load_persisted(db: Session, generation: int) -> Optional[Dict[str, List[Any]]]:
+        """Reutilizar el cálculo de otro worker/proceso para la misma generación"""
+        try:
+            row = db.execute(
+                text("SELECT generacion, valores FROM catalogo_filtros WHERE clave = :clave"),
+                {"clave": CATALOG_KEY}
+            ).fetchone()
+        except Exception as e:
+            logger.warning(f"No se pudo leer catalogo_filtros: {e}")
+            return None
+        if not row or row[0] != generation:
+            return None
+        try:
+            raw = json.loads(row[1])
+        except ValueError:
+            return None
+        return raw if set(RAW_SOURCES) | {"ubicaciones"} <= set(raw) else None
+
+    @staticmethod
+    def _persist(db: Session, generation: int, raw: Dict[str, List[Any]]) -> None:
+        try:
+            db.execute(text("""
+                INSERT INTO catalogo_filtros (clave, generacion, valores, actualizado)
+                VALUES (:clave, :generacion, :valores, NOW())
+                ON DUPLICATE KEY UPDATE generacion = VALUES(generacion),
+                    valores = VALUES(valores), actualizado = NOW()
+            """), {"clave": CATALOG_KEY, "generacion": generation, "valores": json.dumps(raw, ensure_ascii=False)})
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"No se pudo guardar catalogo_filtros: {e}")
+
+
+# Singleton
+filter_catalog = FilterCatalog()
@@ -0,0 +1,157 @@
+"""
+Notification Dispatcher - Convierte los eventos de `eventos_outbox` en notificaciones.
+
+Reemplaza los escaneos periódicos de licitaciones / adjudicaciones / cambios de estado:
+el scheduler lo llama cada pocos segundos y solo lee los eventos posteriores a su cursor.
+Notificaciones, tracking y avance del cursor se confirman en la misma transacción.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text, bindparam
+from types import SimpleNamespace
+from typing import List, Tuple
+from app.services.event_outbox import (
+    event_outbox, EVENT_NUEVA_CONVOCATORIA, EVENT_NUEVA_ADJUDICACION, EVENT_CAMBIO_ESTADO
+)
+from app.services.notification_triggers import NotificationTriggers, IMPORTANT_STATES
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+CONSUMER = "notificaciones"
+BATCH_SIZE = 1000
+
+# Un id ausente puede ser una transacción aún sin confirmar: se espera antes de saltarlo
+# (si nunca aparece fue un rollback o un id reservado por un INSERT masivo). Los escritores
+# publican justo antes de su commit, así que basta una espera corta.
+GAP_WAIT_SECONDS = float(os.getenv("OUTBOX_GAP_WAIT_SECONDS", "10"))
+
+# Antigüedad máxima (en días completos) de la fecha de publicación / adjudicación para
+# notificar: las cargas de datos recientes avisan, una carga histórica no
+MAX_AGE_DAYS = int(os.getenv("OUTBOX_MAX_AGE_DAYS", "7"))
+
+# Fechas DATE comparadas con CURDATE(): una adjudicación de hoy entra a cualquier hora
+_LICITACIONES_SQL = text("""
+    SELECT l.id_convocatoria, l.descripcion, l.comprador, l.monto_estimado, l.departamento
+    FROM licitaciones_cabecera l
+    WHERE l.id_convocatoria IN :ids
+    AND l.fecha_publicacion >= DATE_SUB(CURDATE(), INTERVAL :dias DAY)
+""").bindparams(bindparam("ids", expanding=True))
+
+_ADJUDICACIONES_SQL = text("""
+    SELECT a.id_adjudicacion, a.id_convocatoria, a.ganador_nombre,
+           a.monto_adjudicado, a.fecha_adjudicacion, l.descripcion
+    FROM licitaciones_adjudicaciones a
+    JOIN licitaciones_cabecera l ON a.id_convocatoria = l.id_convocatoria
+    WHERE a.id_adjudicacion IN :ids
+    AND a.fecha_adjudicacion >= DATE_SUB(CURDATE(), INTERVAL :dias DAY)
+""").bindparams(bindparam("ids", expanding=True))
+
+_DESCRIPCIONES_SQL = text("""
+    SELECT l.id_convocatoria, l.descripcion
+    FROM licitaciones_cabecera l
+    WHERE l.id_convocatoria IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+
+def _nuevo_estado(row) -> str:
+    """Estado destino del evento (payload {anterior, nuevo} de ETL y API)"""
+    try:
+        return str((json.loads(row.payload) if row.payload else {}).get("nuevo") or "").strip().upper()
+    except (TypeError, ValueError, AttributeError):
+        return ""
+
+
+class NotificationDispatcher:
+    """Consumidor incremental del outbox (un cursor por consumidor, bloqueado durante el lote)"""
+
+    def __init__(self):
+        # Huecos ya vistos: (primer id, último id, instante en que se vio)
+        self._gaps: List[Tuple[int, int, float]] = []
+
+    def _first_seen(self, start: int, end: int, now: float) -> float:
+        """Un hueco que se solapa con uno ya visto conserva su instante (no reinicia la espera)"""
+        seen = [t for s, e, t in self._gaps if s <= end and start <= e]
+        return min(seen) if seen else now
+
+    def _contiguous(self, last_id: int, rows: List) -> List:
+        """
+        Eventos hasta el primer hueco que aún no cumplió GAP_WAIT_SECONDS. Todos los huecos
+        del lote se registran en la misma pasada, así que esperan en paralelo: una carga
+        con muchos huecos cuesta a lo sumo una espera, no una por hueco.
+        """
+        now = time.monotonic()
+        gaps, expected = [], last_id + 1
+        for row in rows:
+            if row.id != expected:
+                gaps.append((expected, row.id - 1, self._first_seen(expected, row.id - 1, now)))
+            expected = row.id + 1
+        self._gaps = gaps
+
+        ready, expected = [], last_id + 1
+        pending = {start: seen for start, _, seen in gaps}
+        for row in rows:
+            if row.id != expected and now - pending[expected] < GAP_WAIT_SECONDS:
+                break
+            ready.append(row)
+            expected = row.id + 1
+        return ready
+
+    @staticmethod
+    def _build_events(db: Session, rows: List) -> List[dict]:
+        ids = {EVENT_NUEVA_CONVOCATORIA: set(), EVENT_NUEVA_ADJUDICACION: set()}
+        cambios = []
+        for row in rows:
+            if row.tipo in ids:
+                ids[row.tipo].add(row.entidad_id)
+            elif row.tipo == EVENT_CAMBIO_ESTADO:
+                # Se filtra por el estado del evento, no por el actual de la licitación
+                estado = _nuevo_estado(row)
+                if estado in IMPORTANT_STATES:
+                    cambios.append((row.entidad_id, estado))
+
+        events = []
+        if ids[EVENT_NUEVA_CONVOCATORIA]:
+            result = db.execute(_LICITACIONES_SQL, {"ids": list(ids[EVENT_NUEVA_CONVOCATORIA]), "dias": MAX_AGE_DAYS})
+            events += [NotificationTriggers.licitacion_event(r) for r in result]
+        if ids[EVENT_NUEVA_ADJUDICACION]:
+            result = db.execute(_ADJUDICACIONES_SQL, {"ids": list(ids[EVENT_NUEVA_ADJUDICACION]), "dias": MAX_AGE_DAYS})
+            events += [NotificationTriggers.adjudicacion_event(r) for r in result]
+        if cambios:
+            result = db.execute(_DESCRIPCIONES_SQL, {"ids": list({id_conv for id_conv, _ in cambios})})
+            descripciones = {r.id_convocatoria: r.descripcion for r in result}
+            events += [
+                NotificationTriggers.cambio_estado_event(SimpleNamespace(
+                    id_convocatoria=id_conv, descripcion=descripciones[id_conv], estado=estado
+                ))
+                for id_conv, estado in dict.fromkeys(cambios)
+                if id_conv in descripciones
+            ]
+        return events
+
+    def dispatch(self, db: Session) -> int:
+        """Procesar el siguiente lote del outbox; devuelve notificaciones creadas"""
+        notifications_created = 0
+        try:
+            last_id = event_outbox.lock_cursor(db, CONSUMER)
+            rows = self._contiguous(last_id, event_outbox.read_after(db, last_id, BATCH_SIZE))
+            if rows:
+                events = self._build_events(db, rows)
+                notifications_created = NotificationTriggers.fan_out(db, events)
+                event_outbox.advance_cursor(db, CONSUMER, rows[-1].id)
+                logger.info(
+                    f"Outbox: {len(rows)} eventos (hasta id {rows[-1].id}) -> "
+                    f"{notifications_created} notificaciones"
+                )
+            db.commit()
+        except Exception as e:
+            logger.error(f"Error despachando outbox: {e}")
+            db.rollback()
+            notifications_created = 0
+        return notifications_created
+
+
+# Singleton
+notification_dispatcher = NotificationDispatcher()
@@ -6,13 +6,18 @@ from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from app.database import SessionLocal
 from app.services.notification_triggers import notification_triggers
+from app.services.notification_dispatcher import notification_dispatcher
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 # Crear scheduler global
 scheduler = BackgroundScheduler()
 
+# Segundos entre lecturas del outbox de eventos
+OUTBOX_INTERVAL_SECONDS = int(os.getenv("OUTBOX_INTERVAL_SECONDS", "10"))
+
 
 def run_carta_fianza_check():
     """Job para verificar cartas fianza"""
@@ -26,38 +31,15 @@ def run_carta_fianza_check():
         db.close()
 
 
-def run_licitaciones_check():
-    """Job para verificar nuevas licitaciones"""
-    db = SessionLocal()
-    try:
-        count = notification_triggers.check_new_licitaciones(db)
-        logger.info(f"[Scheduler] Licitaciones check: {count} notificaciones")
-    except Exception as e:
-        logger.error(f"[Scheduler] Error en licitaciones_check: {e}")
-    finally:
-        db.close()
-
-
-def run_adjudicaciones_check():
-    """Job para verificar adjudicaciones"""
-    db = SessionLocal()
-    try:
-        count = notification_triggers.check_new_adjudicaciones(db)
-        logger.info(f"[Scheduler] Adjudicaciones check: {count} notificaciones")
-    except Exception as e:
-        logger.error(f"[Scheduler] Error en adjudicaciones_check: {e}")
-    finally:
-        db.close()
-
-
-def run_changes_check():
-    """Job para verificar cambios importantes"""
+def run_outbox_dispatch():
+    """Job para convertir eventos del outbox (ETL y API) en notificaciones"""
     db = SessionLocal()
     try:
-        count = notification_triggers.check_important_changes(db)
-        logger.info(f"[Scheduler] Changes check: {count} notificaciones")
+        count = notification_dispatcher.dispatch(db)
+        if count:
+            logger.info(f"[Scheduler] Outbox dispatch: {count} notificaciones")
     except Exception as e:
-        logger.error(f"[Scheduler] Error en changes_check: {e}")
+        logger.error(f"[Scheduler] Error en outbox_dispatch: {e}")
     finally:
         db.close()
 
@@ -78,39 +60,22 @@ def start_scheduler():
         replace_existing=True
     )
     
-    # Job 2: Nuevas Licitaciones - Cada hora
-    scheduler.add_job(
-        run_licitaciones_check,
-        trigger=IntervalTrigger(hours=1),
-        id='licitaciones_hourly',
-        name='Check New Licitaciones',
-        replace_existing=True
-    )
-    
-    # Job 3: Adjudicaciones - Cada 30 minutos
-    scheduler.add_job(
-        run_adjudicaciones_check,
-        trigger=IntervalTrigger(minutes=30),
-        id='adjudicaciones_half_hourly',
-        name='Check New Adjudicaciones',
-        replace_existing=True
-    )
-    
-    # Job 4: Cambios importantes - Cada hora
+    # Job 2: Eventos de licitaciones / adjudicaciones / cambios de estado (outbox).
+    # Reemplaza los escaneos periódicos: los avisos llegan segundos después de la carga.
     scheduler.add_job(
-        run_changes_check,
-        trigger=IntervalTrigger(hours=1),
-        id='changes_hourly',
-        name='Check Important Changes',
-        replace_existing=True
+        run_outbox_dispatch,
+        trigger=IntervalTrigger(seconds=OUTBOX_INTERVAL_SECONDS),
+        id='outbox_dispatch',
+        name='Dispatch Outbox Events',
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
     )
     
     scheduler.start()
-    logger.info("✅ Notification Scheduler iniciado con 4 jobs")
+    logger.info("✅ Notification Scheduler iniciado con 2 jobs")
     logger.info("  - Cartas Fianza: Diariamente 8:00 AM")
-    logger.info("  - Licitaciones: Cada hora")
-    logger.info("  - Adjudicaciones: Cada 30 minutos")
-    logger.info("  - Cambios: Cada hora")
+    logger.info(f"  - Outbox de eventos: Cada {OUTBOX_INTERVAL_SECONDS} segundos")
 
 
 def stop_scheduler():
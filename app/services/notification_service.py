@@ -2,12 +2,25 @@
 Notification Service - Lógica de negocio para notificaciones
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, text, bindparam
 from typing import List, Optional
 from datetime import datetime, timezone, timedelta
 from app.models.notification import Notification, NotificationType, NotificationPriority
 
 
+# Una notificación por usuario activo, resuelta dentro de MySQL. Los Enum se enlazan con el
+# tipo de la columna para guardarlos igual que el ORM.
+_FAN_OUT_SQL = text("""
+    INSERT INTO notifications (user_id, type, priority, title, message, link, is_read, expires_at)
+    SELECT u.id, :type, :priority, :title, :message, :link, 0, :expires_at
+    FROM usuarios u
+    WHERE u.activo = 1
+""").bindparams(
+    bindparam("type", type_=Notification.__table__.c.type.type),
+    bindparam("priority", type_=Notification.__table__.c.priority.type),
+)
+
+
 class NotificationService:
     """Servicio para gestionar notificaciones"""
     
@@ -42,6 +55,31 @@ class NotificationService:
         db.refresh(notification)
         return notification
     
+    @staticmethod
+    def create_for_active_users(db: Session, notifications: List[dict]) -> int:
+        """
+        Crear cada notificación para todos los usuarios activos en un solo executemany
+        de INSERT ... SELECT. No hace commit: el llamador decide la transacción.
+        Cada dict lleva type, priority, title, message, link y expires_days.
+        """
+        if not notifications:
+            return 0
+
+        now = datetime.now(timezone.utc)
+        params = [
+            {
+                "type": n["type"],
+                "priority": n["priority"],
+                "title": n["title"],
+                "message": n["message"],
+                "link": n.get("link"),
+                "expires_at": now + timedelta(days=n["expires_days"]) if n.get("expires_days") else None,
+            }
+            for n in notifications
+        ]
+        result = db.execute(_FAN_OUT_SQL, params)
+        return result.rowcount
+    
     @staticmethod
     def get_user_notifications(
         db: Session,
@@ -0,0 +1,207 @@
+"""
+Notification Store - Almacén SQLite (WAL) de las notificaciones de /api/notifications.
+
+Reemplaza a `data/notifications.json`, que se leía y reescribía completo en cada
+operación sin bloqueo entre workers:
+- Alta O(1): id AUTOINCREMENT, sin recorrer las existentes para calcular max(id)
+- Índices por usuario, estado de lectura y fecha
+- Seguro entre hilos (una conexión por hilo) y entre workers de uvicorn
+  (WAL + escrituras con BEGIN IMMEDIATE + espera por bloqueo)
+- La primera vez que se abre importa el JSON anterior (ver scripts/migrate_notifications_json.py)
+"""
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = os.getenv("NOTIFICATIONS_DB", "data/notifications.sqlite")
+LEGACY_JSON_FILE = "data/notifications.json"
+
+# Mismo tope que tenía el archivo JSON: se conservan las N más recientes
+MAX_NOTIFICATIONS = int(os.getenv("NOTIFICATIONS_MAX", "500"))
+
+_COLUMNS = "id, user_id, type, priority, title, message, link, metadata, is_read, created_at, expires_at"
+
+
+class NotificationStore:
+    """Notificaciones por usuario con lecturas indexadas y escrituras serializadas por SQLite"""
+
+    def __init__(self, path: str = DB_FILE, legacy_json: Optional[str] = LEGACY_JSON_FILE):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._ensure_schema()
+        if legacy_json:
+            self.import_json(legacy_json, only_once=True)
+
+    # --- Conexión ---
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: las transacciones se abren explícitamente
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """Transacción de escritura: BEGIN IMMEDIATE toma el bloqueo al inicio (sin deadlocks de upgrade)"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _ensure_schema(self) -> None:
+        with self._write() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS notifications (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL DEFAULT 1,
+                    type TEXT NOT NULL DEFAULT 'system',
+                    priority TEXT NOT NULL DEFAULT 'low',
+                    title TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    link TEXT,
+                    metadata TEXT,
+                    is_read INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    expires_at TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_notif_user_created ON notifications (user_id, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_notif_user_read ON notifications (user_id, is_read, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_notif_read ON notifications (is_read, id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        data = dict(row)
+        data["is_read"] = bool(data["is_read"])
+        data["metadata"] = json.loads(data["metadata"]) if data["metadata"] else {}
+        return data
+
+    @staticmethod
+    def _filters(user_id: Optional[int], unread_only: bool) -> Tuple[str, list]:
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if unread_only:
+            clauses.append("is_read = 0")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    # --- Escrituras ---
+
+    def create(self, title: str, message: str, type: str = "system", priority: str = "low",
+               link: Optional[str] = None, metadata: Optional[dict] = None, user_id: int = 1) -> dict:
+        created_at = datetime.datetime.now().replace(microsecond=0).isoformat()
+        with self._write() as conn:
+            new_id = conn.execute("""
+                INSERT INTO notifications (user_id, type, priority, title, message, link, metadata, is_read, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
+            """, (user_id, type, priority, title, message, link,
+                  json.dumps(metadata or {}, ensure_ascii=False, default=str), created_at)).lastrowid
+            # Retención por id (índice primario): solo borra las que quedaron fuera del tope
+            conn.execute("DELETE FROM notifications WHERE id <= ?", (new_id - MAX_NOTIFICATIONS,))
+        return {
+            "id": new_id,
+            "user_id": user_id,
+            "type": type,
+            "priority": priority,
+            "title": title,
+            "message": message,
+            "link": link,
+            "metadata": metadata or {},
+            "is_read": False,
+            "created_at": created_at,
+            "expires_at": None
+        }
+
+    def mark_read(self, notification_id: int) -> bool:
+        with self._write() as conn:
+            found = conn.execute("SELECT 1 FROM notifications WHERE id = ?", (notification_id,)).fetchone()
+            conn.execute("UPDATE notifications SET is_read = 1 WHERE id = ? AND is_read = 0", (notification_id,))
+        return found is not None
+
+    def mark_all_read(self, user_id: Optional[int] = None) -> int:
+        where, params = self._filters(user_id, unread_only=True)
+        with self._write() as conn:
+            return conn.execute(f"UPDATE notifications SET is_read = 1{where}", params).rowcount
+
+    def delete(self, notification_id: int) -> bool:
+        with self._write() as conn:
+            return conn.execute("DELETE FROM notifications WHERE id = ?", (notification_id,)).rowcount > 0
+
+    # --- Lecturas ---
+
+    def list(self, user_id: Optional[int] = None, unread_only: bool = False,
+             limit: int = 50, offset: int = 0) -> Tuple[List[dict], int, int]:
+        """(página más reciente primero, total filtrado, no leídas)"""
+        where, params = self._filters(user_id, unread_only)
+        conn = self._conn()
+        rows = conn.execute(
+            f"SELECT {_COLUMNS} FROM notifications{where} ORDER BY id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        total = conn.execute(f"SELECT COUNT(*) FROM notifications{where}", params).fetchone()[0]
+        unread = total if unread_only else self.unread_count(user_id)
+        return [self._to_dict(r) for r in rows], total, unread
+
+    def unread_count(self, user_id: Optional[int] = None) -> int:
+        where, params = self._filters(user_id, unread_only=True)
+        return self._conn().execute(f"SELECT COUNT(*) FROM notifications{where}", params).fetchone()[0]
+
+    # --- Migración ---
+
+    def import_json(self, json_path: str, only_once: bool = False) -> int:
+        """
+        Importar un notifications.json anterior conservando ids y estado de lectura.
+        Con only_once se registra en store_meta y no se repite (aunque luego se borren todas).
+        """
+        if not os.path.exists(json_path):
+            return 0
+        with self._write() as conn:
+            if only_once and conn.execute("SELECT 1 FROM store_meta WHERE key = 'json_imported'").fetchone():
+                return 0
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    legacy = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"No se pudo leer {json_path}: {e}")
+                legacy = []
+
+            rows = [
+                (n.get("id"), n.get("user_id", 1), n.get("type", "system"), n.get("priority", "low"),
+                 n.get("title", ""), n.get("message", ""), n.get("link"),
+                 json.dumps(n.get("metadata") or {}, ensure_ascii=False, default=str),
+                 1 if n.get("is_read") else 0,
+                 n.get("created_at") or datetime.datetime.now().replace(microsecond=0).isoformat(),
+                 n.get("expires_at"))
+                for n in legacy if isinstance(n, dict)
+            ]
+            imported = conn.executemany(f"INSERT OR IGNORE INTO notifications ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows).rowcount
+            conn.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('json_imported', ?)",
+                (datetime.datetime.now().replace(microsecond=0).isoformat(),)
+            )
+        if imported:
+            logger.info(f"Notificaciones importadas desde {json_path}: {imported}")
+        return imported
+
+
+# Singleton
+notification_store = NotificationStore()
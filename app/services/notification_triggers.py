@@ -1,8 +1,12 @@
 """
 Notification Triggers - Detecta eventos de negocio y genera notificaciones automáticas
+
+Cada check detecta sus eventos una sola vez (sin cruzar con usuarios) y luego hace el
+fan-out en bloque: un INSERT ... SELECT por evento hacia todos los usuarios activos y una
+fila de tracking por evento, todo en la misma transacción.
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import text, and_, or_
+from sqlalchemy import text, bindparam
 from datetime import datetime, timedelta, timezone
 from typing import List
 from app.models.notification import NotificationType, NotificationPriority
@@ -11,270 +15,249 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Estados que notifican: mismo vocabulario que cargador.determinar_estado y los filtros de la UI
+IMPORTANT_STATES = ('CANCELADO', 'DESIERTO', 'NULO', 'SUSPENDIDO')
+
+_TRACKING_SQL = text("""
+    INSERT INTO notification_tracking
+    (entity_type, entity_id, notification_type, last_notified)
+    VALUES (:entity_type, :entity_id, :notification_type, NOW())
+""")
+
 
 class NotificationTriggers:
     """Servicio para detectar eventos y generar notificaciones automáticas"""
-    
+
+    # --- Armado de la notificación por entidad (compartido con notification_dispatcher) ---
+
     @staticmethod
-    def check_carta_fianza_expiration(db: Session) -> int:
+    def licitacion_event(row) -> dict:
+        """row: id_convocatoria, descripcion, comprador, monto_estimado, departamento"""
+        monto_texto = f"S/ {row.monto_estimado:,.2f}" if row.monto_estimado else "No especificado"
+        return {
+            'entity_type': 'licitacion',
+            'entity_id': row.id_convocatoria,
+            'notification_type': 'new_publication',
+            'type': NotificationType.LICITACION,
+            'priority': NotificationPriority.MEDIUM,
+            'title': f"📋 Nueva Licitación: {row.comprador}",
+            'message': f"{(row.descripcion or '')[:150]}... Monto estimado: {monto_texto}. Departamento: {row.departamento or 'Nacional'}",
+            'link': f"/seace/database?id={row.id_convocatoria}",
+            'expires_days': 30
+        }
+
+    @staticmethod
+    def adjudicacion_event(row) -> dict:
+        """row: id_adjudicacion, id_convocatoria, ganador_nombre, monto_adjudicado, fecha_adjudicacion, descripcion"""
+        monto_texto = f"S/ {row.monto_adjudicado:,.2f}" if row.monto_adjudicado else "Monto no especificado"
+        return {
+            'entity_type': 'adjudicacion',
+            'entity_id': row.id_adjudicacion,
+            'notification_type': 'new_award',
+            'type': NotificationType.ADJUDICACION,
+            'priority': NotificationPriority.MEDIUM,
+            'title': f"🏆 Nueva Adjudicación: {row.ganador_nombre}",
+            'message': f"Licitación '{(row.descripcion or '')[:100]}...' adjudicada. Monto: {monto_texto}. Fecha: {row.fecha_adjudicacion.strftime('%d/%m/%Y')}",
+            'link': f"/seace/database?id={row.id_convocatoria}",
+            'expires_days': 30
+        }
+
+    @staticmethod
+    def cambio_estado_event(row) -> dict:
+        """row: id_convocatoria, descripcion, estado"""
+        estado_emoji = {
+            'CANCELADO': '❌',
+            'DESIERTO': '📭',
+            'NULO': '🚫',
+            'SUSPENDIDO': '⏸️'
+        }.get(row.estado, '⚠️')
+
+        return {
+            'entity_type': 'licitacion_change',
+            'entity_id': row.id_convocatoria,
+            'notification_type': f'status_{row.estado}',
+            'type': NotificationType.LICITACION,
+            'priority': NotificationPriority.HIGH,
+            'title': f"{estado_emoji} Cambio Importante: Licitación {row.estado}",
+            'message': f"La licitación '{(row.descripcion or '')[:120]}...' ha cambiado a estado {row.estado}.",
+            'link': f"/seace/database?id={row.id_convocatoria}",
+            'expires_days': 15
+        }
+
+    # --- Detección (una fila por entidad) ---
+
+    @staticmethod
+    def detect_carta_fianza_expiration(db: Session) -> List[dict]:
         """
-        Verificar cartas fianza próximas a vencer y crear notificaciones
+        Cartas fianza próximas a vencer
         - 30 días: Notificación LOW
         - 15 días: Notificación MEDIUM
         - 7 días: Notificación HIGH
         """
-        notifications_created = 0
         now = datetime.now(timezone.utc)
-        
+        events = []
+
         # Definir períodos de alerta
         alert_periods = [
             (30, NotificationPriority.LOW, "en 30 días"),
             (15, NotificationPriority.MEDIUM, "en 15 días"),
             (7, NotificationPriority.HIGH, "en 7 días")
         ]
-        
-        try:
-            for days, priority, message_suffix in alert_periods:
-                target_date = now + timedelta(days=days)
-                date_str = target_date.strftime('%Y-%m-%d')
-                
-                # Buscar cartas fianza que vencen en X días
-                # NOTA: Ajusta la query según tu esquema real de tabla de cartas fianza
-                query = text("""
-                    SELECT DISTINCT cf.id, cf.numero, cf.monto, cf.fecha_vencimiento, u.id as user_id
-                    FROM cartas_fianza cf
-                    CROSS JOIN usuarios u
-                    WHERE DATE(cf.fecha_vencimiento) = :target_date
-                    AND cf.estado = 'VIGENTE'
-                    AND u.activo = 1
-                    AND NOT EXISTS (
-                        SELECT 1 FROM notification_tracking nt
-                        WHERE nt.entity_type = 'carta_fianza'
-                        AND nt.entity_id = cf.id
-                        AND nt.notification_type = :notif_type
-                        AND DATE(nt.last_notified) = CURDATE()
-                    )
-                    LIMIT 100
-                """)
-                
-                result = db.execute(query, {
-                    'target_date': date_str,
-                    'notif_type': f'expiration_{days}d'
-                })
-                
-                for row in result:
-                    # Crear notificación
-                    notification_service.create_notification(
-                        db=db,
-                        user_id=row.user_id,
-                        type=NotificationType.CARTA_FIANZA,
-                        priority=priority,
-                        title=f"⚠️ Carta Fianza #{row.numero} vence {message_suffix}",
-                        message=f"La carta fianza #{row.numero} por un monto de S/ {row.monto:,.2f} vencerá el {row.fecha_vencimiento.strftime('%d/%m/%Y')}. Se requiere acción para renovar o liberar.",
-                        link=f"/mqs/cartas-fianza?id={row.id}",
-                        expires_days=days
-                    )
-                    
-                    # Registrar tracking
-                    db.execute(text("""
-                        INSERT INTO notification_tracking 
-                        (entity_type, entity_id, notification_type, last_notified)
-                        VALUES ('carta_fianza', :entity_id, :notif_type, NOW())
-                    """), {
-                        'entity_id': str(row.id),
-                        'notif_type': f'expiration_{days}d'
-                    })
-                    
-                    notifications_created += 1
-            
-            db.commit()
-            logger.info(f"Cartas Fianza: {notifications_created} notificaciones creadas")
-            
-        except Exception as e:
-            logger.error(f"Error checking carta fianza expiration: {e}")
-            db.rollback()
-        
-        return notifications_created
-    
-    @staticmethod
-    def check_new_licitaciones(db: Session) -> int:
-        """Detectar nuevas licitaciones publicadas en las últimas 24 horas"""
-        notifications_created = 0
-        
-        try:
-            # Buscar licitaciones nuevas (últimas 24 horas)
+
+        for days, priority, message_suffix in alert_periods:
+            target_date = now + timedelta(days=days)
+
+            # Buscar cartas fianza que vencen en X días
+            # NOTA: Ajusta la query según tu esquema real de tabla de cartas fianza
             query = text("""
-                SELECT DISTINCT l.id_convocatoria, l.descripcion, l.comprador, 
-                       l.monto_estimado, l.departamento, u.id as user_id
-                FROM licitaciones_cabecera l
-                CROSS JOIN usuarios u
-                WHERE l.fecha_publicacion >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
-                AND u.activo = 1
+                SELECT cf.id, cf.numero, cf.monto, cf.fecha_vencimiento
+                FROM cartas_fianza cf
+                WHERE DATE(cf.fecha_vencimiento) = :target_date
+                AND cf.estado = 'VIGENTE'
                 AND NOT EXISTS (
                     SELECT 1 FROM notification_tracking nt
-                    WHERE nt.entity_type = 'licitacion'
-                    AND nt.entity_id = l.id_convocatoria
-                    AND nt.notification_type = 'new_publication'
-                    AND nt.last_notified >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
+                    WHERE nt.entity_type = 'carta_fianza'
+                    AND nt.entity_id = cf.id
+                    AND nt.notification_type = :notif_type
+                    AND DATE(nt.last_notified) = CURDATE()
                 )
-                LIMIT 50
+                LIMIT 100
             """)
-            
-            result = db.execute(query)
-            
-            for row in result:
-                monto_texto = f"S/ {row.monto_estimado:,.2f}" if row.monto_estimado else "No especificado"
-                
-                notification_service.create_notification(
-                    db=db,
-                    user_id=row.user_id,
-                    type=NotificationType.LICITACION,
-                    priority=NotificationPriority.MEDIUM,
-                    title=f"📋 Nueva Licitación: {row.comprador}",
-                    message=f"{row.descripcion[:150]}... Monto estimado: {monto_texto}. Departamento: {row.departamento or 'Nacional'}",
-                    link=f"/seace/database?id={row.id_convocatoria}",
-                    expires_days=30
-                )
-                
-                # Tracking
-                db.execute(text("""
-                    INSERT INTO notification_tracking 
-                    (entity_type, entity_id, notification_type, last_notified)
-                    VALUES ('licitacion', :entity_id, 'new_publication', NOW())
-                """), {'entity_id': row.id_convocatoria})
-                
-                notifications_created += 1
-            
-            db.commit()
-            logger.info(f"Licitaciones: {notifications_created} notificaciones creadas")
-            
-        except Exception as e:
-            logger.error(f"Error checking new licitaciones: {e}")
-            db.rollback()
-        
-        return notifications_created
-    
+
+            rows = db.execute(query, {
+                'target_date': target_date.strftime('%Y-%m-%d'),
+                'notif_type': f'expiration_{days}d'
+            })
+
+            for row in rows:
+                events.append({
+                    'entity_type': 'carta_fianza',
+                    'entity_id': str(row.id),
+                    'notification_type': f'expiration_{days}d',
+                    'type': NotificationType.CARTA_FIANZA,
+                    'priority': priority,
+                    'title': f"⚠️ Carta Fianza #{row.numero} vence {message_suffix}",
+                    'message': f"La carta fianza #{row.numero} por un monto de S/ {row.monto:,.2f} vencerá el {row.fecha_vencimiento.strftime('%d/%m/%Y')}. Se requiere acción para renovar o liberar.",
+                    'link': f"/mqs/cartas-fianza?id={row.id}",
+                    'expires_days': days
+                })
+
+        return events
+
     @staticmethod
-    def check_new_adjudicaciones(db: Session) -> int:
-        """Detectar nuevas adjudicaciones en las últimas 12 horas"""
+    def detect_new_licitaciones(db: Session) -> List[dict]:
+        """Nuevas licitaciones publicadas en las últimas 24 horas"""
+        query = text("""
+            SELECT l.id_convocatoria, l.descripcion, l.comprador,
+                   l.monto_estimado, l.departamento
+            FROM licitaciones_cabecera l
+            WHERE l.fecha_publicacion >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
+            AND NOT EXISTS (
+                SELECT 1 FROM notification_tracking nt
+                WHERE nt.entity_type = 'licitacion'
+                AND nt.entity_id = l.id_convocatoria
+                AND nt.notification_type = 'new_publication'
+                AND nt.last_notified >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
+            )
+            LIMIT 50
+        """)
+
+        return [NotificationTriggers.licitacion_event(row) for row in db.execute(query)]
+
+    @staticmethod
+    def detect_new_adjudicaciones(db: Session) -> List[dict]:
+        """Nuevas adjudicaciones en las últimas 12 horas"""
+        query = text("""
+            SELECT a.id_adjudicacion, a.id_convocatoria, a.ganador_nombre,
+                   a.monto_adjudicado, a.fecha_adjudicacion, l.descripcion
+            FROM licitaciones_adjudicaciones a
+            JOIN licitaciones_cabecera l ON a.id_convocatoria = l.id_convocatoria
+            WHERE a.fecha_adjudicacion >= DATE_SUB(NOW(), INTERVAL 12 HOUR)
+            AND NOT EXISTS (
+                SELECT 1 FROM notification_tracking nt
+                WHERE nt.entity_type = 'adjudicacion'
+                AND nt.entity_id = a.id_adjudicacion
+                AND nt.notification_type = 'new_award'
+            )
+            LIMIT 50
+        """)
+
+        return [NotificationTriggers.adjudicacion_event(row) for row in db.execute(query)]
+
+    @staticmethod
+    def detect_important_changes(db: Session) -> List[dict]:
+        """Licitaciones que cambiaron a estado CANCELADO, DESIERTO, NULO o SUSPENDIDO"""
+        query = text("""
+            SELECT l.id_convocatoria, l.descripcion, l.estado_proceso AS estado
+            FROM licitaciones_cabecera l
+            WHERE l.estado_proceso IN :estados
+            AND l.fecha_actualizacion >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
+            AND NOT EXISTS (
+                SELECT 1 FROM notification_tracking nt
+                WHERE nt.entity_type = 'licitacion_change'
+                AND nt.entity_id = l.id_convocatoria
+                AND nt.notification_type = CONCAT('status_', l.estado_proceso)
+                AND nt.last_notified >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
+            )
+            LIMIT 30
+        """).bindparams(bindparam("estados", expanding=True))
+
+        rows = db.execute(query, {"estados": list(IMPORTANT_STATES)})
+        return [NotificationTriggers.cambio_estado_event(row) for row in rows]
+
+    # --- Fan-out en bloque ---
+
+    @staticmethod
+    def fan_out(db: Session, events: List[dict]) -> int:
+        """Notificaciones para todos los usuarios activos + tracking por evento, sin commit"""
+        if not events:
+            return 0
+        created = notification_service.create_for_active_users(db, events)
+        db.execute(_TRACKING_SQL, [
+            {
+                'entity_type': e['entity_type'],
+                'entity_id': e['entity_id'],
+                'notification_type': e['notification_type']
+            }
+            for e in events
+        ])
+        return created
+
+    @staticmethod
+    def _run_check(db: Session, detect, label: str) -> int:
+        """Detectar + fan-out + un único commit (rollback completo si algo falla)"""
         notifications_created = 0
-        
         try:
-            query = text("""
-                SELECT DISTINCT a.id_adjudicacion, a.id_convocatoria, a.ganador_nombre,
-                       a.monto_adjudicado, a.fecha_adjudicacion, l.descripcion,
-                       u.id as user_id
-                FROM licitaciones_adjudicaciones a
-                JOIN licitaciones_cabecera l ON a.id_convocatoria = l.id_convocatoria
-                CROSS JOIN usuarios u
-                WHERE a.fecha_adjudicacion >= DATE_SUB(NOW(), INTERVAL 12 HOUR)
-                AND u.activo = 1
-                AND NOT EXISTS (
-                    SELECT 1 FROM notification_tracking nt
-                    WHERE nt.entity_type = 'adjudicacion'
-                    AND nt.entity_id = a.id_adjudicacion
-                    AND nt.notification_type = 'new_award'
-                )
-                LIMIT 50
-            """)
-            
-            result = db.execute(query)
-            
-            for row in result:
-                monto_texto = f"S/ {row.monto_adjudicado:,.2f}" if row.monto_adjudicado else "Monto no especificado"
-                
-                notification_service.create_notification(
-                    db=db,
-                    user_id=row.user_id,
-                    type=NotificationType.ADJUDICACION,
-                    priority=NotificationPriority.MEDIUM,
-                    title=f"🏆 Nueva Adjudicación: {row.ganador_nombre}",
-                    message=f"Licitación '{row.descripcion[:100]}...' adjudicada. Monto: {monto_texto}. Fecha: {row.fecha_adjudicacion.strftime('%d/%m/%Y')}",
-                    link=f"/seace/database?id={row.id_convocatoria}",
-                    expires_days=30
-                )
-                
-                db.execute(text("""
-                    INSERT INTO notification_tracking 
-                    (entity_type, entity_id, notification_type, last_notified)
-                    VALUES ('adjudicacion', :entity_id, 'new_award', NOW())
-                """), {'entity_id': row.id_adjudicacion})
-                
-                notifications_created += 1
-            
+            events = detect(db)
+            notifications_created = NotificationTriggers.fan_out(db, events)
             db.commit()
-            logger.info(f"Adjudicaciones: {notifications_created} notificaciones creadas")
-            
+            logger.info(f"{label}: {notifications_created} notificaciones creadas ({len(events)} eventos)")
         except Exception as e:
-            logger.error(f"Error checking new adjudicaciones: {e}")
+            logger.error(f"Error checking {label}: {e}")
             db.rollback()
-        
+            notifications_created = 0
         return notifications_created
-    
+
+    @staticmethod
+    def check_carta_fianza_expiration(db: Session) -> int:
+        """Verificar cartas fianza próximas a vencer y crear notificaciones"""
+        return NotificationTriggers._run_check(db, NotificationTriggers.detect_carta_fianza_expiration, "Cartas Fianza")
+
+    @staticmethod
+    def check_new_licitaciones(db: Session) -> int:
+        """Detectar nuevas licitaciones publicadas en las últimas 24 horas"""
+        return NotificationTriggers._run_check(db, NotificationTriggers.detect_new_licitaciones, "Licitaciones")
+
+    @staticmethod
+    def check_new_adjudicaciones(db: Session) -> int:
+        """Detectar nuevas adjudicaciones en las últimas 12 horas"""
+        return NotificationTriggers._run_check(db, NotificationTriggers.detect_new_adjudicaciones, "Adjudicaciones")
+
     @staticmethod
     def check_important_changes(db: Session) -> int:
         """Detectar cambios importantes en licitaciones (cambios de estado, montos)"""
-        notifications_created = 0
-        
-        try:
-            # Ejemplo: Detectar licitaciones que cambiaron a estado "CANCELADA" o "DESIERTA"
-            query = text("""
-                SELECT DISTINCT l.id_convocatoria, l.descripcion, l.estado, u.id as user_id
-                FROM licitaciones_cabecera l
-                CROSS JOIN usuarios u
-                WHERE l.estado IN ('CANCELADA', 'DESIERTA', 'SUSPENDIDA')
-                AND l.fecha_actualizacion >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
-                AND u.activo = 1
-                AND NOT EXISTS (
-                    SELECT 1 FROM notification_tracking nt
-                    WHERE nt.entity_type = 'licitacion_change'
-                    AND nt.entity_id = l.id_convocatoria
-                    AND nt.notification_type = CONCAT('status_', l.estado)
-                    AND nt.last_notified >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
-                )
-                LIMIT 30
-            """)
-            
-            result = db.execute(query)
-            
-            for row in result:
-                estado_emoji = {
-                    'CANCELADA': '❌',
-                    'DESIERTA': '📭',
-                    'SUSPENDIDA': '⏸️'
-                }.get(row.estado, '⚠️')
-                
-                notification_service.create_notification(
-                    db=db,
-                    user_id=row.user_id,
-                    type=NotificationType.LICITACION,
-                    priority=NotificationPriority.HIGH,
-                    title=f"{estado_emoji} Cambio Importante: Licitación {row.estado}",
-                    message=f"La licitación '{row.descripcion[:120]}...' ha cambiado a estado {row.estado}.",
-                    link=f"/seace/database?id={row.id_convocatoria}",
-                    expires_days=15
-                )
-                
-                db.execute(text("""
-                    INSERT INTO notification_tracking 
-                    (entity_type, entity_id, notification_type, last_notified)
-                    VALUES ('licitacion_change', :entity_id, :notif_type, NOW())
-                """), {
-                    'entity_id': row.id_convocatoria,
-                    'notif_type': f'status_{row.estado}'
-                })
-                
-                notifications_created += 1
-            
-            db.commit()
-            logger.info(f"Cambios: {notifications_created} notificaciones creadas")
-            
-        except Exception as e:
-            logger.error(f"Error checking important changes: {e}")
-            db.rollback()
-        
-        return notifications_created
-    
+        return NotificationTriggers._run_check(db, NotificationTriggers.detect_important_changes, "Cambios")
+
     @staticmethod
     def run_all_checks(db: Session) -> dict:
         """Ejecutar todos los checks y retornar resumen"""
@@ -285,19 +268,19 @@ class NotificationTriggers:
             'changes': 0,
             'total': 0
         }
-        
+
         try:
             results['carta_fianza'] = NotificationTriggers.check_carta_fianza_expiration(db)
             results['licitaciones'] = NotificationTriggers.check_new_licitaciones(db)
             results['adjudicaciones'] = NotificationTriggers.check_new_adjudicaciones(db)
             results['changes'] = NotificationTriggers.check_important_changes(db)
-            results['total'] = sum([results['carta_fianza'], results['licitaciones'], 
+            results['total'] = sum([results['carta_fianza'], results['licitaciones'],
                                    results['adjudicaciones'], results['changes']])
-            
+
             logger.info(f"Triggers ejecutados: {results['total']} notificaciones totales")
         except Exception as e:
             logger.error(f"Error en run_all_checks: {e}")
-        
+
         return results
 
 
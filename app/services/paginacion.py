@@ -0,0 +1,133 @@
+"""
+Paginación - Cursor keyset y conteos cacheados para /api/licitaciones.
+
+El cursor es opaco para el cliente: base64url de la última fila entregada
+`(fecha_publicacion, id_convocatoria)`. La siguiente página se obtiene con
+un predicado de rango sobre el índice compuesto, sin OFFSET, así que el costo
+no crece con la profundidad del scroll.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Tuple
+from app.services.data_version import data_version
+import base64
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Orden estable del modo cursor (MySQL deja los NULL al final en DESC)
+KEYSET_ORDER_SQL = "lc.fecha_publicacion DESC, lc.id_convocatoria DESC"
+
+# Índice que respalda el orden y el predicado del cursor
+KEYSET_INDEX = "idx_cabecera_fecha_id"
+
+# Vigencia de un conteo cacheado aunque no cambie la generación
+COUNT_TTL_SECONDS = 600
+COUNT_CACHE_MAX = 500
+
+
+class InvalidCursor(ValueError):
+    """Token de cursor corrupto o de otra versión"""
+
+
+def encode_cursor(fecha: Optional[date], id_convocatoria: str) -> str:
+    """Token opaco a partir de la última fila de la página"""
+    payload = json.dumps(
+        {"f": fecha.isoformat() if fecha else None, "i": id_convocatoria},
+        separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[Optional[date], str]:
+    """Inverso de encode_cursor; lanza InvalidCursor si el token no es válido"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        raw_fecha = data["f"]
+        if not raw_fecha:
+            fecha = None
+        elif "T" in raw_fecha:
+            fecha = datetime.fromisoformat(raw_fecha)
+        else:
+            fecha = date.fromisoformat(raw_fecha)
+        id_convocatoria = data["i"]
+        if not isinstance(id_convocatoria, str) or not id_convocatoria:
+            raise ValueError("id vacío")
+        return fecha, id_convocatoria
+    except Exception as e:
+        raise InvalidCursor(f"Cursor inválido: {e}")
+
+
+def keyset_predicate(token: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Condición "después del cursor" para el orden KEYSET_ORDER_SQL.
+    Las filas sin fecha van al final, por lo que siguen a cualquier fecha.
+    """
+    fecha, id_convocatoria = decode_cursor(token)
+    if fecha is None:
+        return (
+            "(lc.fecha_publicacion IS NULL AND lc.id_convocatoria < :cursor_id)",
+            {"cursor_id": id_convocatoria}
+        )
+    return (
+        """(
+            lc.fecha_publicacion < :cursor_fecha
+            OR (lc.fecha_publicacion = :cursor_fecha AND lc.id_convocatoria < :cursor_id)
+            OR lc.fecha_publicacion IS NULL
+        )""",
+        {"cursor_fecha": fecha, "cursor_id": id_convocatoria}
+    )
+
+
+def create_keyset_index(db: Session) -> bool:
+    """Crear el índice (fecha_publicacion, id_convocatoria) si no existe"""
+    exists = db.execute(text("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'licitaciones_cabecera'
+        AND INDEX_NAME = :name
+    """), {"name": KEYSET_INDEX}).scalar()
+    if exists:
+        return False
+    db.execute(text(
+        f"CREATE INDEX {KEYSET_INDEX} ON licitaciones_cabecera (fecha_publicacion, id_convocatoria)"
+    ))
+    db.commit()
+    return True
+
+
+class CountCache:
+    """
+    Conteos por combinación de filtros. La clave incluye la generación de datos,
+    así que una carga del ETL o una edición invalida todo sin TTL agresivos.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple, Tuple[int, float]] = {}
+        # Los endpoints síncronos corren en el threadpool de FastAPI
+        self._lock = threading.Lock()
+
+    def get_or_count(self, db: Session, sql: str, params: Dict[str, Any]) -> int:
+        key = (data_version.get(db), sql, tuple(sorted((k, str(v)) for k, v in params.items())))
+        now = time.time()
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached and now - cached[1] < COUNT_TTL_SECONDS:
+            return cached[0]
+
+        # El COUNT va fuera del lock para no serializar las consultas
+        total = db.execute(text(sql), params).scalar() or 0
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= COUNT_CACHE_MAX:
+                # Descartar lo más antiguo (inserción), suficiente para este volumen
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (total, now)
+        return total
+
+
+# Singleton
+count_cache = CountCache()
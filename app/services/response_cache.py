@@ -0,0 +1,234 @@
+"""
+Response Cache - Caché de respuestas para los endpoints analíticos de solo lectura.
+
+La clave es la ruta más los parámetros normalizados (sin la sesión de BD).
+Cada entrada guarda la generación de datos con la que se calculó:
+- misma generación y dentro del TTL      -> hit
+- misma generación, TTL vencido pero dentro de la ventana stale
+                                         -> se sirve la copia y se recalcula en segundo plano
+- otra generación (ETL o edición)        -> miss, se recalcula en el acto
+
+Backend en memoria (LRU) por defecto; si REDIS_URL está definido y el paquete
+`redis` está instalado se comparte entre workers.
+"""
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from app.database import SessionLocal
+from app.services.data_version import data_version
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300
+DEFAULT_STALE_TTL = 3600
+MEMORY_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+REDIS_PREFIX = "response_cache:"
+
+
+class MemoryBackend:
+    """LRU en proceso"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = MEMORY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Dict[str, Any], expire: int) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Backend compartido entre workers (opcional)"""
+
+    name = "redis"
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self.client.get(REDIS_PREFIX + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, entry: Dict[str, Any], expire: int) -> None:
+        self.client.set(REDIS_PREFIX + key, json.dumps(jsonable_encoder(entry)), ex=expire)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(REDIS_PREFIX + "*"):
+            self.client.delete(key)
+
+    def size(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(REDIS_PREFIX + "*"))
+
+
+def _default_backend():
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        try:
+            import redis
+            client = redis.Redis.from_url(redis_url)
+            client.ping()
+            logger.info("Response cache usando Redis")
+            return RedisBackend(client)
+        except Exception as e:
+            logger.warning(f"Redis no disponible ({e}), usando caché en memoria")
+    return MemoryBackend()
+
+
+def _normalize(value: Any) -> Any:
+    """Forma canónica de un parámetro para la clave"""
+    if isinstance(value, BaseModel):
+        return _normalize(value.dict())
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in sorted(value.items()) if v not in (None, "")}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+class ResponseCache:
+    """Decorador de caché con métricas por ruta"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or _default_backend()
+        self._metrics: Dict[str, Dict[str, int]] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _count(self, route: str, event: str) -> None:
+        with self._lock:
+            counters = self._metrics.setdefault(
+                route, {"hits": 0, "stale_hits": 0, "misses": 0, "revalidations": 0, "uncached_errors": 0}
+            )
+            counters[event] += 1
+
+    @staticmethod
+    def make_key(route: str, params: Dict[str, Any]) -> str:
+        normalized = _normalize({k: v for k, v in params.items() if k != "db"})
+        return route + "?" + json.dumps(normalized, sort_keys=True, default=str)
+
+    def _store(self, route: str, key: str, value: Any, generation: int, ttl: int, stale_ttl: int) -> None:
+        # Las respuestas de error ({"error": ...}) no se guardan
+        if isinstance(value, dict) and value.get("error"):
+            self._count(route, "uncached_errors")
+            return
+        entry = {"value": value, "generation": generation, "created": time.time()}
+        try:
+            self.backend.set(key, entry, ttl + stale_ttl)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar en caché {route}: {e}")
+
+    def _revalidate(self, func: Callable, route: str, key: str, kwargs: Dict[str, Any],
+                    generation: int, ttl: int, stale_ttl: int) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def worker():
+            db = SessionLocal()
+            try:
+                value = func(**dict(kwargs, db=db))
+                self._store(route, key, value, generation, ttl, stale_ttl)
+                self._count(route, "revalidations")
+            except Exception as e:
+                logger.error(f"Error revalidando caché {route}: {e}")
+            finally:
+                db.close()
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=worker, name=f"cache-{route}", daemon=True).start()
+
+    def cached(self, route: str, ttl: int = DEFAULT_TTL, stale_ttl: int = DEFAULT_STALE_TTL):
+        """
+        Cachear un endpoint síncrono que recibe `db: Session` como keyword.
+        La firma se conserva (functools.wraps), así FastAPI sigue resolviendo
+        Query/Depends del endpoint original.
+        """
+        def decorator(func: Callable):
+            signature = inspect.signature(func)
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                call_kwargs = dict(bound.arguments)
+                db = call_kwargs.get("db")
+                if db is None:
+                    return func(*args, **kwargs)
+
+                key = self.make_key(route, call_kwargs)
+                generation = data_version.get(db)
+                try:
+                    entry = self.backend.get(key)
+                except Exception as e:
+                    logger.warning(f"No se pudo leer caché {route}: {e}")
+                    entry = None
+
+                if entry is not None and entry["generation"] == generation:
+                    age = time.time() - entry["created"]
+                    if age < ttl:
+                        self._count(route, "hits")
+                        return entry["value"]
+                    if age < ttl + stale_ttl:
+                        self._count(route, "stale_hits")
+                        self._revalidate(func, route, key, call_kwargs, generation, ttl, stale_ttl)
+                        return entry["value"]
+
+                self._count(route, "misses")
+                value = func(**call_kwargs)
+                self._store(route, key, value, generation, ttl, stale_ttl)
+                return value
+
+            return wrapper
+        return decorator
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {route: dict(counters) for route, counters in self._metrics.items()}
+        for counters in routes.values():
+            served = counters["hits"] + counters["stale_hits"]
+            total = served + counters["misses"]
+            counters["hit_ratio"] = round(served / total, 4) if total else 0.0
+        try:
+            entries = self.backend.size()
+        except Exception:
+            entries = None
+        return {"backend": self.backend.name, "entries": entries, "routes": routes}
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+# Singleton
+response_cache = ResponseCache()
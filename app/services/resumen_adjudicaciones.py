@@ -0,0 +1,67 @@
+"""
+Resumen de Adjudicaciones - Rollups por convocatoria en una sola pasada agrupada.
+
+Reemplaza las subconsultas correlacionadas (una por columna y por fila) que
+usaban el listado y las exportaciones: ganadores, RUCs, bancos, garantías,
+monto total, cantidad, fecha e id de contrato salen de un único GROUP BY.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text, bindparam
+from typing import Dict, Iterable, Optional
+
+
+def rollup_subquery(
+    where_sql: str = "",
+    separator: str = " | ",
+    garantia_separator: str = ","
+) -> str:
+    """
+    SQL del rollup agrupado por id_convocatoria, listo para usarse como tabla
+    derivada: `LEFT JOIN ({rollup_subquery()}) r ON r.id_convocatoria = lc.id_convocatoria`.
+    `where_sql` permite acotar las adjudicaciones (alias `la`).
+    """
+    return f"""
+        SELECT
+            la.id_convocatoria,
+            GROUP_CONCAT(DISTINCT la.ganador_nombre SEPARATOR '{separator}') AS ganador_nombre,
+            GROUP_CONCAT(DISTINCT la.ganador_ruc SEPARATOR '{separator}') AS ganador_ruc,
+            GROUP_CONCAT(DISTINCT la.entidad_financiera SEPARATOR '{separator}') AS entidad_financiera,
+            GROUP_CONCAT(DISTINCT la.tipo_garantia SEPARATOR '{garantia_separator}') AS tipo_garantia,
+            SUM(la.monto_adjudicado) AS monto_total_adjudicado,
+            COUNT(*) AS total_adjudicaciones,
+            MIN(la.fecha_adjudicacion) AS fecha_adjudicacion,
+            MIN(la.id_contrato) AS id_contrato
+        FROM licitaciones_adjudicaciones la
+        {where_sql}
+        GROUP BY la.id_convocatoria
+    """
+
+
+def fetch_rollups(db: Session, ids: Iterable[str]) -> Dict[str, dict]:
+    """Rollups para un conjunto acotado de convocatorias (p.ej. una página)"""
+    ids = [i for i in ids if i]
+    if not ids:
+        return {}
+
+    sql = text(rollup_subquery("WHERE la.id_convocatoria IN :ids")).bindparams(
+        bindparam("ids", expanding=True)
+    )
+    rollups = {}
+    for row in db.execute(sql, {"ids": ids}):
+        data = dict(row._mapping)
+        rollups[data.pop("id_convocatoria")] = data
+    return rollups
+
+
+def empty_rollup() -> Dict[str, Optional[object]]:
+    """Valores para convocatorias sin adjudicaciones"""
+    return {
+        "ganador_nombre": None,
+        "ganador_ruc": None,
+        "entidad_financiera": None,
+        "tipo_garantia": None,
+        "monto_total_adjudicado": None,
+        "total_adjudicaciones": 0,
+        "fecha_adjudicacion": None,
+        "id_contrato": None,
+    }
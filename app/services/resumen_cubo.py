@@ -0,0 +1,134 @@
+"""
+Resumen Cubo - Tabla pre-agregada para los KPIs y rankings del dashboard.
+
+Una fila por combinación (año, mes, departamento, provincia, categoría, estado,
+tipo_procedimiento) con cantidad y monto estimado. Los endpoints de
+/api/dashboard leen de aquí en lugar de escanear licitaciones_cabecera con
+YEAR(fecha_publicacion) = :year, que no puede usar índices.
+
+El cubo se refresca por periodo (año, mes): el cargador ETL recalcula los meses
+que tocó y los endpoints de escritura los meses de la licitación editada.
+Las fechas nulas van al periodo (0, 0) y los textos nulos se guardan como ''.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from datetime import date
+from typing import Iterable, Set, Tuple
+from app.utils.sql_filters import period_bounds
+import logging
+
+logger = logging.getLogger(__name__)
+
+CUBO_TABLE = "resumen_licitaciones_cubo"
+
+DIMENSIONES = ["departamento", "provincia", "categoria", "estado_proceso", "tipo_procedimiento"]
+
+_SELECT_CUBO = f"""
+    INSERT INTO {CUBO_TABLE}
+        (anio, mes, {", ".join(DIMENSIONES)}, total, monto_total)
+    SELECT
+        COALESCE(YEAR(fecha_publicacion), 0),
+        COALESCE(MONTH(fecha_publicacion), 0),
+        {", ".join(f"COALESCE({d}, '')" for d in DIMENSIONES)},
+        COUNT(*),
+        COALESCE(SUM(monto_estimado), 0)
+    FROM licitaciones_cabecera
+    {{where_sql}}
+    GROUP BY 1, 2, 3, 4, 5, 6, 7
+"""
+
+Periodo = Tuple[int, int]
+
+
+def periodo_de_fecha(fecha) -> Periodo:
+    """(año, mes) de una fecha o (0, 0) si no hay fecha"""
+    if not fecha:
+        return (0, 0)
+    if isinstance(fecha, str):
+        try:
+            fecha = date.fromisoformat(fecha[:10])
+        except ValueError:
+            return (0, 0)
+    return (fecha.year, fecha.month)
+
+
+class ResumenCubo:
+    """Mantenimiento (creación, reconstrucción y refresco por periodo) del cubo"""
+
+    @staticmethod
+    def ensure_table(db: Session) -> None:
+        """Crear la tabla si no existe y poblarla la primera vez"""
+        db.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {CUBO_TABLE} (
+                anio SMALLINT NOT NULL,
+                mes TINYINT NOT NULL,
+                departamento VARCHAR(255) NOT NULL DEFAULT '',
+                provincia VARCHAR(255) NOT NULL DEFAULT '',
+                categoria VARCHAR(255) NOT NULL DEFAULT '',
+                estado_proceso VARCHAR(255) NOT NULL DEFAULT '',
+                tipo_procedimiento VARCHAR(255) NOT NULL DEFAULT '',
+                total INT NOT NULL DEFAULT 0,
+                monto_total DECIMAL(20, 2) NOT NULL DEFAULT 0,
+                INDEX idx_cubo_periodo (anio, mes),
+                INDEX idx_cubo_departamento (departamento, anio)
+            )
+        """))
+        db.commit()
+
+        if not db.execute(text(f"SELECT 1 FROM {CUBO_TABLE} LIMIT 1")).fetchone():
+            ResumenCubo.rebuild(db)
+
+    @staticmethod
+    def rebuild(db: Session) -> None:
+        """Recalcular el cubo completo"""
+        db.execute(text(f"DELETE FROM {CUBO_TABLE}"))
+        db.execute(text(_SELECT_CUBO.format(where_sql="")))
+        db.commit()
+        logger.info("Cubo de resumen reconstruido")
+
+    @staticmethod
+    def periods_for_ids(db: Session, ids: Iterable[str]) -> Set[Periodo]:
+        """Periodos actuales de un conjunto de licitaciones (antes/después de editarlas)"""
+        periodos = set()
+        for id_convocatoria in ids:
+            row = db.execute(
+                text("SELECT fecha_publicacion FROM licitaciones_cabecera WHERE id_convocatoria = :id"),
+                {"id": id_convocatoria}
+            ).fetchone()
+            if row:
+                periodos.add(periodo_de_fecha(row[0]))
+        return periodos
+
+    @staticmethod
+    def refresh_periods(db: Session, periodos: Iterable[Periodo]) -> None:
+        """
+        Recalcular los periodos indicados dentro de la transacción del llamador.
+        Cada periodo va en un SAVEPOINT: si falla su INSERT se deshace también su DELETE
+        y el periodo conserva las filas anteriores (desactualizadas, no perdidas).
+        Si ni siquiera se puede volver al SAVEPOINT (p. ej. un deadlock que deshizo
+        toda la transacción) el error se propaga y el llamador hace rollback.
+        """
+        for anio, mes in sorted(set(periodos)):
+            savepoint = db.begin_nested()
+            try:
+                db.execute(
+                    text(f"DELETE FROM {CUBO_TABLE} WHERE anio = :anio AND mes = :mes"),
+                    {"anio": anio, "mes": mes}
+                )
+                if anio:
+                    desde, hasta = period_bounds(anio, mes)
+                    db.execute(
+                        text(_SELECT_CUBO.format(
+                            where_sql="WHERE fecha_publicacion >= :desde AND fecha_publicacion < :hasta"
+                        )),
+                        {"desde": desde, "hasta": hasta}
+                    )
+                else:
+                    db.execute(text(_SELECT_CUBO.format(where_sql="WHERE fecha_publicacion IS NULL")))
+                savepoint.commit()
+            except Exception as e:
+                savepoint.rollback()
+                logger.error(f"No se pudo refrescar el periodo {anio}-{mes:02d} del cubo de resumen: {e}")
+
+# Singleton
+resumen_cubo = ResumenCubo()
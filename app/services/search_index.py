@@ -0,0 +1,162 @@
+"""
+Search Index - Búsqueda universal sobre índices FULLTEXT de MySQL.
+
+Los índices viven sobre las tablas origen, por lo que InnoDB los mantiene
+incrementalmente en cada INSERT/UPDATE/DELETE del cargador ETL y de los
+endpoints de escritura; no hay que reconstruir nada a mano.
+
+FULLTEXT busca palabras por prefijo y solo sobre sus columnas, mientras que la
+búsqueda LIKE original es por subcadena sobre más campos. Para no cambiar los
+resultados en silencio, search_join devuelve None (y se usa LIKE) cuando:
+- algún término es más corto que MIN_TOKEN_SIZE (el índice no lo tiene)
+- algún término contiene dígitos (RUC, nomenclaturas, id de contrato: se buscan por subcadena)
+- el texto aparece en un valor de columnas fuera del índice (departamento, provincia,
+  distrito, categoría, tipo de procedimiento, estado, tipo de garantía; ver filter_catalog)
+Queda como diferencia aceptada que una palabra se busca por prefijo ("munic" encuentra
+"MUNICIPALIDAD", "cipal" no) y que varias palabras pueden estar en distintos campos.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Optional, Tuple, Dict, Any
+from app.services.filter_catalog import filter_catalog
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Columnas indexadas (MATCH() debe usar exactamente la lista del índice)
+CABECERA_FT_INDEX = "ft_cabecera_busqueda"
+CABECERA_FT_COLUMNS = "ocid, nomenclatura, descripcion, comprador, ubicacion_completa"
+
+ADJUDICACIONES_FT_INDEX = "ft_adjudicaciones_busqueda"
+ADJUDICACIONES_FT_COLUMNS = "ganador_nombre, ganador_ruc, entidad_financiera"
+
+# innodb_ft_min_token_size por defecto
+MIN_TOKEN_SIZE = 3
+
+# Re-verificar la existencia de los índices cada 5 minutos (también si estaban)
+RECHECK_SECONDS = 300
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_DIGIT_RE = re.compile(r"\d")
+
+
+class SearchIndex:
+    """Servicio de búsqueda rankeada para /api/licitaciones"""
+
+    def __init__(self):
+        self._available: Optional[bool] = None
+        self._checked_at: float = 0.0
+        # Valores de columnas no indexadas, por catálogo (se recalcula con cada generación)
+        self._unindexed_catalog: Optional[Dict[str, Any]] = None
+        self._unindexed_values: str = ""
+
+    @staticmethod
+    def create_indexes(db: Session) -> None:
+        """Crear los índices FULLTEXT si no existen (usado por el script de migración)"""
+        existing = {
+            row[0] for row in db.execute(text("""
+                SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE() AND INDEX_TYPE = 'FULLTEXT'
+            """)).fetchall()
+        }
+        if CABECERA_FT_INDEX not in existing:
+            db.execute(text(
+                f"ALTER TABLE licitaciones_cabecera ADD FULLTEXT INDEX {CABECERA_FT_INDEX} ({CABECERA_FT_COLUMNS})"
+            ))
+        if ADJUDICACIONES_FT_INDEX not in existing:
+            db.execute(text(
+                f"ALTER TABLE licitaciones_adjudicaciones ADD FULLTEXT INDEX {ADJUDICACIONES_FT_INDEX} ({ADJUDICACIONES_FT_COLUMNS})"
+            ))
+        db.commit()
+
+    def is_available(self, db: Session) -> bool:
+        """Verificar (con caché) que ambos índices FULLTEXT existen"""
+        now = time.time()
+        if self._available is not None and now - self._checked_at < RECHECK_SECONDS:
+            return self._available
+
+        try:
+            count = db.execute(text("""
+                SELECT COUNT(DISTINCT INDEX_NAME) FROM information_schema.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE() AND INDEX_TYPE = 'FULLTEXT'
+                AND INDEX_NAME IN (:cab, :adj)
+            """), {"cab": CABECERA_FT_INDEX, "adj": ADJUDICACIONES_FT_INDEX}).scalar()
+            self._available = count == 2
+        except Exception as e:
+            logger.warning(f"No se pudo verificar índices FULLTEXT: {e}")
+            self._available = False
+
+        if not self._available:
+            logger.warning("Índices FULLTEXT no encontrados, usando búsqueda LIKE (ejecuta scripts/create_search_indexes.py)")
+        self._checked_at = now
+        return self._available
+
+    def invalidate(self) -> None:
+        """Una consulta FULLTEXT falló: volver a verificar los índices en la próxima búsqueda"""
+        self._available = None
+
+    @staticmethod
+    def build_boolean_query(search: str) -> Optional[str]:
+        """
+        Convertir el texto del usuario a BOOLEAN MODE: cada término es obligatorio
+        y se busca por prefijo ("munic" -> "+munic*").
+        Retorna None si algún término no es indexable (corto o con dígitos): descartarlo
+        ampliaría los resultados, y un fragmento de RUC o código no es un prefijo.
+        """
+        tokens = _TOKEN_RE.findall(search.upper())
+        if not tokens or any(len(t) < MIN_TOKEN_SIZE or _DIGIT_RE.search(t) for t in tokens):
+            return None
+        return " ".join(f"+{t}*" for t in tokens)
+
+    def _targets_unindexed(self, db: Session, search: str) -> bool:
+        """El texto es subcadena de algún valor de una columna que el índice no cubre"""
+        catalog = filter_catalog.get(db)
+        if catalog is not self._unindexed_catalog:
+            values = set()
+            for key in ("departamentos", "categorias", "estados", "tipos_procedimiento", "tipos_garantia"):
+                values.update(catalog.get(key) or ())
+            for dept, provincias in (catalog.get("ubicaciones") or {}).items():
+                values.add(dept)
+                for prov, distritos in provincias.items():
+                    values.add(prov)
+                    values.update(distritos)
+            self._unindexed_values = "\n".join(sorted(values))
+            self._unindexed_catalog = catalog
+        return search.strip().upper() in self._unindexed_values
+
+    def search_join(self, db: Session, search: str, alias: str = "lc") -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Construir el JOIN con los ids que coinciden y su relevancia (columna `score`).
+        Retorna None si el índice no está disponible o no puede dar los mismos
+        resultados que LIKE (ver docstring del módulo); en ese caso el llamador
+        debe usar la búsqueda LIKE.
+        """
+        ft_query = self.build_boolean_query(search)
+        if not ft_query or not self.is_available(db) or self._targets_unindexed(db, search):
+            return None
+
+        join_sql = f"""
+            JOIN (
+                SELECT hits.id_convocatoria, SUM(hits.score) AS score
+                FROM (
+                    SELECT id_convocatoria,
+                           MATCH({CABECERA_FT_COLUMNS}) AGAINST (:ft_query IN BOOLEAN MODE) AS score
+                    FROM licitaciones_cabecera
+                    WHERE MATCH({CABECERA_FT_COLUMNS}) AGAINST (:ft_query IN BOOLEAN MODE)
+                    UNION ALL
+                    SELECT id_convocatoria,
+                           MATCH({ADJUDICACIONES_FT_COLUMNS}) AGAINST (:ft_query IN BOOLEAN MODE) AS score
+                    FROM licitaciones_adjudicaciones
+                    WHERE MATCH({ADJUDICACIONES_FT_COLUMNS}) AGAINST (:ft_query IN BOOLEAN MODE)
+                ) hits
+                GROUP BY hits.id_convocatoria
+            ) sh ON sh.id_convocatoria = {alias}.id_convocatoria
+        """
+        return join_sql, {"ft_query": ft_query}
+
+
+# Singleton
+search_index = SearchIndex()
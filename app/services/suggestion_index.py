@@ -0,0 +1,197 @@
+"""
+Suggestion Index - Índice en memoria para el autocompletado de la búsqueda universal.
+
+Una entrada por valor distinto (comprador, nomenclatura, OCID, departamento,
+ganador, RUC y banco) etiquetada con su tipo. Las entradas se ordenan por
+relevancia (frecuencia y luego monto), de modo que los postings de trigramas
+quedan en orden de ranking y la consulta puede cortar en cuanto junta `limit`
+resultados.
+"""
+from sqlalchemy import text
+from array import array
+from typing import Dict, List, Optional, Tuple
+from app.database import SessionLocal
+from app.services.data_version import data_version
+import logging
+import threading
+import time
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+
+# (tipo, SQL que devuelve valor, frecuencia, monto)
+SOURCES = [
+    ("Entidad", """
+        SELECT UPPER(TRIM(comprador)), COUNT(*), COALESCE(SUM(monto_estimado), 0)
+        FROM licitaciones_cabecera
+        WHERE comprador IS NOT NULL AND TRIM(comprador) != ''
+        GROUP BY 1
+    """),
+    ("Código", """
+        SELECT TRIM(nomenclatura), COUNT(*), COALESCE(SUM(monto_estimado), 0)
+        FROM licitaciones_cabecera
+        WHERE nomenclatura IS NOT NULL AND TRIM(nomenclatura) != ''
+        GROUP BY 1
+    """),
+    ("OCID", """
+        SELECT ocid, COUNT(*), COALESCE(SUM(monto_estimado), 0)
+        FROM licitaciones_cabecera
+        WHERE ocid IS NOT NULL AND ocid != ''
+        GROUP BY ocid
+    """),
+    ("Departamento", """
+        SELECT UPPER(TRIM(departamento)), COUNT(*), COALESCE(SUM(monto_estimado), 0)
+        FROM licitaciones_cabecera
+        WHERE departamento IS NOT NULL AND TRIM(departamento) != ''
+        GROUP BY 1
+    """),
+    ("Proveedor", """
+        SELECT UPPER(TRIM(ganador_nombre)), COUNT(*), COALESCE(SUM(monto_adjudicado), 0)
+        FROM licitaciones_adjudicaciones
+        WHERE ganador_nombre IS NOT NULL AND TRIM(ganador_nombre) != ''
+        GROUP BY 1
+    """),
+    ("RUC", """
+        SELECT TRIM(ganador_ruc), COUNT(*), COALESCE(SUM(monto_adjudicado), 0)
+        FROM licitaciones_adjudicaciones
+        WHERE ganador_ruc IS NOT NULL AND TRIM(ganador_ruc) != ''
+        GROUP BY 1
+    """),
+    ("Banco", """
+        SELECT UPPER(TRIM(entidad_financiera)), COUNT(*), COALESCE(SUM(monto_adjudicado), 0)
+        FROM licitaciones_adjudicaciones
+        WHERE entidad_financiera IS NOT NULL AND TRIM(entidad_financiera) != ''
+        AND entidad_financiera != 'SIN_GARANTIA' AND entidad_financiera NOT LIKE 'ERROR%'
+        GROUP BY 1
+    """),
+]
+
+# Cuántos candidatos revisar antes de reordenar (prefijos primero)
+CANDIDATE_FACTOR = 5
+
+
+def fold(value: str) -> str:
+    """Mayúsculas sin tildes para comparar ("Lima" == "LIMÁ")"""
+    decomposed = unicodedata.normalize("NFKD", value.upper())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def trigrams(key: str):
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+class _Snapshot:
+    """Estructura inmutable; se reemplaza completa en cada recarga"""
+
+    def __init__(self, entries: List[Tuple[str, str, str, int, float]], generation: int):
+        # entries: (clave, valor, tipo, frecuencia, monto) ordenadas por ranking
+        self.entries = entries
+        self.generation = generation
+        self.postings: Dict[str, array] = {}
+        for idx, entry in enumerate(entries):
+            for tri in trigrams(entry[0]):
+                posting = self.postings.get(tri)
+                if posting is None:
+                    posting = self.postings[tri] = array("I")
+                posting.append(idx)
+
+
+class SuggestionIndex:
+    """Autocompletado por prefijo/substring sin tocar la base de datos"""
+
+    def __init__(self):
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+        self._loading = False
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    def load(self) -> None:
+        """Reconstruir el índice completo (bloqueante, usa su propia sesión)"""
+        start = time.time()
+        db = SessionLocal()
+        try:
+            generation = data_version.get(db)
+            aggregated: Dict[Tuple[str, str], List] = {}
+            for type_label, sql in SOURCES:
+                for value, freq, amount in db.execute(text(sql)).fetchall():
+                    # Consorcios de bancos vienen como "AVLA | CESCE"
+                    parts = value.split("|") if type_label == "Banco" else [value]
+                    for part in parts:
+                        part = (part or "").strip()
+                        if not part:
+                            continue
+                        key = (part, type_label)
+                        if key not in aggregated:
+                            aggregated[key] = [0, 0.0]
+                        aggregated[key][0] += int(freq or 0)
+                        aggregated[key][1] += float(amount or 0)
+        finally:
+            db.close()
+
+        entries = [
+            (fold(value), value, type_label, freq, amount)
+            for (value, type_label), (freq, amount) in aggregated.items()
+        ]
+        entries.sort(key=lambda e: (-e[3], -e[4]))
+        self._snapshot = _Snapshot(entries, generation)
+        logger.info(f"Índice de sugerencias: {len(entries)} entradas en {time.time() - start:.2f}s (gen {generation})")
+
+    def refresh_async(self) -> None:
+        """Recargar en segundo plano; se siguen sirviendo los datos anteriores"""
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+
+        def worker():
+            try:
+                self.load()
+            except Exception as e:
+                logger.error(f"Error cargando índice de sugerencias: {e}")
+            finally:
+                self._loading = False
+
+        threading.Thread(target=worker, name="suggestion-index", daemon=True).start()
+
+    def ensure_fresh(self, db) -> None:
+        """Disparar recarga si el ETL o una escritura cambió la generación"""
+        snapshot = self._snapshot
+        if snapshot is None or data_version.get(db) != snapshot.generation:
+            self.refresh_async()
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, str]]:
+        """Sugerencias rankeadas: prefijos primero, luego frecuencia/monto"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return []
+
+        q = fold(query.strip())
+        if len(q) < 3:
+            return []
+
+        # El trigrama más raro acota los candidatos; ya vienen en orden de ranking
+        postings = [snapshot.postings.get(tri) for tri in trigrams(q)]
+        if any(p is None for p in postings):
+            return []
+        rarest = min(postings, key=len)
+
+        matches = []
+        seen = set()
+        for idx in rarest:
+            key, value, type_label, _, _ = snapshot.entries[idx]
+            if q in key and value not in seen:
+                seen.add(value)
+                matches.append((not key.startswith(q), len(matches), value, type_label))
+                if len(matches) >= limit * CANDIDATE_FACTOR:
+                    break
+
+        matches.sort()
+        return [{"value": value, "type": type_label} for _, _, value, type_label in matches[:limit]]
+
+
+# Singleton
+suggestion_index = SuggestionIndex()
@@ -0,0 +1,142 @@
+"""
+Shared WHERE-clause compilation for the raw SQL routers.
+
+Year/month/date filters are compiled to half-open ranges on the raw column
+(`fecha_publicacion >= :desde AND fecha_publicacion < :hasta`) instead of
+YEAR()/MONTH()/EXTRACT(), so MySQL can use the indexes on fecha_publicacion.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Composite indexes backing the compiled predicates: (table, name, columns)
+FILTER_INDEXES = [
+    ("licitaciones_cabecera", "idx_cabecera_fecha_departamento", "fecha_publicacion, departamento"),
+    ("licitaciones_cabecera", "idx_cabecera_departamento_fecha", "departamento, fecha_publicacion"),
+    ("licitaciones_adjudicaciones", "idx_adjudicaciones_conv_entidad", "id_convocatoria, entidad_financiera"),
+]
+
+
+def _to_int(value: Any) -> Optional[int]:
+    """Query/body params arrive as int, str or empty string"""
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def period_bounds(year: int, month: Optional[int] = None) -> Tuple[date, date]:
+    """[desde, hasta) for a whole year or a single month"""
+    if not month:
+        return date(year, 1, 1), date(year + 1, 1, 1)
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+class WhereBuilder:
+    """
+    Accumulates WHERE clauses and their bind params.
+    `alias` qualifies bare column names ("departamento" -> "lc.departamento").
+    """
+
+    def __init__(self, alias: Optional[str] = None):
+        self.alias = alias
+        self.clauses: List[str] = []
+        self.params: Dict[str, Any] = {}
+
+    def col(self, column: str) -> str:
+        if self.alias and "." not in column:
+            return f"{self.alias}.{column}"
+        return column
+
+    def add(self, clause: str, **params) -> "WhereBuilder":
+        """Hand-written clause (subqueries, OR groups...) with its params"""
+        self.clauses.append(clause)
+        self.params.update(params)
+        return self
+
+    def equals(self, column: str, value: Any, param: Optional[str] = None, normalize: bool = False) -> "WhereBuilder":
+        """col = :param (UPPER(TRIM(col)) = :param when normalize=True); skipped if value is empty"""
+        if value in (None, ""):
+            return self
+        param = param or column.split(".")[-1]
+        expr = f"UPPER(TRIM({self.col(column)}))" if normalize else self.col(column)
+        return self.add(f"{expr} = :{param}", **{param: value})
+
+    def like(self, column: str, value: Any, param: Optional[str] = None, upper: bool = False) -> "WhereBuilder":
+        """col LIKE %value%; skipped if value is empty"""
+        if value in (None, ""):
+            return self
+        param = param or column.split(".")[-1]
+        expr = f"UPPER({self.col(column)})" if upper else self.col(column)
+        pattern = f"%{str(value).upper() if upper else value}%"
+        return self.add(f"{expr} LIKE :{param}", **{param: pattern})
+
+    def date_range(self, column: str, desde: Optional[date] = None, hasta: Optional[date] = None,
+                   param: Optional[str] = None) -> "WhereBuilder":
+        """col >= :desde AND col < :hasta (either bound optional)"""
+        param = param or column.split(".")[-1]
+        if desde is not None:
+            self.add(f"{self.col(column)} >= :{param}_desde", **{f"{param}_desde": desde})
+        if hasta is not None:
+            self.add(f"{self.col(column)} < :{param}_hasta", **{f"{param}_hasta": hasta})
+        return self
+
+    def period(self, column: str, year: Any = None, month: Any = None,
+               known_years: Iterable[int] = (), param: Optional[str] = None) -> "WhereBuilder":
+        """
+        Year and/or month filter as half-open ranges.
+        A month without a year expands to one range per known year; without
+        known years it falls back to MONTH(col), which cannot use the index.
+        """
+        year, month = _to_int(year), _to_int(month)
+        if month is not None and not 1 <= month <= 12:
+            month = None
+        param = param or column.split(".")[-1]
+
+        if year:
+            desde, hasta = period_bounds(year, month)
+            return self.date_range(column, desde, hasta, param=param)
+
+        if month:
+            years = sorted({int(y) for y in known_years if y})
+            if not years:
+                return self.add(f"MONTH({self.col(column)}) = :{param}_mes", **{f"{param}_mes": month})
+            ranges, params = [], {}
+            for i, y in enumerate(years):
+                desde, hasta = period_bounds(y, month)
+                ranges.append(f"({self.col(column)} >= :{param}_d{i} AND {self.col(column)} < :{param}_h{i})")
+                params[f"{param}_d{i}"] = desde
+                params[f"{param}_h{i}"] = hasta
+            return self.add("(" + " OR ".join(ranges) + ")", **params)
+
+        return self
+
+    def sql(self, prefix: str = "WHERE", empty: str = "") -> str:
+        """Joined clauses with prefix ("WHERE"/"AND"), or `empty` if there are none"""
+        if not self.clauses:
+            return empty
+        joined = " AND ".join(self.clauses)
+        return f"{prefix} {joined}" if prefix else joined
+
+
+def create_filter_indexes(db: Session) -> List[str]:
+    """Create the FILTER_INDEXES that do not exist yet; returns the names created"""
+    existing = {
+        (row[0], row[1]) for row in db.execute(text("""
+            SELECT DISTINCT TABLE_NAME, INDEX_NAME FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+        """)).fetchall()
+    }
+    created = []
+    for table, name, columns in FILTER_INDEXES:
+        if (table, name) not in existing:
+            db.execute(text(f"CREATE INDEX {name} ON {table} ({columns})"))
+            created.append(name)
+    db.commit()
+    return created
@@ -0,0 +1,124 @@
+"""
+Benchmark del fan-out de notificaciones: implementación anterior (create_notification +
+tracking por usuario × evento, un commit cada una) contra el fan-out en bloque de
+NotificationTriggers (INSERT ... SELECT por evento, tracking por evento, un commit).
+
+Usa eventos sintéticos (entity_type 'benchmark', títulos '[BENCH] ...') contra los usuarios
+activos reales y los borra al terminar cada corrida.
+
+Uso: python scripts/benchmark_notification_triggers.py --eventos 50 --repeticiones 3
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text, event
+from app.database import SessionLocal, engine
+from app.models.notification import NotificationType, NotificationPriority
+from app.services.notification_service import notification_service
+from app.services.notification_triggers import notification_triggers
+
+contadores = {"sentencias": 0, "commits": 0}
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _contar_sentencia(conn, cursor, statement, parameters, context, executemany):
+    contadores["sentencias"] += 1
+
+
+@event.listens_for(engine, "commit")
+def _contar_commit(conn):
+    contadores["commits"] += 1
+
+
+def eventos_sinteticos(n):
+    return [
+        {
+            'entity_type': 'benchmark',
+            'entity_id': f'BENCH-{i}',
+            'notification_type': 'benchmark',
+            'type': NotificationType.SISTEMA,
+            'priority': NotificationPriority.LOW,
+            'title': f"[BENCH] Evento {i}",
+            'message': "Notificación sintética del benchmark de triggers",
+            'link': None,
+            'expires_days': 1
+        }
+        for i in range(n)
+    ]
+
+
+def fan_out_anterior(db, events):
+    """Réplica del camino anterior: CROSS JOIN con usuarios y commit por notificación"""
+    user_ids = [r.id for r in db.execute(text("SELECT id FROM usuarios WHERE activo = 1"))]
+    creadas = 0
+    for e in events:
+        for user_id in user_ids:
+            notification_service.create_notification(
+                db=db, user_id=user_id, type=e['type'], priority=e['priority'],
+                title=e['title'], message=e['message'], link=e['link'], expires_days=e['expires_days']
+            )
+            db.execute(text("""
+                INSERT INTO notification_tracking
+                (entity_type, entity_id, notification_type, last_notified)
+                VALUES (:entity_type, :entity_id, :notification_type, NOW())
+            """), {k: e[k] for k in ('entity_type', 'entity_id', 'notification_type')})
+            creadas += 1
+    db.commit()
+    return creadas
+
+
+def fan_out_en_bloque(db, events):
+    creadas = notification_triggers.fan_out(db, events)
+    db.commit()
+    return creadas
+
+
+def limpiar(db):
+    db.execute(text("DELETE FROM notifications WHERE title LIKE '[BENCH]%'"))
+    db.execute(text("DELETE FROM notification_tracking WHERE entity_type = 'benchmark'"))
+    db.commit()
+
+
+def medir(nombre, funcion, events, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        db = SessionLocal()
+        try:
+            limpiar(db)
+            contadores.update(sentencias=0, commits=0)
+            inicio = time.perf_counter()
+            creadas = funcion(db, events)
+            tiempos.append(time.perf_counter() - inicio)
+            sentencias, commits = contadores["sentencias"], contadores["commits"]
+        finally:
+            limpiar(db)
+            db.close()
+    mejor = min(tiempos)
+    print(f"{nombre:<12} {creadas:>7} notif  {mejor * 1000:10.1f} ms (mejor de {repeticiones})  "
+          f"{sentencias:>6} sentencias  {commits:>5} commits")
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--eventos", type=int, default=50)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    usuarios = db.execute(text("SELECT COUNT(*) FROM usuarios WHERE activo = 1")).scalar()
+    db.close()
+    print(f"📊 {args.eventos} eventos × {usuarios} usuarios activos")
+
+    events = eventos_sinteticos(args.eventos)
+    anterior = medir("anterior", fan_out_anterior, events, args.repeticiones)
+    bloque = medir("en bloque", fan_out_en_bloque, events, args.repeticiones)
+    print(f"⚡ Aceleración: {anterior / bloque:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
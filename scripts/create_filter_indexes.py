@@ -0,0 +1,23 @@
+"""
+Script para crear los índices compuestos que usan los filtros por rango de fechas (app/utils/sql_filters.py)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.utils.sql_filters import create_filter_indexes
+
+db = SessionLocal()
+
+try:
+    created = create_filter_indexes(db)
+    if created:
+        print(f"✅ Índices creados: {', '.join(created)}")
+    else:
+        print("✅ Todos los índices ya existían")
+except Exception as e:
+    print(f"❌ Error: {e}")
+finally:
+    db.close()
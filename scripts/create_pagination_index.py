@@ -0,0 +1,22 @@
+"""
+Script para crear el índice compuesto que usa la paginación por cursor (/api/licitaciones?keyset=true)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.paginacion import create_keyset_index, KEYSET_INDEX
+
+db = SessionLocal()
+
+try:
+    if create_keyset_index(db):
+        print(f"✅ Índice {KEYSET_INDEX} creado")
+    else:
+        print(f"✅ Índice {KEYSET_INDEX} ya existía")
+except Exception as e:
+    print(f"❌ Error: {e}")
+finally:
+    db.close()
@@ -0,0 +1,21 @@
+"""
+Script para crear los índices FULLTEXT de la búsqueda universal (/api/licitaciones?search=)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.search_index import search_index, CABECERA_FT_INDEX, ADJUDICACIONES_FT_INDEX
+
+db = SessionLocal()
+
+try:
+    print("Creando índices FULLTEXT (puede tardar varios minutos en tablas grandes)...")
+    search_index.create_indexes(db)
+    print(f"✅ Índices {CABECERA_FT_INDEX} y {ADJUDICACIONES_FT_INDEX} listos")
+except Exception as e:
+    print(f"❌ Error: {e}")
+finally:
+    db.close()
@@ -0,0 +1,27 @@
+"""
+Script para migrar data/notifications.json al almacén SQLite de notificaciones
+(app/services/notification_store.py). Conserva ids y estado de lectura; es idempotente
+(INSERT OR IGNORE por id), así que puede correrse de nuevo sin duplicar.
+
+El almacén ya importa el JSON automáticamente la primera vez que arranca la API;
+este script sirve para hacerlo antes del despliegue o desde otro archivo.
+
+Uso: python scripts/migrate_notifications_json.py [ruta_json]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.notification_store import notification_store, LEGACY_JSON_FILE
+
+ruta = sys.argv[1] if len(sys.argv) > 1 else LEGACY_JSON_FILE
+
+if not os.path.exists(ruta):
+    print(f"❌ No existe {ruta}")
+    sys.exit(1)
+
+importadas = notification_store.import_json(ruta)
+_, total, no_leidas = notification_store.list(limit=0)
+print(f"✅ {importadas} notificaciones nuevas importadas desde {ruta} (las ya presentes se omiten)")
+print(f"📊 Almacén {notification_store.path}: {total} notificaciones ({no_leidas} no leídas)")
@@ -0,0 +1,23 @@
+"""
+Script para crear y reconstruir por completo el cubo de resumen del dashboard (resumen_licitaciones_cubo)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import SessionLocal
+from app.services.resumen_cubo import resumen_cubo, CUBO_TABLE
+
+db = SessionLocal()
+
+try:
+    resumen_cubo.ensure_table(db)
+    resumen_cubo.rebuild(db)
+    filas = db.execute(text(f"SELECT COUNT(*) FROM {CUBO_TABLE}")).scalar()
+    print(f"✅ Cubo {CUBO_TABLE} reconstruido ({filas} filas)")
+except Exception as e:
+    print(f"❌ Error: {e}")
+finally:
+    db.close()
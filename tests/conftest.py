@@ -0,0 +1,12 @@
+"""
+Configuración común de pytest: rutas del proyecto y una URL de BD que no requiere MySQL.
+Los tests solo cubren funciones puras; app.database crea el engine al importarse.
+"""
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "1_motor_etl"))
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
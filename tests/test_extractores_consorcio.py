@@ -0,0 +1,47 @@
+from extractores_consorcio import confianza, miembros_en_texto, paginas_relevantes
+
+TEXTO_CONTRATO = """
+CONTRATO N° 012-2025
+LA MUNICIPALIDAD DISTRITAL DE SURCO, con RUC N° 20131367938, en adelante LA ENTIDAD
+y el CONSORCIO VIAL SUR, integrado por:
+1. CONSTRUCTORA ANDINA S.A.C. con RUC N° 20512345671 con una participación de 60%
+2. INGENIEROS DEL SUR E.I.R.L. identificada con RUC 20498765432 participación 40,00 %
+"""
+
+
+def test_miembros_con_ruc_nombre_y_participacion():
+    miembros = miembros_en_texto(TEXTO_CONTRATO)
+    assert miembros == [
+        {"ruc": "20512345671", "nombre": "CONSTRUCTORA ANDINA S.A.C.", "participacion": 60.0},
+        {"ruc": "20498765432", "nombre": "INGENIEROS DEL SUR E.I.R.L.", "participacion": 40.0},
+    ]
+
+
+def test_ruc_de_la_entidad_y_duplicados_se_ignoran():
+    texto = TEXTO_CONTRATO + "\nCONSTRUCTORA ANDINA S.A.C. RUC 20512345671 60%\n"
+    rucs = [m["ruc"] for m in miembros_en_texto(texto)]
+    assert rucs == ["20512345671", "20498765432"]
+
+
+def test_nombre_en_la_linea_anterior_y_porcentaje_no_robado():
+    texto = "CONSORCIO NORTE\nEMPRESA UNO S.A.\nRUC: 20111111111\nEMPRESA DOS S.A.\nRUC: 20222222222 50%"
+    miembros = miembros_en_texto(texto)
+    assert [(m["nombre"], m["participacion"]) for m in miembros] == [
+        ("EMPRESA UNO S.A.", None), ("EMPRESA DOS S.A.", 50.0)
+    ]
+
+
+def test_confianza():
+    completos = miembros_en_texto(TEXTO_CONTRATO)
+    assert confianza(completos) == 1.0
+    assert confianza([]) == 0.0
+    # Porcentajes que no suman 100
+    assert confianza([dict(completos[0]), dict(completos[1], participacion=30.0)]) == 0.7
+    # Un solo miembro sin porcentaje
+    assert confianza([dict(completos[0], participacion=None)]) == 0.3
+
+
+def test_paginas_relevantes_incluye_la_siguiente():
+    textos = ["Portada", "El CONSORCIO X con RUC 20512345671", "continúa tabla", "Anexo"]
+    assert paginas_relevantes(textos) == [1, 2]
+    assert paginas_relevantes(["Consorcio sin datos"]) == []
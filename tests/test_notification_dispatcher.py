@@ -0,0 +1,54 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+import app.services.notification_dispatcher as dispatcher_mod
+from app.services.notification_dispatcher import NotificationDispatcher
+
+
+def _evento(id, tipo, entidad_id, payload=None):
+    return SimpleNamespace(id=id, tipo=tipo, entidad_id=entidad_id,
+                           payload=json.dumps(payload) if payload else None)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE licitaciones_cabecera (id_convocatoria TEXT PRIMARY KEY, descripcion TEXT)"))
+        conn.execute(text("INSERT INTO licitaciones_cabecera VALUES ('C-1', 'Obra de prueba'), ('C-2', 'Servicio')"))
+    with Session(engine) as session:
+        yield session
+
+
+def test_cambio_a_cancelado_genera_notificacion(db):
+    rows = [_evento(1, "cambio_estado", "C-1", {"anterior": "CONVOCADO", "nuevo": "CANCELADO"})]
+    events = NotificationDispatcher._build_events(db, rows)
+    assert [(e["entity_id"], e["notification_type"]) for e in events] == [("C-1", "status_CANCELADO")]
+    assert "CANCELADO" in events[0]["title"]
+
+
+def test_cambio_a_estado_no_importante_se_ignora(db):
+    rows = [
+        _evento(1, "cambio_estado", "C-1", {"anterior": "CONVOCADO", "nuevo": "CONTRATADO"}),
+        _evento(2, "cambio_estado", "C-2", None),
+    ]
+    assert NotificationDispatcher._build_events(db, rows) == []
+
+
+def test_huecos_del_lote_esperan_juntos(monkeypatch):
+    reloj = [100.0]
+    monkeypatch.setattr(dispatcher_mod.time, "monotonic", lambda: reloj[0])
+    monkeypatch.setattr(dispatcher_mod, "GAP_WAIT_SECONDS", 10)
+    d = NotificationDispatcher()
+    rows = [SimpleNamespace(id=i) for i in (1, 2, 5, 9, 10, 40)]
+
+    assert [r.id for r in d._contiguous(0, rows)] == [1, 2]
+    reloj[0] += 5
+    assert [r.id for r in d._contiguous(2, rows[2:])] == []
+    # Una sola espera para los tres huecos (3-4, 6-8, 11-39)
+    reloj[0] += 5
+    assert [r.id for r in d._contiguous(2, rows[2:])] == [5, 9, 10, 40]
@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.services import paginacion
+from app.services.paginacion import (
+    CountCache, InvalidCursor, KEYSET_ORDER_SQL, decode_cursor, encode_cursor, keyset_predicate
+)
+
+
+@pytest.mark.parametrize("fecha", [date(2025, 3, 1), datetime(2025, 3, 1, 10, 30), None])
+def test_cursor_ida_y_vuelta(fecha):
+    assert decode_cursor(encode_cursor(fecha, "ocds-123")) == (fecha, "ocds-123")
+
+
+def test_cursor_es_url_safe_sin_relleno():
+    token = encode_cursor(date(2025, 3, 1), "id/con+símbolos")
+    assert "=" not in token and "+" not in token and "/" not in token
+
+
+@pytest.mark.parametrize("token", ["", "no-es-base64!!", encode_cursor(None, "x")[:-3], "e30"])
+def test_cursor_invalido(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token)
+
+
+def test_predicado_sin_fecha_solo_sigue_entre_nulos():
+    sql, params = keyset_predicate(encode_cursor(None, "B"))
+    assert "IS NULL" in sql and params == {"cursor_id": "B"}
+
+
+def test_recorrido_por_cursor_cubre_todo_sin_repetir():
+    """Páginas de 2 sobre fechas repetidas y nulas (SQLite también deja los NULL al final en DESC)"""
+    engine = create_engine("sqlite://")
+    filas = [("A", "2025-01-02"), ("B", "2025-01-02"), ("C", "2025-01-01"),
+             ("D", None), ("E", "2025-01-03"), ("F", None), ("G", "2025-01-01")]
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE licitaciones_cabecera (id_convocatoria TEXT, fecha_publicacion DATE)"))
+        conn.execute(text("INSERT INTO licitaciones_cabecera VALUES (:i, :f)"), [{"i": i, "f": f} for i, f in filas])
+
+        vistos, cursor = [], None
+        while True:
+            where, params = ("", {})
+            if cursor:
+                where, params = keyset_predicate(cursor)
+                where = "WHERE " + where
+                if params.get("cursor_fecha") is not None:
+                    params["cursor_fecha"] = params["cursor_fecha"].isoformat()
+            pagina = conn.execute(text(
+                f"SELECT id_convocatoria, fecha_publicacion FROM licitaciones_cabecera lc {where} "
+                f"ORDER BY {KEYSET_ORDER_SQL} LIMIT 2"
+            ), params).fetchall()
+            if not pagina:
+                break
+            vistos += [r[0] for r in pagina]
+            ultima = pagina[-1]
+            cursor = encode_cursor(date.fromisoformat(ultima[1]) if ultima[1] else None, ultima[0])
+
+    assert vistos == ["E", "B", "A", "G", "C", "F", "D"]
+
+
+def test_count_cache_lleno_desde_varios_hilos(monkeypatch):
+    """Con la caché en el tope, los hilos del threadpool no deben desalojar la misma clave dos veces"""
+    monkeypatch.setattr(paginacion, "COUNT_CACHE_MAX", 4)
+    monkeypatch.setattr(paginacion.data_version, "get", lambda db: 0)
+    db = SimpleNamespace(execute=lambda sql, params: SimpleNamespace(scalar=lambda: params["n"]))
+    cache = CountCache()
+
+    def contar(n):
+        return cache.get_or_count(db, "SELECT COUNT(*)", {"n": n})
+
+    with ThreadPoolExecutor(max_workers=8) as exe:
+        assert list(exe.map(contar, range(2000))) == list(range(2000))
+    assert len(cache._entries) <= 4
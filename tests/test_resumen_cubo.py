@@ -0,0 +1,52 @@
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from app.services.resumen_cubo import CUBO_TABLE, resumen_cubo
+
+
+def _engine(con_funciones_fecha=True):
+    """SQLite con el cubo y la cabecera; YEAR/MONTH se registran para imitar MySQL"""
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def _funciones(dbapi_conn, _):
+        if con_funciones_fecha:
+            dbapi_conn.create_function("YEAR", 1, lambda f: int(f[:4]) if f else None)
+            dbapi_conn.create_function("MONTH", 1, lambda f: int(f[5:7]) if f else None)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE {CUBO_TABLE} (
+                anio INT, mes INT, departamento TEXT, provincia TEXT, categoria TEXT,
+                estado_proceso TEXT, tipo_procedimiento TEXT, total INT, monto_total NUMERIC
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE licitaciones_cabecera (
+                id_convocatoria TEXT, fecha_publicacion DATE, monto_estimado NUMERIC, departamento TEXT,
+                provincia TEXT, categoria TEXT, estado_proceso TEXT, tipo_procedimiento TEXT
+            )
+        """))
+        conn.execute(text("INSERT INTO licitaciones_cabecera VALUES "
+                          "('A', '2025-03-10', 100, 'LIMA', 'LIMA', 'OBRAS', 'CONVOCADO', 'LP'), "
+                          "('B', '2025-03-20', 50, 'LIMA', 'LIMA', 'OBRAS', 'CONVOCADO', 'LP')"))
+        conn.execute(text(f"INSERT INTO {CUBO_TABLE} VALUES (2025, 3, 'LIMA', 'LIMA', 'OBRAS', 'CONVOCADO', 'LP', 1, 100)"))
+    return engine
+
+
+def _cubo(db):
+    return db.execute(text(f"SELECT anio, mes, total, monto_total FROM {CUBO_TABLE}")).fetchall()
+
+
+def test_refresco_recalcula_el_periodo():
+    with Session(_engine()) as db:
+        resumen_cubo.refresh_periods(db, [(2025, 3)])
+        db.commit()
+        assert _cubo(db) == [(2025, 3, 2, 150)]
+
+
+def test_fallo_del_insert_conserva_las_filas_del_periodo():
+    with Session(_engine(con_funciones_fecha=False)) as db:
+        resumen_cubo.refresh_periods(db, [(2025, 3)])
+        db.commit()
+        assert _cubo(db) == [(2025, 3, 1, 100)]
@@ -0,0 +1,47 @@
+from datetime import date
+
+from app.utils.sql_filters import WhereBuilder, period_bounds
+
+
+def test_period_bounds_anio_y_mes():
+    assert period_bounds(2025) == (date(2025, 1, 1), date(2026, 1, 1))
+    assert period_bounds(2025, 2) == (date(2025, 2, 1), date(2025, 3, 1))
+    assert period_bounds(2025, 12) == (date(2025, 12, 1), date(2026, 1, 1))
+
+
+def test_anio_y_mes_como_rango_semiabierto():
+    w = WhereBuilder(alias="lc").period("fecha_publicacion", "2025", "3")
+    assert w.sql() == "WHERE lc.fecha_publicacion >= :fecha_publicacion_desde AND lc.fecha_publicacion < :fecha_publicacion_hasta"
+    assert w.params == {"fecha_publicacion_desde": date(2025, 3, 1), "fecha_publicacion_hasta": date(2025, 4, 1)}
+
+
+def test_mes_sin_anio_se_expande_por_anio_conocido():
+    w = WhereBuilder().period("fecha_publicacion", month=12, known_years=[2025, 2024, 2025, None])
+    assert w.sql(prefix="") == (
+        "((fecha_publicacion >= :fecha_publicacion_d0 AND fecha_publicacion < :fecha_publicacion_h0)"
+        " OR (fecha_publicacion >= :fecha_publicacion_d1 AND fecha_publicacion < :fecha_publicacion_h1))"
+    )
+    assert w.params == {
+        "fecha_publicacion_d0": date(2024, 12, 1), "fecha_publicacion_h0": date(2025, 1, 1),
+        "fecha_publicacion_d1": date(2025, 12, 1), "fecha_publicacion_h1": date(2026, 1, 1),
+    }
+
+
+def test_mes_sin_anios_conocidos_usa_month():
+    w = WhereBuilder().period("fecha_publicacion", month="7")
+    assert w.sql() == "WHERE MONTH(fecha_publicacion) = :fecha_publicacion_mes"
+    assert w.params == {"fecha_publicacion_mes": 7}
+
+
+def test_valores_vacios_o_invalidos_no_filtran():
+    w = WhereBuilder().period("fecha_publicacion", "", "13").period("fecha_publicacion", None, "abc")
+    assert w.sql(empty="-") == "-" and w.params == {}
+
+
+def test_equals_y_like_omiten_vacios():
+    w = (WhereBuilder(alias="lc")
+         .equals("departamento", "LIMA", normalize=True)
+         .equals("categoria", "")
+         .like("la.entidad_financiera", "bcp", param="entidad", upper=True))
+    assert w.sql(prefix="AND") == "AND UPPER(TRIM(lc.departamento)) = :departamento AND UPPER(la.entidad_financiera) LIKE :entidad"
+    assert w.params == {"departamento": "LIMA", "entidad": "%BCP%"}